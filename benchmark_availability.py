@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Benchmark the service availability endpoints against providers with a large
+booking history.
+
+Seeds a throwaway provider with N historical appointments (plus a handful
+inside the 14-day window), times the availability views, and rolls all of
+it back afterwards. Latency should stay flat as N grows.
+
+Usage:
+    python benchmark_availability.py [history_size ...]
+"""
+import os
+import sys
+import time
+import statistics
+import django
+from datetime import timedelta
+
+# Set up Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'viciniti.settings')
+django.setup()
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory
+from main_app.models import User, ServiceProvider, Service, Appointment, ProviderAvailability
+from main_app.views import ServiceAvailabilityAPI, ServiceAvailabilityWithDiscountAPI
+
+RUNS = 5
+
+
+class Rollback(Exception):
+    pass
+
+
+def seed_provider(history_size):
+    """Create a provider, one service and `history_size` past appointments"""
+    suffix = f"{history_size}-{int(time.time() * 1000)}"
+    provider_user = User.objects.create(username=f"bench-provider-{suffix}", user_type='provider')
+    consumer = User.objects.create(username=f"bench-consumer-{suffix}", user_type='consumer')
+    provider = ServiceProvider.objects.create(
+        user=provider_user,
+        business_name='Benchmark Provider',
+        business_description='Benchmark'
+    )
+    service = Service.objects.create(
+        provider=provider,
+        name='Benchmark Service',
+        description='Benchmark',
+        price=50,
+        duration=45
+    )
+
+    today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    # Open 9am-5pm for the next 14 days
+    ProviderAvailability.objects.bulk_create([
+        ProviderAvailability(
+            provider=provider,
+            day_of_week=(today + timedelta(days=offset)).strftime('%Y-%m-%d'),
+            start_time=today + timedelta(days=offset, hours=9),
+            end_time=today + timedelta(days=offset, hours=17)
+        )
+        for offset in range(14)
+    ])
+
+    # Historical appointments, one per hour going back in time
+    history = []
+    for index in range(history_size):
+        start = today - timedelta(hours=index + 1)
+        history.append(Appointment(
+            service=service,
+            consumer=consumer,
+            start_time=start,
+            end_time=start + timedelta(minutes=45),
+            status='completed'
+        ))
+    # A few bookings inside the window so the conflict path is exercised
+    for offset in range(1, 14, 3):
+        start = today + timedelta(days=offset, hours=11)
+        history.append(Appointment(
+            service=service,
+            consumer=consumer,
+            start_time=start,
+            end_time=start + timedelta(minutes=45),
+            status='confirmed'
+        ))
+    # bulk_create skips save(), so fill in the booking constraint columns here
+    for appointment in history:
+        appointment.set_booking_range()
+    Appointment.objects.bulk_create(history, batch_size=5000)
+
+    return service
+
+
+def time_view(view_class, service):
+    """Return the median latency in milliseconds for a view"""
+    factory = APIRequestFactory()
+    view = view_class.as_view()
+    timings = []
+    for _ in range(RUNS):
+        request = factory.get(f"/api/services/{service.id}/availability/")
+        started = time.perf_counter()
+        response = view(request, service_id=service.id)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.data
+    return statistics.median(timings)
+
+
+def benchmark(history_size):
+    results = {}
+    try:
+        with transaction.atomic():
+            service = seed_provider(history_size)
+            results['availability'] = time_view(ServiceAvailabilityAPI, service)
+            results['availability-with-discount'] = time_view(ServiceAvailabilityWithDiscountAPI, service)
+            raise Rollback()
+    except Rollback:
+        pass
+    return results
+
+
+if __name__ == "__main__":
+    sizes = [int(arg) for arg in sys.argv[1:]] or [1000, 100000]
+
+    print(f"{'history':>10}  {'endpoint':<28}  {'median ms':>10}")
+    for size in sizes:
+        for endpoint, millis in benchmark(size).items():
+            print(f"{size:>10}  {endpoint:<28}  {millis:>10.1f}")
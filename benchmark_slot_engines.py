@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Compare the python and numpy slot engines on dense provider calendars.
+
+Builds availability and appointments in memory (no database writes), checks
+that both engines return identical slots, and times them for several
+service durations.
+
+Usage:
+    python benchmark_slot_engines.py [days] [appointments_per_day]
+"""
+import os
+import sys
+import time
+import random
+import statistics
+import django
+from datetime import timedelta
+
+# Set up Django
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'viciniti.settings')
+django.setup()
+
+from django.utils import timezone
+from main_app.scheduling import BUFFER_MINUTES, BlockedIntervals, availability_day_keys, free_slot_iterator
+
+RUNS = 5
+DURATIONS = [15, 30, 45, 60, 90]
+
+
+def build_calendar(days, appointments_per_day):
+    """Return (day_keys, availability_by_day, blocked) for a 6am-10pm, heavily booked calendar"""
+    random.seed(days * 1000 + appointments_per_day)
+    today = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    day_keys = availability_day_keys(today.date(), days)
+
+    availability_by_day = {}
+    appointments = []
+    for offset, day_key in enumerate(day_keys):
+        day_start = today + timedelta(days=offset)
+        # Split days keep several blocks per day, like a provider with breaks
+        availability_by_day[day_key] = [
+            (day_start + timedelta(hours=6), day_start + timedelta(hours=12)),
+            (day_start + timedelta(hours=13), day_start + timedelta(hours=22)),
+        ]
+        for _ in range(appointments_per_day):
+            start = day_start + timedelta(minutes=random.randrange(6 * 60, 22 * 60, 5))
+            appointments.append((start, start + timedelta(minutes=random.choice(DURATIONS))))
+
+    return day_keys, availability_by_day, BlockedIntervals(appointments, buffer_minutes=BUFFER_MINUTES)
+
+
+def run_engine(iter_day_slots, day_keys, availability_by_day, blocked, duration):
+    return {
+        day_key: list(iter_day_slots(
+            day_key,
+            availability_by_day.get(day_key, []),
+            duration,
+            blocked,
+            BUFFER_MINUTES
+        ))
+        for day_key in day_keys
+    }
+
+
+def time_engine(iter_day_slots, day_keys, availability_by_day, blocked, duration):
+    timings = []
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        run_engine(iter_day_slots, day_keys, availability_by_day, blocked, duration)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    appointments_per_day = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+
+    python_engine = free_slot_iterator('python')
+    numpy_engine = free_slot_iterator('numpy')
+
+    day_keys, availability_by_day, blocked = build_calendar(days, appointments_per_day)
+    print(f"{days} days, {appointments_per_day} appointments/day, {len(blocked)} merged blocked periods")
+    print(f"{'duration':>10} {'python ms':>12} {'numpy ms':>12} {'speedup':>9}")
+
+    for duration in DURATIONS:
+        expected = run_engine(python_engine, day_keys, availability_by_day, blocked, duration)
+        actual = run_engine(numpy_engine, day_keys, availability_by_day, blocked, duration)
+        if actual != expected:
+            print(f"MISMATCH: engines disagree for duration {duration}")
+            sys.exit(1)
+
+        python_ms = time_engine(python_engine, day_keys, availability_by_day, blocked, duration)
+        numpy_ms = time_engine(numpy_engine, day_keys, availability_by_day, blocked, duration)
+        print(f"{duration:>10} {python_ms:>12.2f} {numpy_ms:>12.2f} {python_ms / numpy_ms:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, ServiceProvider, Service, Appointment
+from .models import User, ServiceProvider, Service, Appointment, GeocodeJob
 
 class CustomUserAdmin(UserAdmin):
     list_display = ('username', 'email', 'user_type', 'is_staff')
@@ -23,10 +23,16 @@ class ServiceAdmin(admin.ModelAdmin):
 
 class AppointmentAdmin(admin.ModelAdmin):
     list_display = ('service', 'consumer', 'start_time', 'end_time', 'status')
-    list_filter = ('status', 'start_time')
+    list_filter = ('status', 'location_status', 'start_time')
     search_fields = ('service__name', 'consumer__username')
 
+class GeocodeJobAdmin(admin.ModelAdmin):
+    list_display = ('target_type', 'target_id', 'status', 'attempts', 'run_after', 'last_error')
+    list_filter = ('status', 'target_type')
+    search_fields = ('target_id',)
+
 admin.site.register(User, CustomUserAdmin)
 admin.site.register(ServiceProvider, ServiceProviderAdmin)
 admin.site.register(Service, ServiceAdmin)
 admin.site.register(Appointment, AppointmentAdmin)
+admin.site.register(GeocodeJob, GeocodeJobAdmin)
@@ -18,7 +18,14 @@ urlpatterns = [
     path('provider/setup/', views.ProviderSetupAPI.as_view(), name='api_provider_setup'),
     path('provider/profile/', views.ProviderProfileAPI.as_view(), name='api_provider_profile'),
     path('providers/<int:provider_id>/availability/', views.ProviderAvailabilityAPI.as_view(), name='api_provider_availability'),
+    path('providers/<int:provider_id>/availability/rules/', views.ProviderAvailabilityRulesAPI.as_view(), name='api_provider_availability_rules'),
+    path('providers/<int:provider_id>/availability/rules/<int:rule_id>/', views.ProviderAvailabilityRuleDetailAPI.as_view(), name='api_provider_availability_rule_detail'),
+    path('providers/<int:provider_id>/availability/slots/', views.ProviderAvailabilitySlotsAPI.as_view(), name='api_provider_availability_slots'),
     path('provider/discount-config/', views.ProximityDiscountConfigAPI.as_view(), name='api_provider_discount_config'),
+    path('provider/discount-quotes/', views.DiscountQuoteAPI.as_view(), name='api_provider_discount_quotes'),
+    
+    # Geocoder cost counters (staff only)
+    path('geocoder/stats/', views.GeocoderStatsAPI.as_view(), name='api_geocoder_stats'),
     
     # Service endpoints
     path('services/', views.ServiceListAPI.as_view(), name='api_service_list'),
@@ -28,6 +35,7 @@ urlpatterns = [
     path('services/provider/<int:provider_id>/', views.ProviderServiceListAPI.as_view(), name='api_provider_services'),
     path('services/<int:service_id>/availability/', views.ServiceAvailabilityAPI.as_view(), name='api_service_availability'),
     path('services/<int:service_id>/availability-with-discount/', views.ServiceAvailabilityWithDiscountAPI.as_view(), name='api_service_availability_with_discount'),
+    path('availability/batch/', views.AvailabilityBatchAPI.as_view(), name='api_availability_batch'),
     
     # Appointment endpoints - Updated to support UUID format
     path('appointments/', views.AppointmentListAPI.as_view(), name='api_appointment_list'),
@@ -36,4 +44,7 @@ urlpatterns = [
     path('appointments/<uuid:appointment_id>/status/', views.AppointmentStatusAPI.as_view(), name='api_appointment_status'),
     path('appointments/provider/<int:provider_id>/', views.ProviderAppointmentListAPI.as_view(), name='api_provider_appointments'),
     path('appointments/consumer/<int:consumer_id>/', views.ConsumerAppointmentListAPI.as_view(), name='api_consumer_appointments'),
+    
+    # Delta sync of appointments and availability for mobile clients
+    path('sync/', views.SyncAPI.as_view(), name='api_sync'),
 ] 
\ No newline at end of file
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from main_app.models import ServiceProvider
+from main_app.scheduling import DEFAULT_AVAILABILITY_DAYS, availability_day_keys, build_discount_zones
+
+
+class Command(BaseCommand):
+    help = (
+        "Precompute proximity discount zones for providers with a discount config. "
+        "Run it periodically (e.g. from cron) with PROXIMITY_DISCOUNT_ZONES enabled."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=DEFAULT_AVAILABILITY_DAYS,
+                            help='Number of days from today to build zones for')
+        parser.add_argument('--provider', type=int,
+                            help='Only build zones for this provider id')
+
+    def handle(self, *args, **options):
+        day_keys = availability_day_keys(timezone.now().date(), options['days'])
+
+        providers = ServiceProvider.objects.filter(discount_config__isnull=False)
+        if options['provider'] is not None:
+            providers = providers.filter(pk=options['provider'])
+
+        for provider in providers.iterator():
+            zone_count, skipped_days = build_discount_zones(provider, day_keys)
+            self.stdout.write(
+                f"Provider {provider.pk}: {zone_count} zones over {len(day_keys) - skipped_days} days"
+                + (f", {skipped_days} days skipped while being changed" if skipped_days else '')
+            )
+
+        self.stdout.write(self.style.SUCCESS('Discount zones built'))
@@ -0,0 +1,67 @@
+import csv
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from main_app.utils.geocoder_backends import build_offline_dataset
+
+# Accepted header names; the Census ZCTA gazetteer uses GEOID/INTPTLAT/INTPTLONG
+ZIP_COLUMNS = {
+    'zip': ('zip', 'zip_code', 'GEOID'),
+    'lat': ('lat', 'latitude', 'INTPTLAT'),
+    'lng': ('lng', 'lon', 'longitude', 'INTPTLONG'),
+}
+STREET_COLUMNS = ('street', 'zip', 'from_number', 'to_number', 'start_lat', 'start_lng', 'end_lat', 'end_lng')
+
+
+def _read_rows(path):
+    """Rows of a comma or tab separated file with a header, as dicts with stripped keys"""
+    with open(path, newline='') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        dialect = csv.Sniffer().sniff(sample, delimiters=',\t')
+        for row in csv.DictReader(f, dialect=dialect):
+            yield {key.strip(): value.strip() for key, value in row.items() if key}
+
+
+def _column(header, names, path):
+    for name in names:
+        if name in header:
+            return name
+    raise CommandError(f"{path} has none of the columns {', '.join(names)}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the offline geocoder dataset from a ZIP centroid file (zip, lat, lng; "
+        "the Census ZCTA gazetteer works as is) and an optional street segment file "
+        "(" + ", ".join(STREET_COLUMNS) + ")."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('zips', help='ZIP centroid CSV/TSV file')
+        parser.add_argument('--streets', help='Street segment CSV/TSV file')
+        parser.add_argument('--output', default=getattr(settings, 'OFFLINE_GEOCODER_DIR', 'geodata'),
+                            help='Dataset directory (defaults to OFFLINE_GEOCODER_DIR)')
+
+    def handle(self, *args, **options):
+        zip_rows = list(_read_rows(options['zips']))
+        if not zip_rows:
+            raise CommandError(f"{options['zips']} has no rows")
+        columns = [_column(zip_rows[0], ZIP_COLUMNS[field], options['zips']) for field in ('zip', 'lat', 'lng')]
+
+        street_rows = []
+        if options['streets']:
+            street_rows = [
+                tuple(row[column] for column in STREET_COLUMNS)
+                for row in _read_rows(options['streets'])
+            ]
+
+        zip_count, street_count = build_offline_dataset(
+            options['output'],
+            (tuple(row[column] for column in columns) for row in zip_rows),
+            street_rows
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {zip_count} ZIP centroids and {street_count} street segments to {options['output']}"
+        ))
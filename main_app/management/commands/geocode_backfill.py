@@ -0,0 +1,227 @@
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+
+from main_app.models import Appointment, ServiceProvider, User
+from main_app.scheduling import invalidate_cached_discounts, invalidate_discount_zones
+from main_app.utils.geo_utils import (
+    CACHE_MISS, GEOCODER_FAILED, cached_geocode, create_point_from_coords, geocode_address, geocoder_stats,
+    normalize_address
+)
+
+# Per model: the rows to geocode, their address fields in geocode_address
+# order (line 1, city, state, zip, country; None means 'USA'), the
+# location field to fill and the plain latitude/longitude fields, if any
+BACKFILL_MODELS = {
+    'users': {
+        'model': User,
+        'rows': lambda: User.objects.filter(location__isnull=True)
+        .exclude(street_address='').exclude(city='').exclude(state=''),
+        'address_fields': ('street_address', 'city', 'state', 'zip_code', None),
+        'location_field': 'location',
+        'coordinate_fields': (),
+    },
+    'providers': {
+        'model': ServiceProvider,
+        'rows': lambda: ServiceProvider.objects.filter(business_location__isnull=True)
+        .exclude(address_line1='').exclude(city='').exclude(state=''),
+        'address_fields': ('address_line1', 'city', 'state', 'postal_code', 'country'),
+        'location_field': 'business_location',
+        'coordinate_fields': ('latitude', 'longitude'),
+    },
+    'appointments': {
+        'model': Appointment,
+        'rows': lambda: Appointment.objects.filter(
+            location__isnull=True, address_line1__isnull=False, city__isnull=False, state__isnull=False
+        ).exclude(address_line1='').exclude(city='').exclude(state=''),
+        'address_fields': ('address_line1', 'city', 'state', 'zip_code', 'country'),
+        'location_field': 'location',
+        'coordinate_fields': ('latitude', 'longitude'),
+    },
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Geocode every user, provider or appointment that has an address but no location. "
+        "Rows are streamed in primary key order and each distinct address is geocoded once, "
+        "by a few threads sharing the geocoder rate limit; results are saved with bulk_update. "
+        "Progress is checkpointed after every batch, so an interrupted run resumes where it stopped; "
+        "rows whose lookup failed (geocoder errors, not 'not found') are left for the resumed run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model', required=True, choices=sorted(BACKFILL_MODELS),
+                            help='Which rows to geocode')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Rows per batch (and per bulk_update)')
+        parser.add_argument('--workers', type=int, default=4,
+                            help='Concurrent geocoder lookups; the rate limit still applies')
+        parser.add_argument('--checkpoint',
+                            help='Checkpoint file (default: geocode_backfill_<model>.json)')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the checkpoint and start from the first row')
+
+    def handle(self, *args, **options):
+        model_name = options['model']
+        spec = BACKFILL_MODELS[model_name]
+        if options['batch_size'] < 1 or options['workers'] < 1:
+            raise CommandError('--batch-size and --workers must be positive')
+
+        checkpoint_path = options['checkpoint'] or f"geocode_backfill_{model_name}.json"
+        last_pk = None if options['restart'] else self._read_checkpoint(checkpoint_path)
+        if last_pk is not None:
+            self.stdout.write(f"Resuming after {model_name} {last_pk}")
+
+        rows = spec['rows']()
+        if last_pk is not None:
+            rows = rows.filter(pk__gt=last_pk)
+        value_fields = ['pk'] + [field for field in spec['address_fields'] if field]
+        if model_name == 'appointments':
+            value_fields.append('service__provider_id')
+        rows = rows.order_by('pk').values(*value_fields).iterator(chunk_size=options['batch_size'])
+
+        totals = {'rows': 0, 'geocoded': 0, 'not_found': 0, 'failed': 0}
+        # Once a lookup fails the checkpoint stays before that row, so a resumed run retries it
+        checkpoint_held = False
+
+        def finish_batch(batch):
+            nonlocal checkpoint_held
+            first_failed = self._process_batch(model_name, batch, executor, totals)
+            if checkpoint_held:
+                return
+            if first_failed is not None:
+                checkpoint_held = True
+                if first_failed == 0:
+                    return
+                batch = batch[:first_failed]
+            self._write_checkpoint(checkpoint_path, batch[-1]['pk'])
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= options['batch_size']:
+                    finish_batch(batch)
+                    batch = []
+            if batch:
+                finish_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {totals['rows']} {model_name}: {totals['geocoded']} geocoded, "
+            f"{totals['not_found']} not found, {totals['failed']} failed"
+        ))
+        self.stdout.write(f"Geocoder stats: {geocoder_stats.snapshot()}")
+        if totals['failed']:
+            self.stdout.write(self.style.WARNING(
+                f"{totals['failed']} lookups failed; run the command again to retry them"
+            ))
+        elif os.path.exists(checkpoint_path):
+            # Finished: primary keys (UUIDs for appointments) are not in creation
+            # order, so a stale checkpoint would make the next run skip new rows
+            os.remove(checkpoint_path)
+
+    def _process_batch(self, model_name, batch, executor, totals):
+        """
+        Geocode the batch's distinct addresses and save the rows that resolved.
+
+        Returns:
+            the position in the batch of the first row whose lookup failed, or None
+        """
+        spec = BACKFILL_MODELS[model_name]
+        model = spec['model']
+        location_field = spec['location_field']
+        coordinate_fields = spec['coordinate_fields']
+
+        # Each distinct address is looked up once, however many rows share it
+        addresses = {}  # normalized key -> geocode_address arguments
+        row_keys = []
+        for row in batch:
+            address = tuple(
+                (row[field] or '') if field else 'USA' for field in spec['address_fields']
+            )
+            address = address[:4] + (address[4] or 'USA',)
+            key = normalize_address(*address)
+            addresses.setdefault(key, address)
+            row_keys.append(key)
+
+        # Cached addresses are answered here; only the rest go to the worker threads
+        coords_by_key = {}
+        for key in addresses:
+            coords = cached_geocode(key)
+            if coords is not CACHE_MISS:
+                geocoder_stats.increment('cache_hits')
+                coords_by_key[key] = coords
+
+        def lookup(address):
+            try:
+                return geocode_address(*address, report_failure=True)
+            finally:
+                # geocode_address stores its result from this thread's own connection
+                connections.close_all()
+
+        misses = [key for key in addresses if key not in coords_by_key]
+        coords_by_key.update(zip(misses, executor.map(lookup, [addresses[key] for key in misses])))
+
+        located = []
+        not_found_pks = []
+        first_failed = None
+        for position, (row, key) in enumerate(zip(batch, row_keys)):
+            coords = coords_by_key[key]
+            if coords is GEOCODER_FAILED:
+                # Left as it is (appointments stay pending) for the next run
+                if first_failed is None:
+                    first_failed = position
+                totals['failed'] += 1
+                continue
+            if coords is None:
+                not_found_pks.append(row['pk'])
+                continue
+            instance = model(pk=row['pk'])
+            setattr(instance, location_field, create_point_from_coords(*coords))
+            for field, value in zip(coordinate_fields, coords):
+                setattr(instance, field, value)
+            if model_name == 'appointments':
+                instance.location_status = 'resolved'
+                # Availability ETags follow appointment updated_at
+                instance.updated_at = timezone.now()
+            located.append(instance)
+
+        # Written directly, so User.save does not geocode again and signals do not fire
+        fields = [location_field, *coordinate_fields]
+        if model_name == 'appointments':
+            fields += ['location_status', 'updated_at']
+        model.objects.bulk_update(located, fields)
+
+        if model_name == 'appointments':
+            model.objects.filter(pk__in=not_found_pks).update(location_status='failed')
+            # Discounts around newly located appointments change
+            for provider_id in {row['service__provider_id'] for row in batch}:
+                invalidate_cached_discounts(provider_id)
+                invalidate_discount_zones(provider_id)
+
+        totals['rows'] += len(batch)
+        totals['geocoded'] += len(located)
+        totals['not_found'] += len(not_found_pks)
+        self.stdout.write(
+            f"  {totals['rows']} rows done; last batch had {len(addresses)} distinct addresses, "
+            f"{len(located)} geocoded"
+        )
+        return first_failed
+
+    def _read_checkpoint(self, path):
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f).get('last_pk')
+
+    def _write_checkpoint(self, path, last_pk):
+        # Write then rename, so a crash never leaves a half-written checkpoint
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, 'w') as f:
+            json.dump({'last_pk': str(last_pk)}, f)
+        os.replace(temporary_path, path)
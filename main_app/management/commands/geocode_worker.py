@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main_app.utils.geo_utils import geocoder_stats
+from main_app.utils.geocode_jobs import run_geocode_jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued geocode jobs (addresses of new appointments, and of users and providers "
+        "whose address changed). "
+        "Keeps polling unless --once is given; several workers can run side by side."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10,
+                            help='Jobs claimed per round')
+        parser.add_argument('--sleep', type=float, default=5.0,
+                            help='Seconds to wait when no job is due')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once no job is due instead of polling')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            ran = run_geocode_jobs(options['batch_size'])
+            total += ran
+            if ran:
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'Ran {total} geocode jobs'))
+        self.stdout.write(f'Geocoder stats: {geocoder_stats.snapshot()}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from main_app.utils.sync import SYNC_TOMBSTONE_DAYS, prune_sync_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete sync tombstones older than SYNC_TOMBSTONE_DAYS. "
+        "Clients that last synced before then are sent a full sync instead. Run it daily."
+    )
+
+    def handle(self, *args, **options):
+        deleted = prune_sync_tombstones()
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {deleted} tombstones older than {SYNC_TOMBSTONE_DAYS} days'
+        ))
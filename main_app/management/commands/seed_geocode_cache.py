@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+
+from main_app.models import Appointment, GeocodeCache, User
+from main_app.utils.geo_utils import normalize_address
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the geocode cache from users and appointments that already have a "
+        "location, so their addresses are not sent to the geocoder again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Cache rows inserted per query')
+
+    def handle(self, *args, **options):
+        # Provider locations are left out: they may be copied from the owner's
+        # location rather than geocoded from the business address
+        sources = (
+            User.objects.filter(location__isnull=False).exclude(street_address='').values_list(
+                'street_address', 'city', 'state', 'zip_code', 'latitude', 'longitude'
+            ),
+            Appointment.objects.filter(location_status='resolved').values_list(
+                'address_line1', 'city', 'state', 'zip_code', 'country', 'latitude', 'longitude'
+            ),
+        )
+
+        entries = {}
+        for rows in sources:
+            for row in rows.iterator():
+                if len(row) == 6:
+                    address_line1, city, state, zip_code, latitude, longitude = row
+                    country = 'USA'
+                else:
+                    address_line1, city, state, zip_code, country, latitude, longitude = row
+                if not (address_line1 and city and state) or latitude is None or longitude is None:
+                    continue
+                address_key = normalize_address(address_line1, city, state, zip_code, country)
+                entries.setdefault(address_key, GeocodeCache(
+                    address_key=address_key,
+                    latitude=latitude,
+                    longitude=longitude
+                ))
+
+        # Addresses already in the cache keep their entry
+        GeocodeCache.objects.bulk_create(
+            entries.values(),
+            batch_size=options['batch_size'],
+            ignore_conflicts=True
+        )
+        self.stdout.write(self.style.SUCCESS(f'Seeded up to {len(entries)} geocode cache entries'))
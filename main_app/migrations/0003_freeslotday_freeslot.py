@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 10:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0002_appointment_appt_service_status_time_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FreeSlotDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(max_length=10)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='free_slot_days', to='main_app.serviceprovider')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='free_slot_days', to='main_app.service')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['provider', 'day'], name='freeslotday_provider_day_idx')],
+                'unique_together': {('service', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='FreeSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(max_length=10)),
+                ('position', models.IntegerField()),
+                ('slot_id', models.CharField(max_length=40)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='free_slots', to='main_app.serviceprovider')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='free_slots', to='main_app.service')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['provider', 'day'], name='freeslot_provider_day_idx')],
+                'unique_together': {('service', 'day', 'position')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.1 on 2026-10-18 13:05
+
+import django.contrib.gis.db.models.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0004_availabilityrule'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiscountZoneDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(max_length=10)),
+                ('built_at', models.DateTimeField(auto_now=True)),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discount_zone_days', to='main_app.serviceprovider')),
+            ],
+            options={
+                'unique_together': {('provider', 'day')},
+            },
+        ),
+        migrations.CreateModel(
+            name='DiscountZone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(max_length=10)),
+                ('tier', models.PositiveSmallIntegerField()),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('area', django.contrib.gis.db.models.fields.PolygonField(geography=True, srid=4326)),
+                ('appointment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discount_zones', to='main_app.appointment')),
+                ('provider', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='discount_zones', to='main_app.serviceprovider')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['provider', 'day'], name='discountzone_provider_day_idx')],
+            },
+        ),
+    ]
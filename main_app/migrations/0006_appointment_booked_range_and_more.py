@@ -0,0 +1,47 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:05
+
+import django.contrib.postgres.constraints
+import django.contrib.postgres.fields.ranges
+import django.db.models.deletion
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+
+
+# Fill the new columns for existing bookings; the 15 minutes match
+# BUFFER_MINUTES in main_app.scheduling.slot_engine at the time of writing.
+BACKFILL_SQL = """
+UPDATE main_app_appointment AS appointment
+SET provider_id = service.provider_id,
+    booked_range = tstzrange(appointment.start_time, appointment.end_time + interval '15 minutes', '[)')
+FROM main_app_service AS service
+WHERE appointment.service_id = service.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0005_discountzoneday_discountzone'),
+    ]
+
+    operations = [
+        # Lets the GiST exclusion constraint compare provider ids with =
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name='appointment',
+            name='booked_range',
+            field=django.contrib.postgres.fields.ranges.DateTimeRangeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='appointment',
+            name='provider',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='provider_appointments', to='main_app.serviceprovider'),
+        ),
+        # Existing double bookings must be cancelled before this migration,
+        # otherwise adding the constraint below fails
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='appointment',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('status__in', ['pending', 'confirmed', 'completed'])), expressions=[('provider', '='), ('booked_range', '&&')], name='appointment_no_overlap'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.1 on 2026-10-18 15:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0006_appointment_booked_range_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='appointment',
+            name='location_status',
+            field=models.CharField(choices=[('none', 'No address'), ('pending', 'Pending'), ('resolved', 'Resolved'), ('failed', 'Failed')], default='none', max_length=10),
+        ),
+        # Appointments geocoded before this migration already have their location
+        migrations.RunSQL(
+            "UPDATE main_app_appointment SET location_status = 'resolved' WHERE location IS NOT NULL",
+            migrations.RunSQL.noop
+        ),
+        migrations.CreateModel(
+            name='GeocodeJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('target_type', models.CharField(choices=[('appointment', 'Appointment')], max_length=20)),
+                ('target_id', models.CharField(max_length=40)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='geocodejob_status_run_idx')],
+            },
+        ),
+    ]
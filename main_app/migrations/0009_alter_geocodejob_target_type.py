@@ -0,0 +1,18 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0008_geocodecache'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='geocodejob',
+            name='target_type',
+            field=models.CharField(choices=[('appointment', 'Appointment'), ('user', 'User'), ('provider', 'Service Provider')], max_length=20),
+        ),
+    ]
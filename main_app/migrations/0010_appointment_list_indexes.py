@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0009_alter_geocodejob_target_type'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['provider', 'start_time', 'id'], name='appt_provider_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['consumer', 'start_time', 'id'], name='appt_consumer_start_idx'),
+        ),
+    ]
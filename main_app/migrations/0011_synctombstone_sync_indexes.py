@@ -0,0 +1,45 @@
+# Generated by Django 5.2.1 on 2026-10-18 17:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main_app', '0010_appointment_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('appointment', 'Appointment'), ('availability', 'Provider Availability')], max_length=20)),
+                ('object_id', models.CharField(max_length=40)),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+                ('consumer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('provider', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='main_app.serviceprovider')),
+            ],
+            options={
+                'indexes': [
+                    models.Index(fields=['provider', 'deleted_at'], name='tombstone_provider_idx'),
+                    models.Index(fields=['consumer', 'deleted_at'], name='tombstone_consumer_idx'),
+                    models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+                ],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['provider', 'updated_at'], name='appt_provider_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['consumer', 'updated_at'], name='appt_consumer_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='provideravailability',
+            index=models.Index(fields=['provider', 'updated_at'], name='avail_provider_updated_idx'),
+        ),
+    ]
@@ -1,10 +1,50 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.contrib.gis.db import models as gis_models
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
+from django.db.backends.postgresql.psycopg_any import DateTimeTZRange
 import uuid
 
-class User(AbstractUser):
+class TrackedFieldsMixin:
+    """
+    Remembers the values of `tracked_fields` (attribute names, e.g. 'service_id')
+    as loaded from the database, so save() can tell what changed without
+    fetching the row again.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def _remember_loaded_values(self, fields=None):
+        """Snapshot the tracked fields (only `fields`, after a save with update_fields)"""
+        deferred = self.get_deferred_fields()
+        loaded = getattr(self, '_loaded_values', {})
+        for field in self.tracked_fields:
+            if field in deferred or (fields is not None and field not in fields):
+                continue
+            loaded[field] = getattr(self, field)
+        self._loaded_values = loaded
+
+    def field_changed(self, *fields):
+        """Whether any of `fields` differs from its stored value; unsaved and deferred fields count as changed"""
+        loaded = getattr(self, '_loaded_values', {})
+        return any(field not in loaded or getattr(self, field) != loaded[field] for field in fields)
+
+    def _saved_fields(self, update_fields):
+        """Attribute names written by a save() with these update_fields (None means all)"""
+        if update_fields is None:
+            return None
+        return {self._meta.get_field(name).attname for name in update_fields}
+
+
+class User(TrackedFieldsMixin, AbstractUser):
     USER_TYPE_CHOICES = (
         ('provider', 'Service Provider'),
         ('consumer', 'Service Consumer'),
@@ -19,63 +59,55 @@ class User(AbstractUser):
     zip_code = models.CharField(max_length=20, blank=True)
     location = gis_models.PointField(null=True, blank=True, geography=True)
 
-    def save(self, *args, **kwargs):
-        """Override the save method to automatically geocode the address when necessary"""
-        # Check if we need to geocode (if address fields are set but no location)
-        address_fields_set = self.street_address and self.city and self.state
-        
-        # Only attempt geocoding if we have all required address fields and either:
-        # 1. No location exists, or
-        # 2. One of the address fields has changed
-        if address_fields_set and (
-            not self.location or 
-            self._has_address_changed()
-        ):
-            try:
-                print(f"DEBUG USER MODEL: Auto-geocoding address for user {self.username}")
-                from .utils.geo_utils import get_location_from_address
-                
-                address_components = {
-                    'address_line1': self.street_address,
-                    'city': self.city,
-                    'state': self.state,
-                    'zip_code': self.zip_code,
-                    'country': 'USA'
-                }
-                
-                # Get location point from address
-                location = get_location_from_address(address_components)
-                
-                if location:
-                    print(f"DEBUG USER MODEL: Successfully geocoded to {location.y}, {location.x}")
-                    self.location = location
-                    self.latitude = location.y
-                    self.longitude = location.x
-                else:
-                    print(f"DEBUG USER MODEL: Failed to geocode address in model save")
-            except Exception as e:
-                print(f"DEBUG USER MODEL: Error geocoding user address: {str(e)}")
-        
-        # Call the superclass save method
+    ADDRESS_FIELDS = ('street_address', 'city', 'state', 'zip_code')
+    tracked_fields = ADDRESS_FIELDS + ('location',)
+
+    def save(self, *args, geocode=True, **kwargs):
+        """
+        Save, queueing a geocode job when the address changed without a new location.
+
+        Change detection compares against the values loaded with the row, so
+        it costs no query; pass geocode=False to skip the job, or call
+        geocode_now() first to look the address up synchronously.
+        """
+        needs_geocode = geocode and self._needs_geocode()
         super().save(*args, **kwargs)
-    
-    def _has_address_changed(self):
-        """Check if any address fields have changed since the last save"""
-        if not self.pk:  # New instance
-            return True
-            
-        try:
-            old_instance = User.objects.get(pk=self.pk)
-            return (
-                old_instance.street_address != self.street_address or
-                old_instance.city != self.city or
-                old_instance.state != self.state or
-                old_instance.zip_code != self.zip_code
-            )
-        except User.DoesNotExist:
-            return True
-
-class ServiceProvider(models.Model):
+        self._remember_loaded_values(self._saved_fields(kwargs.get('update_fields')))
+        if needs_geocode:
+            print(f"DEBUG USER MODEL: Queueing geocoding of the address of user {self.username}")
+            from .utils.geocode_jobs import enqueue_geocode
+            enqueue_geocode('user', self.pk)
+
+    def address_components(self):
+        """Address for get_location_from_address, or None if incomplete"""
+        if not (self.street_address and self.city and self.state):
+            return None
+        return {
+            'address_line1': self.street_address,
+            'city': self.city,
+            'state': self.state,
+            'zip_code': self.zip_code,
+            'country': 'USA'
+        }
+
+    def geocode_now(self):
+        """Look the address up synchronously and set the location; returns whether it was found"""
+        from .utils.geo_utils import get_location_from_address
+
+        address_components = self.address_components()
+        location = get_location_from_address(address_components) if address_components else None
+        if location:
+            self.location = location
+        return location is not None
+
+    def _needs_geocode(self):
+        """Address complete and changed, and no new location supplied with it"""
+        if self.address_components() is None or not self.field_changed(*self.ADDRESS_FIELDS):
+            return False
+        location_supplied = self.location is not None and self.field_changed('location')
+        return not location_supplied
+
+class ServiceProvider(TrackedFieldsMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='provider_profile')
     business_name = models.CharField(max_length=100)
     business_description = models.TextField()
@@ -98,45 +130,43 @@ class ServiceProvider(models.Model):
     def __str__(self):
         return self.business_name
 
-    def save(self, *args, **kwargs):
-        """Override save to sync user location with business location"""
-        # First check if we need to sync with user's location
-        if not self.business_location and self.user.location:
+    ADDRESS_FIELDS = ('address_line1', 'city', 'state', 'postal_code', 'country')
+    tracked_fields = ADDRESS_FIELDS + ('business_location',)
+
+    def save(self, *args, geocode=True, **kwargs):
+        """
+        Save, filling in a missing business location.
+
+        The owner's location is copied when the user object is already
+        loaded; otherwise, for a new provider or a changed address, a geocode
+        job resolves it later (owner's location first, then the business
+        address). No query or network call happens inside save() itself.
+        """
+        if not self.business_location and ServiceProvider.user.is_cached(self) and self.user.location:
             print(f"DEBUG PROVIDER MODEL: Syncing business location with user location for {self.business_name}")
             self.business_location = self.user.location
             self.latitude = self.user.location.y
             self.longitude = self.user.location.x
         
-        # If we have our own address but no location, try to geocode it
-        address_fields_set = self.address_line1 and self.city and self.state
-        if address_fields_set and not self.business_location:
-            try:
-                print(f"DEBUG PROVIDER MODEL: Geocoding business address for {self.business_name}")
-                from .utils.geo_utils import get_location_from_address
-                
-                address_components = {
-                    'address_line1': self.address_line1,
-                    'city': self.city,
-                    'state': self.state,
-                    'zip_code': self.postal_code,
-                    'country': self.country
-                }
-                
-                # Get location point from address
-                location = get_location_from_address(address_components)
-                
-                if location:
-                    print(f"DEBUG PROVIDER MODEL: Successfully geocoded to {location.y}, {location.x}")
-                    self.business_location = location
-                    self.latitude = location.y
-                    self.longitude = location.x
-                else:
-                    print(f"DEBUG PROVIDER MODEL: Failed to geocode business address")
-            except Exception as e:
-                print(f"DEBUG PROVIDER MODEL: Error geocoding business address: {str(e)}")
-        
-        # Call the superclass save method
+        needs_geocode = geocode and not self.business_location and self.field_changed(*self.ADDRESS_FIELDS)
         super().save(*args, **kwargs)
+        self._remember_loaded_values(self._saved_fields(kwargs.get('update_fields')))
+        if needs_geocode:
+            print(f"DEBUG PROVIDER MODEL: Queueing business location lookup for {self.business_name}")
+            from .utils.geocode_jobs import enqueue_geocode
+            enqueue_geocode('provider', self.pk)
+
+    def address_components(self):
+        """Business address for get_location_from_address, or None if incomplete"""
+        if not (self.address_line1 and self.city and self.state):
+            return None
+        return {
+            'address_line1': self.address_line1,
+            'city': self.city,
+            'state': self.state,
+            'zip_code': self.postal_code,
+            'country': self.country
+        }
 
 SERVICE_CATEGORIES = (
     ('beauty_hair', 'Beauty - Hair'),
@@ -167,7 +197,7 @@ class Service(models.Model):
     def __str__(self):
         return self.name
 
-class Appointment(models.Model):
+class Appointment(TrackedFieldsMixin, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     STATUS_CHOICES = (
         ('pending', 'Pending'),
@@ -177,6 +207,10 @@ class Appointment(models.Model):
     )
     
     service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='appointments')
+    # Copy of service.provider, kept in sync on save so the booking constraint
+    # can compare providers without a join
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='provider_appointments',
+                                 null=True, blank=True, editable=False)
     consumer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='appointments')
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
@@ -194,6 +228,15 @@ class Appointment(models.Model):
     
     # Add geospatial location field
     location = gis_models.PointField(null=True, blank=True, geography=True)
+    # Where the location stands; addresses are geocoded by the geocode_worker
+    # command after the booking is saved, so `location` stays empty until then
+    LOCATION_STATUS_CHOICES = (
+        ('none', 'No address'),
+        ('pending', 'Pending'),
+        ('resolved', 'Resolved'),
+        ('failed', 'Failed'),
+    )
+    location_status = models.CharField(max_length=10, choices=LOCATION_STATUS_CHOICES, default='none')
     
     # Other fields that exist in the database
     latitude = models.FloatField(null=True, blank=True)
@@ -203,16 +246,69 @@ class Appointment(models.Model):
     final_price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
     discount_reason = models.CharField(max_length=100, blank=True)
     
+    # [start_time, end_time + buffer), set on save. Two bookings conflict when
+    # their ranges overlap, i.e. when they are less than the buffer apart.
+    booked_range = DateTimeRangeField(null=True, blank=True, editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Availability loads filter by the provider's services, active status and a time window
+            models.Index(fields=['service', 'status', 'start_time', 'end_time'], name='appt_service_status_time_idx'),
+            # Appointment list pages are keyset scans over (start_time, id) per provider or consumer
+            models.Index(fields=['provider', 'start_time', 'id'], name='appt_provider_start_idx'),
+            models.Index(fields=['consumer', 'start_time', 'id'], name='appt_consumer_start_idx'),
+            # The sync endpoint asks for each side's appointments changed since a time
+            models.Index(fields=['provider', 'updated_at'], name='appt_provider_updated_idx'),
+            models.Index(fields=['consumer', 'updated_at'], name='appt_consumer_updated_idx'),
+        ]
+        constraints = [
+            # No two active bookings of a provider may overlap (buffer included).
+            # Enforced by a GiST index, so it holds under concurrent requests too.
+            ExclusionConstraint(
+                name='appointment_no_overlap',
+                expressions=[
+                    ('provider', RangeOperators.EQUAL),
+                    ('booked_range', RangeOperators.OVERLAPS),
+                ],
+                condition=models.Q(status__in=['pending', 'confirmed', 'completed']),
+            ),
+        ]
+
     def __str__(self):
         return f"{self.service.name} - {self.consumer.username} - {self.start_time}"
 
+    # Read by the availability signals instead of re-fetching the row
+    tracked_fields = ('service_id', 'start_time', 'end_time', 'location', 'status')
+
     def save(self, *args, **kwargs):
         if not self.end_time:
             self.end_time = self.start_time + timezone.timedelta(minutes=self.service.duration)
+        self.set_booking_range()
         super().save(*args, **kwargs)
+        self._remember_loaded_values(self._saved_fields(kwargs.get('update_fields')))
+
+    def set_booking_range(self):
+        """Fill in provider and booked_range from the service and times (also for bulk_create)"""
+        from .scheduling import BUFFER_MINUTES
+        
+        # The service is only loaded when it changed
+        if self.provider_id is None or self.field_changed('service_id'):
+            self.provider_id = self.service.provider_id
+        start_time = self.start_time
+        end_time = self.end_time
+        # Times may still be ISO strings when set straight from request data
+        if isinstance(start_time, str):
+            start_time = parse_datetime(start_time)
+        if isinstance(end_time, str):
+            end_time = parse_datetime(end_time)
+        self.booked_range = DateTimeTZRange(
+            start_time,
+            end_time + timezone.timedelta(minutes=BUFFER_MINUTES),
+            '[)'
+        )
 
 class ProviderAvailability(models.Model):
     provider = models.ForeignKey('ServiceProvider', on_delete=models.CASCADE, related_name='availabilities')
@@ -224,10 +320,216 @@ class ProviderAvailability(models.Model):
 
     class Meta:
         unique_together = ('provider', 'day_of_week', 'start_time')
+        indexes = [
+            # The sync endpoint asks for a provider's blocks changed since a time
+            models.Index(fields=['provider', 'updated_at'], name='avail_provider_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.provider.business_name} - {self.day_of_week} - {self.start_time.strftime('%H:%M')} to {self.end_time.strftime('%H:%M')}"
 
+class AvailabilityRule(models.Model):
+    """
+    A weekly recurring availability block, e.g. "Mondays 09:00-17:00".
+
+    Rules are expanded into concrete blocks only for the days being asked
+    about. Dated ProviderAvailability rows take precedence: a day that has
+    any of them ignores the provider's rules.
+    """
+    WEEKDAY_CHOICES = (
+        (0, 'Monday'),
+        (1, 'Tuesday'),
+        (2, 'Wednesday'),
+        (3, 'Thursday'),
+        (4, 'Friday'),
+        (5, 'Saturday'),
+        (6, 'Sunday'),
+    )
+
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='availability_rules')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    valid_from = models.DateField()
+    valid_until = models.DateField(null=True, blank=True)  # Open-ended when empty
+    exceptions = models.JSONField(default=list, blank=True)  # "YYYY-MM-DD" dates the rule is skipped
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['provider', 'weekday'], name='availrule_provider_weekday_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider.business_name} - {self.get_weekday_display()} - {self.start_time.strftime('%H:%M')} to {self.end_time.strftime('%H:%M')}"
+
+class FreeSlotDay(models.Model):
+    """
+    Marks that the free slots of a service have been materialized for a day.
+
+    A day with a marker but no FreeSlot rows is fully booked; a day without
+    a marker has not been built yet (or was invalidated by a booking write).
+    """
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='free_slot_days')
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='free_slot_days')
+    day = models.CharField(max_length=10)  # Same "YYYY-MM-DD" key as ProviderAvailability.day_of_week
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('service', 'day')
+        indexes = [
+            models.Index(fields=['provider', 'day'], name='freeslotday_provider_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.service.name} - {self.day}"
+
+class FreeSlot(models.Model):
+    """A bookable slot for a service, materialized from availability and appointments"""
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='free_slots')
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, related_name='free_slots')
+    day = models.CharField(max_length=10)
+    position = models.IntegerField()  # Order of the slot within the day
+    slot_id = models.CharField(max_length=40)
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('service', 'day', 'position')
+        indexes = [
+            models.Index(fields=['provider', 'day'], name='freeslot_provider_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.service.name} - {self.day} - {self.start_time.strftime('%H:%M')}"
+
+class DiscountZoneDay(models.Model):
+    """
+    Marks that the discount zones of a provider have been built for a day.
+
+    Zones are only used for a day that has a marker, so a missing or
+    invalidated day falls back to measuring distances live.
+    """
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='discount_zone_days')
+    day = models.CharField(max_length=10)  # Same "YYYY-MM-DD" key as ProviderAvailability.day_of_week
+    built_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('provider', 'day')
+
+    def __str__(self):
+        return f"{self.provider.business_name} - {self.day}"
+
+class DiscountZone(models.Model):
+    """
+    The area around an appointment whose consumers fall within a discount tier.
+
+    Each located, active appointment gets one disk per tier, with the tier's
+    outer distance as radius. The appointment's times are copied so the
+    slots it makes discountable (those within the adjacency window before
+    or after it) can be found without loading the appointment.
+    """
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.CASCADE, related_name='discount_zones')
+    appointment = models.ForeignKey('Appointment', on_delete=models.CASCADE, related_name='discount_zones')
+    day = models.CharField(max_length=10)
+    tier = models.PositiveSmallIntegerField()
+    start_time = models.DateTimeField()
+    end_time = models.DateTimeField()
+    area = gis_models.PolygonField(geography=True)  # Spatially indexed (GiST) by default
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['provider', 'day'], name='discountzone_provider_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider.business_name} - {self.day} - tier {self.tier}"
+
+class GeocodeJob(models.Model):
+    """
+    A queued address lookup, run by the geocode_worker management command.
+
+    Workers claim due jobs by pushing run_after forward by a lease, so a
+    worker that dies mid-lookup only delays the job. Failed lookups are
+    retried with backoff until GEOCODE_JOB_MAX_ATTEMPTS is reached.
+    """
+    TARGET_CHOICES = (
+        ('appointment', 'Appointment'),
+        ('user', 'User'),
+        ('provider', 'Service Provider'),
+    )
+    STATUS_CHOICES = (
+        ('pending', 'Pending'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    )
+    target_type = models.CharField(max_length=20, choices=TARGET_CHOICES)
+    target_id = models.CharField(max_length=40)  # Appointment ids are UUIDs, the others integers
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Workers look for pending jobs that are due
+            models.Index(fields=['status', 'run_after'], name='geocodejob_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.target_type} {self.target_id} - {self.status}"
+
+class GeocodeCache(models.Model):
+    """
+    Geocoder results keyed by normalized address (see geo_utils.normalize_address).
+
+    Addresses that could not be found are kept too, with null coordinates
+    and an expiry, so they are not looked up again on every save.
+    """
+    address_key = models.CharField(max_length=512, unique=True)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
+    expires_at = models.DateTimeField(null=True, blank=True)  # Only set for addresses that were not found
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.address_key
+
+class SyncTombstone(models.Model):
+    """
+    Records that a synced row was deleted, so the sync endpoint can tell
+    clients to drop it.
+
+    The provider and consumer say who should hear about it; they are set to
+    null rather than deleted with their accounts, so the other side still
+    does. Tombstones older than SYNC_TOMBSTONE_DAYS are pruned by the
+    prune_sync_tombstones command, and clients that last synced before that
+    are sent everything again.
+    """
+    OBJECT_CHOICES = (
+        ('appointment', 'Appointment'),
+        ('availability', 'Provider Availability'),
+    )
+    object_type = models.CharField(max_length=20, choices=OBJECT_CHOICES)
+    object_id = models.CharField(max_length=40)  # Appointment ids are UUIDs, availability ids integers
+    provider = models.ForeignKey(ServiceProvider, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    consumer = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['provider', 'deleted_at'], name='tombstone_provider_idx'),
+            models.Index(fields=['consumer', 'deleted_at'], name='tombstone_consumer_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.object_type} {self.object_id} deleted at {self.deleted_at}"
+
 class ProximityDiscountConfig(models.Model):
     """
     Configuration for proximity-based discounts for a specific provider.
@@ -0,0 +1,11 @@
+# Scheduling package for Viciniti
+from .slot_engine import *
+from .vectorized import *
+from .rules import *
+from .queries import *
+from .availability import *
+from .free_slots import *
+from .cache import *
+from .discounts import *
+from .quotes import *
+from .zones import *
@@ -0,0 +1,192 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from .queries import (
+    ACTIVE_APPOINTMENT_STATUSES, availability_window, load_day_availabilities, load_window_appointments
+)
+from .slot_engine import (
+    BUFFER_MINUTES, DISCOUNT_ADJACENCY_MINUTES, BlockedIntervals, day_free_intervals, group_availability_by_day,
+    iter_free_slots
+)
+from .vectorized import iter_free_slots_vectorized, np
+
+__all__ = [
+    'DEFAULT_AVAILABILITY_DAYS',
+    'AVAILABILITY_MAX_DAYS',
+    'AVAILABILITY_STREAM_CHUNK_DAYS',
+    'DISCOUNT_APPOINTMENT_STATUSES',
+    'DiscountCalendar',
+    'free_slot_iterator',
+    'load_provider_calendar',
+    'load_discount_calendar',
+    'compute_provider_free_intervals',
+    'compute_provider_slots',
+    'compute_service_slots'
+]
+
+# Days shown when a request does not ask for a specific horizon
+DEFAULT_AVAILABILITY_DAYS = 14
+
+# Longest run of days a single availability request may ask for
+AVAILABILITY_MAX_DAYS = getattr(settings, 'AVAILABILITY_MAX_DAYS', 60)
+
+# Days computed per step when availability is streamed back day by day
+AVAILABILITY_STREAM_CHUNK_DAYS = getattr(settings, 'AVAILABILITY_STREAM_CHUNK_DAYS', 7)
+
+# Appointments that block slots and make the slots next to them discountable when pricing
+DISCOUNT_APPOINTMENT_STATUSES = ('pending', 'confirmed')
+
+# What discounted prices of a provider's slots depend on, see load_discount_calendar
+DiscountCalendar = namedtuple(
+    'DiscountCalendar', ['availability_by_day', 'blocked', 'appointments', 'appointment_query']
+)
+
+
+def free_slot_iterator(engine=None):
+    """
+    Return the free-slot generator for the configured engine.
+
+    Both engines take the same arguments as iter_free_slots and yield the
+    same slots.
+
+    Args:
+        engine: 'python' or 'numpy'; defaults to settings.AVAILABILITY_SLOT_ENGINE
+    """
+    engine = engine or getattr(settings, 'AVAILABILITY_SLOT_ENGINE', 'python')
+    if engine == 'python':
+        return iter_free_slots
+    if engine == 'numpy':
+        if np is None:
+            raise ImproperlyConfigured("AVAILABILITY_SLOT_ENGINE = 'numpy' requires numpy to be installed")
+        return iter_free_slots_vectorized
+    raise ImproperlyConfigured(f"Unknown AVAILABILITY_SLOT_ENGINE {engine!r}, expected 'python' or 'numpy'")
+
+
+def load_provider_calendar(provider, day_keys):
+    """
+    Load what a provider's slots depend on for the requested days.
+
+    Returns:
+        ({day_key: [(start, end), ...]}, BlockedIntervals of the provider's
+        active appointments, padded by BUFFER_MINUTES)
+    """
+    availabilities = load_day_availabilities(provider, day_keys)
+
+    existing_appointments = load_window_appointments(
+        provider,
+        availability_window(availabilities),
+        statuses=ACTIVE_APPOINTMENT_STATUSES,
+        margin_minutes=BUFFER_MINUTES
+    )
+    blocked = BlockedIntervals(
+        existing_appointments.values_list('start_time', 'end_time'),
+        buffer_minutes=BUFFER_MINUTES
+    )
+    return group_availability_by_day(availabilities), blocked
+
+
+def load_discount_calendar(provider, day_keys):
+    """
+    Load what a provider's discounted slot prices depend on for the requested days.
+
+    Like load_provider_calendar, but the appointments are also kept since
+    those next to a slot can earn it a discount, so the window is widened to
+    DISCOUNT_ADJACENCY_MINUTES when that is larger than the buffer.
+
+    Returns:
+        DiscountCalendar of {day_key: [(start, end), ...]}, the BlockedIntervals
+        of the pending and confirmed appointments padded by BUFFER_MINUTES, the appointments
+        themselves, and the unevaluated query that loaded them (for spatial
+        filtering in the database)
+    """
+    availabilities = load_day_availabilities(provider, day_keys)
+
+    appointment_query = load_window_appointments(
+        provider,
+        availability_window(availabilities),
+        statuses=DISCOUNT_APPOINTMENT_STATUSES,
+        margin_minutes=max(BUFFER_MINUTES, DISCOUNT_ADJACENCY_MINUTES)
+    )
+    appointments = list(appointment_query)
+    blocked = BlockedIntervals(
+        ((appointment.start_time, appointment.end_time) for appointment in appointments),
+        buffer_minutes=BUFFER_MINUTES
+    )
+    return DiscountCalendar(group_availability_by_day(availabilities), blocked, appointments, appointment_query)
+
+
+def compute_provider_free_intervals(provider, day_keys, now=None):
+    """
+    Compute a provider's free intervals once for the requested days.
+
+    Slots of any duration can then be derived with iter_interval_slots
+    without touching the appointments again.
+
+    Returns:
+        {day_key: [(block_start, [(gap_start, gap_end), ...]), ...]}
+        with an entry for every day
+    """
+    availability_by_day, blocked = load_provider_calendar(provider, day_keys)
+    today_key = now.date().strftime('%Y-%m-%d') if now is not None else None
+    return {
+        day_key: day_free_intervals(
+            availability_by_day.get(day_key, []),
+            blocked,
+            now=now if day_key == today_key else None
+        )
+        for day_key in day_keys
+    }
+
+
+def compute_provider_slots(provider, services, day_keys, now=None):
+    """
+    Compute the free slots of several services of one provider.
+
+    The provider's availability and appointments are loaded once and shared
+    by every service; services with the same duration share one computation.
+
+    Args:
+        provider: ServiceProvider the services belong to
+        services: iterable of Service objects of that provider
+        day_keys: list of "YYYY-MM-DD" day keys
+        now: current time; when given, the day matching now's date is trimmed
+             to the booking lead time
+
+    Returns:
+        {service_id: {day_key: [(slot_id, start, end), ...]}} with an entry
+        for every service and day
+    """
+    availability_by_day, blocked = load_provider_calendar(provider, day_keys)
+
+    today_key = now.date().strftime('%Y-%m-%d') if now is not None else None
+    iter_day_slots = free_slot_iterator()
+
+    slots_by_duration = {}
+    slots_by_service = {}
+    for service in services:
+        if service.duration not in slots_by_duration:
+            slots_by_duration[service.duration] = {
+                day_key: list(iter_day_slots(
+                    day_key,
+                    availability_by_day.get(day_key, []),
+                    service.duration,
+                    blocked,
+                    BUFFER_MINUTES,
+                    now=now if day_key == today_key else None
+                ))
+                for day_key in day_keys
+            }
+        slots_by_service[service.id] = slots_by_duration[service.duration]
+    return slots_by_service
+
+
+def compute_service_slots(service, day_keys, now=None):
+    """
+    Compute the free slots of a service for the requested days.
+
+    Returns:
+        {day_key: [(slot_id, start, end), ...]} with an entry for every day
+    """
+    return compute_provider_slots(service.provider, [service], day_keys, now=now)[service.id]
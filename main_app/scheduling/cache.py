@@ -0,0 +1,239 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+__all__ = [
+    'AVAILABILITY_CACHE_TIMEOUT',
+    'AVAILABILITY_CACHE_TODAY_TIMEOUT',
+    'AVAILABILITY_CACHE_ENABLED',
+    'shared_cache_configured',
+    'cached_service_provider_id',
+    'remember_service_provider',
+    'location_bucket',
+    'AvailabilityCacheEntry',
+    'invalidate_cached_days',
+    'invalidate_cached_service',
+    'invalidate_cached_discounts',
+    'invalidate_cached_rules'
+]
+
+# How long computed availability days stay cached (seconds). Today's entry
+# expires sooner because its slots move with the booking lead time.
+AVAILABILITY_CACHE_TIMEOUT = getattr(settings, 'AVAILABILITY_CACHE_TIMEOUT', 60 * 60)
+AVAILABILITY_CACHE_TODAY_TIMEOUT = getattr(settings, 'AVAILABILITY_CACHE_TODAY_TIMEOUT', 60)
+
+# Consumer coordinates are rounded to this many decimals (about 11 meters)
+# so nearby consumers share discount entries
+LOCATION_BUCKET_DECIMALS = 4
+
+KEY_PREFIX = 'availability'
+
+# Backends whose data lives inside one process. Writes are evicted by
+# bumping generations in the cache, which such a backend would only do for
+# the process that made the write (one gunicorn worker, or the geocode worker).
+PER_PROCESS_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def shared_cache_configured():
+    """Whether the default cache is shared by every process, e.g. Redis or Memcached"""
+    return settings.CACHES['default']['BACKEND'] not in PER_PROCESS_CACHE_BACKENDS
+
+
+# Availability caching is on only with a shared cache; asking for it
+# without one is a configuration error rather than silently stale data
+AVAILABILITY_CACHE_ENABLED = getattr(settings, 'AVAILABILITY_CACHE_ENABLED', None)
+if AVAILABILITY_CACHE_ENABLED is None:
+    AVAILABILITY_CACHE_ENABLED = shared_cache_configured()
+elif AVAILABILITY_CACHE_ENABLED and not shared_cache_configured():
+    raise ImproperlyConfigured(
+        "AVAILABILITY_CACHE_ENABLED needs a cache shared by all processes; "
+        f"{settings.CACHES['default']['BACKEND']} keeps a separate copy in each one"
+    )
+
+
+def _service_provider_key(service_id):
+    return f"{KEY_PREFIX}:service:{service_id}:provider"
+
+
+def _service_generation_key(service_id):
+    return f"{KEY_PREFIX}:gen:service:{service_id}"
+
+
+def _day_generation_key(provider_id, day_key):
+    return f"{KEY_PREFIX}:gen:provider:{provider_id}:day:{day_key}"
+
+
+def _discount_generation_key(provider_id):
+    return f"{KEY_PREFIX}:gen:discount:{provider_id}"
+
+
+def _rules_generation_key(provider_id):
+    return f"{KEY_PREFIX}:gen:rules:{provider_id}"
+
+
+def _new_generation():
+    return uuid.uuid4().hex
+
+
+def _read_generations(keys):
+    """
+    Read generation tokens, creating any that are missing.
+
+    A missing token is replaced with a fresh random one rather than a fixed
+    default, so entries written under an evicted token can never be served.
+    """
+    generations = cache.get_many(keys)
+    missing = [key for key in keys if key not in generations]
+    if missing:
+        for key in missing:
+            cache.add(key, _new_generation(), None)
+        generations.update(cache.get_many(missing))
+    return generations
+
+
+def _bump(keys):
+    if AVAILABILITY_CACHE_ENABLED:
+        cache.set_many({key: _new_generation() for key in keys}, None)
+
+
+def cached_service_provider_id(service_id):
+    """Return the provider id of a service if it is known to the cache"""
+    return cache.get(_service_provider_key(service_id))
+
+
+def remember_service_provider(service_id, provider_id):
+    cache.set(_service_provider_key(service_id), provider_id, None)
+
+
+def discount_generation(provider_id):
+    """
+    Current discount generation of a provider; changes whenever its discount
+    config does. None when availability caching is off.
+    """
+    if not AVAILABILITY_CACHE_ENABLED:
+        return None
+    return _read_generations([_discount_generation_key(provider_id)])[_discount_generation_key(provider_id)]
+
+
+def rule_table_cache_key(provider_id):
+    """
+    Cache key of a provider's compiled availability rules, current until the
+    rules change. None when availability caching is off.
+    """
+    if not AVAILABILITY_CACHE_ENABLED:
+        return None
+    generation = _read_generations([_rules_generation_key(provider_id)])[_rules_generation_key(provider_id)]
+    return f"{KEY_PREFIX}:rules:{provider_id}:{generation}"
+
+
+def location_bucket(location):
+    """Cache key component for a consumer location (or the lack of one)"""
+    if location is None:
+        return 'none'
+    return f"{round(location.y, LOCATION_BUCKET_DECIMALS)},{round(location.x, LOCATION_BUCKET_DECIMALS)}"
+
+
+class AvailabilityCacheEntry:
+    """
+    Cached availability of one service over a run of days.
+
+    Each day is stored under a key built from the service, the day and the
+    generation tokens that cover it. Writes bump the generations of only the
+    provider-days they touch, so the stale entries are simply never read
+    again. Generations are read when the entry is created, before any slot
+    computation, so a write racing with the computation cannot be hidden.
+
+    With availability caching off, get() always misses and set() does nothing.
+    """
+
+    def __init__(self, service_id, provider_id, day_keys, variant='plain', discount=False):
+        """
+        Args:
+            service_id: id of the service
+            provider_id: id of the service's provider
+            day_keys: list of "YYYY-MM-DD" day keys, today first
+            variant: distinguishes response flavours, e.g. a consumer location bucket
+            discount: also key the entry on the provider's discount config generation
+        """
+        self.day_keys = list(day_keys)
+        self.variant = variant
+        if not AVAILABILITY_CACHE_ENABLED:
+            self._keys = None
+            return
+
+        generation_keys = [_service_generation_key(service_id), _rules_generation_key(provider_id)]
+        generation_keys += [_day_generation_key(provider_id, day_key) for day_key in self.day_keys]
+        if discount:
+            generation_keys.append(_discount_generation_key(provider_id))
+        generations = _read_generations(generation_keys)
+
+        shared = f"{generations[_service_generation_key(service_id)]}:{generations[_rules_generation_key(provider_id)]}"
+        if discount:
+            shared = f"{shared}:{generations[_discount_generation_key(provider_id)]}"
+
+        self._keys = {
+            day_key: (
+                f"{KEY_PREFIX}:{variant}:{service_id}:{day_key}:"
+                f"{shared}:{generations[_day_generation_key(provider_id, day_key)]}"
+            )
+            for day_key in self.day_keys
+        }
+
+    def version(self):
+        """
+        Token that changes whenever any generation covering these days does,
+        e.g. for an ETag. Costs nothing beyond the generation read in __init__.
+        None when availability caching is off.
+        """
+        if self._keys is None:
+            return None
+        return '|'.join(self._keys[day_key] for day_key in self.day_keys)
+
+    def get(self):
+        """Return {day_key: slots} when every day is cached, otherwise None"""
+        if self._keys is None:
+            return None
+        found = cache.get_many(list(self._keys.values()))
+        if len(found) != len(self._keys):
+            return None
+        return {day_key: found[key] for day_key, key in self._keys.items()}
+
+    def set(self, slots_by_day, today_key=None):
+        """Store computed days; today's day gets the short timeout"""
+        if self._keys is None:
+            return
+        regular = {}
+        for day_key, slots in slots_by_day.items():
+            if day_key not in self._keys:
+                continue
+            if day_key == today_key:
+                cache.set(self._keys[day_key], slots, AVAILABILITY_CACHE_TODAY_TIMEOUT)
+            else:
+                regular[self._keys[day_key]] = slots
+        cache.set_many(regular, AVAILABILITY_CACHE_TIMEOUT)
+
+
+def invalidate_cached_days(provider_id, day_keys):
+    """Evict cached availability of every service of a provider on the given days"""
+    if day_keys:
+        _bump([_day_generation_key(provider_id, day_key) for day_key in day_keys])
+
+
+def invalidate_cached_service(service_id):
+    """Evict every cached day of one service"""
+    _bump([_service_generation_key(service_id)])
+
+
+def invalidate_cached_discounts(provider_id):
+    """Evict every cached discount response of a provider"""
+    _bump([_discount_generation_key(provider_id)])
+
+
+def invalidate_cached_rules(provider_id):
+    """Evict a provider's compiled availability rules and every cached day built from them"""
+    _bump([_rules_generation_key(provider_id)])
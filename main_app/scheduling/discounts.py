@@ -0,0 +1,130 @@
+from ..models import ProximityDiscountConfig
+from .cache import discount_generation
+from .vectorized import np
+
+__all__ = [
+    'TIER_COUNT',
+    'MAX_DISCOUNT_APPOINTMENTS',
+    'CompiledDiscountTable',
+    'provider_discount_table'
+]
+
+TIER_COUNT = 4
+
+# Appointment counts beyond this earn the same discount
+MAX_DISCOUNT_APPOINTMENTS = 5
+
+# provider_id -> (discount generation or config updated_at, CompiledDiscountTable or None), shared by the whole process
+_compiled_tables = {}
+
+
+class CompiledDiscountTable:
+    """
+    Immutable snapshot of a ProximityDiscountConfig for fast lookups.
+
+    Tier bounds are kept as (min, max) yard pairs and discounts as a
+    4 x 5 matrix indexed by tier and appointment count, so a lookup is a
+    few comparisons and a tuple index instead of a getattr on a built field
+    name. Results match ProximityDiscountConfig.get_discount_for_distance_and_count.
+    """
+
+    __slots__ = ('is_active', 'max_distance', 'tier_bounds', 'matrix', '_matrix_array')
+
+    def __init__(self, config):
+        """
+        Args:
+            config: ProximityDiscountConfig to compile
+        """
+        self.is_active = config.is_active
+        # The discount search radius; the largest tier's outer edge
+        self.max_distance = config.tier4_max_distance
+        self.tier_bounds = (
+            (float('-inf'), config.tier1_distance),
+            (config.tier2_min_distance, config.tier2_max_distance),
+            (config.tier3_min_distance, config.tier3_max_distance),
+            (config.tier4_min_distance, config.tier4_max_distance),
+        )
+        self.matrix = tuple(
+            tuple(
+                getattr(config, f"tier{tier}_{count}appt_discount")
+                for count in range(1, MAX_DISCOUNT_APPOINTMENTS + 1)
+            )
+            for tier in range(1, TIER_COUNT + 1)
+        )
+        self._matrix_array = np.array(self.matrix, dtype=np.int64) if np is not None else None
+
+    def __setattr__(self, name, value):
+        if hasattr(self, '_matrix_array'):
+            raise AttributeError('CompiledDiscountTable is immutable')
+        super().__setattr__(name, value)
+
+    def discount(self, distance_yards, appointment_count):
+        """Discount percentage for one (distance, appointment count) pair"""
+        count = min(max(appointment_count, 1), MAX_DISCOUNT_APPOINTMENTS)
+        for tier, (low, high) in enumerate(self.tier_bounds):
+            if low <= distance_yards <= high:
+                return self.matrix[tier][count - 1]
+        # Beyond maximum distance, no discount
+        return 0
+
+    def discounts(self, distances_yards, appointment_counts):
+        """
+        Discount percentages for many (distance, appointment count) pairs at once.
+
+        Uses numpy when it is installed, one tier mask at a time; otherwise
+        falls back to discount() per pair.
+
+        Returns:
+            list of ints, in the order of the inputs
+        """
+        if self._matrix_array is None:
+            return [
+                self.discount(distance, count)
+                for distance, count in zip(distances_yards, appointment_counts)
+            ]
+
+        distances = np.asarray(distances_yards, dtype=np.float64)
+        counts = np.clip(np.asarray(appointment_counts, dtype=np.int64), 1, MAX_DISCOUNT_APPOINTMENTS)
+        result = np.zeros(len(distances), dtype=np.int64)
+        unassigned = np.ones(len(distances), dtype=bool)
+        # Earlier tiers win where configured ranges overlap, as in the model method
+        for tier, (low, high) in enumerate(self.tier_bounds):
+            in_tier = unassigned & (distances >= low) & (distances <= high)
+            result[in_tier] = self._matrix_array[tier, counts[in_tier] - 1]
+            unassigned &= ~in_tier
+        return result.tolist()
+
+    def tier_discounts(self, tiers, appointment_counts):
+        """
+        Discount percentages for (tier, appointment count) pairs, for callers
+        that already know the tier (e.g. from discount zones). Tier 0 means none.
+        """
+        return [
+            self.matrix[tier - 1][min(max(count, 1), MAX_DISCOUNT_APPOINTMENTS) - 1] if tier else 0
+            for tier, count in zip(tiers, appointment_counts)
+        ]
+
+
+def provider_discount_table(provider_id):
+    """
+    Return the provider's compiled discount table, or None without a config.
+
+    Tables are compiled once and kept for the life of the process. With a
+    shared cache a table is reused until a ProximityDiscountConfig save or
+    delete bumps the provider's discount generation; without one it is
+    reused while the config's updated_at is unchanged, so only that column
+    is read instead of the whole row.
+    """
+    generation = discount_generation(provider_id)
+    if generation is None:
+        generation = ('updated_at', ProximityDiscountConfig.objects.filter(
+            provider_id=provider_id
+        ).values_list('updated_at', flat=True).first())
+    compiled = _compiled_tables.get(provider_id)
+    if compiled is not None and compiled[0] == generation:
+        return compiled[1]
+
+    config = ProximityDiscountConfig.objects.filter(provider_id=provider_id).first()
+    table = CompiledDiscountTable(config) if config is not None else None
+    _compiled_tables[provider_id] = (generation, table)
+    return table
@@ -0,0 +1,178 @@
+from django.db import connection, transaction
+
+from ..models import FreeSlot, FreeSlotDay
+from .availability import compute_service_slots
+from .queries import affected_day_keys
+from .slot_engine import BUFFER_MINUTES
+
+__all__ = [
+    'materialize_free_slots',
+    'read_free_slots',
+    'invalidate_free_slot_days',
+    'invalidate_free_slots',
+    'invalidate_service_free_slots'
+]
+
+
+# Second key of the advisory lock that stands for every day of a provider
+ALL_DAYS_LOCK = 0
+
+
+def _day_lock(day_key):
+    """Second advisory lock key of a day, e.g. 20240615 for 2024-06-15"""
+    return int(day_key.replace('-', ''))
+
+
+def _lock_days(provider_id, day_keys):
+    """
+    Take the exclusive locks of a provider's days, held until the transaction
+    ends. Invalidations take them before dropping days, so they wait for any
+    build of those days to be stored first and drop it.
+    """
+    with connection.cursor() as cursor:
+        if day_keys is None:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [provider_id, ALL_DAYS_LOCK])
+            return
+        for day_key in sorted(day_keys):
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, %s)', [provider_id, _day_lock(day_key)])
+
+
+def _try_lock_build(provider_id, day_keys):
+    """
+    Try to take the locks a build of these days needs, without waiting.
+    Returns False when an invalidation holds any of them.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_try_advisory_xact_lock_shared(%s, %s)', [provider_id, ALL_DAYS_LOCK])
+        if not cursor.fetchone()[0]:
+            return False
+        for day_key in sorted(day_keys):
+            cursor.execute('SELECT pg_try_advisory_xact_lock(%s, %s)', [provider_id, _day_lock(day_key)])
+            if not cursor.fetchone()[0]:
+                return False
+    return True
+
+
+def _built_days(service, day_keys):
+    return set(FreeSlotDay.objects.filter(
+        service=service,
+        day__in=day_keys
+    ).values_list('day', flat=True))
+
+
+def materialize_free_slots(service, day_keys):
+    """
+    Make sure the free slots of a service are stored for every requested day.
+
+    Days that were already built are left alone; missing days are computed
+    in one pass and written with their FreeSlotDay markers. The computation
+    and the write happen under the days' advisory locks, so a booking or
+    availability change cannot slip in between them and leave stale slots
+    stored. Builds never wait: when a change is dropping some of the days
+    right now, the slots are computed but not stored.
+
+    Returns:
+        {day_key: [(slot_id, start, end), ...]} for days computed but not
+        stored; read every other day with read_free_slots
+    """
+    built_days = _built_days(service, day_keys)
+    missing_days = [day_key for day_key in day_keys if day_key not in built_days]
+    if not missing_days:
+        return {}
+
+    with transaction.atomic():
+        if not _try_lock_build(service.provider_id, missing_days):
+            return compute_service_slots(service, missing_days)
+
+        # Another request may have built some of the days since the check above
+        built_days = _built_days(service, missing_days)
+        missing_days = [day_key for day_key in missing_days if day_key not in built_days]
+        if not missing_days:
+            return {}
+
+        slots_by_day = compute_service_slots(service, missing_days)
+        _store_free_slots(service, missing_days, slots_by_day)
+    return {}
+
+
+def _store_free_slots(service, missing_days, slots_by_day):
+    """Write computed days and their FreeSlotDay markers (inside the build's locks)"""
+    slot_rows = []
+    for day_key, slots in slots_by_day.items():
+        for position, (slot_id, start, end) in enumerate(slots):
+            slot_rows.append(FreeSlot(
+                provider_id=service.provider_id,
+                service=service,
+                day=day_key,
+                position=position,
+                slot_id=slot_id,
+                start_time=start,
+                end_time=end
+            ))
+
+    FreeSlotDay.objects.bulk_create([
+        FreeSlotDay(provider_id=service.provider_id, service=service, day=day_key)
+        for day_key in missing_days
+    ])
+    FreeSlot.objects.bulk_create(slot_rows)
+
+
+def read_free_slots(service, day_keys):
+    """
+    Read materialized slots for a contiguous run of days with one range scan.
+
+    Returns:
+        {day_key: [(slot_id, start, end), ...]} with an entry for every day
+    """
+    slots_by_day = {day_key: [] for day_key in day_keys}
+    if not day_keys:
+        return slots_by_day
+
+    rows = FreeSlot.objects.filter(
+        service=service,
+        day__range=(day_keys[0], day_keys[-1])
+    ).order_by('day', 'position').values_list('day', 'slot_id', 'start_time', 'end_time')
+
+    for day_key, slot_id, start, end in rows:
+        if day_key in slots_by_day:
+            slots_by_day[day_key].append((slot_id, start, end))
+    return slots_by_day
+
+
+def _drop_days(provider_id, day_keys=None, **filters):
+    """Drop stored days of a provider (the given days, or all), under their locks"""
+    filters['provider_id'] = provider_id
+    if day_keys is not None:
+        filters['day__in'] = day_keys
+    with transaction.atomic():
+        _lock_days(provider_id, day_keys)
+        FreeSlot.objects.filter(**filters).delete()
+        FreeSlotDay.objects.filter(**filters).delete()
+
+
+def invalidate_free_slot_days(provider_id, day_keys):
+    """Drop a provider's materialized slots on the given days; they are rebuilt on the next read"""
+    if day_keys:
+        _drop_days(provider_id, list(day_keys))
+
+
+def invalidate_free_slots(provider_id, start_time=None, end_time=None):
+    """
+    Drop materialized slots a booking change may have affected.
+
+    With a time range, only the provider's days whose availability blocks
+    touch the buffered range are dropped; without one, every day of the
+    provider is dropped. Dropped days are rebuilt on the next read.
+    """
+    if start_time is None or end_time is None:
+        _drop_days(provider_id)
+        return
+
+    invalidate_free_slot_days(
+        provider_id, affected_day_keys(provider_id, start_time, end_time, margin_minutes=BUFFER_MINUTES)
+    )
+
+
+def invalidate_service_free_slots(service_id, provider_id):
+    """Drop every materialized day of one service, e.g. after its duration changed"""
+    _drop_days(provider_id, service_id=service_id)
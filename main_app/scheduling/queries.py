@@ -0,0 +1,141 @@
+import datetime
+
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+
+from ..models import Appointment, ProviderAvailability
+from .rules import expand_rules, provider_rule_table
+
+__all__ = [
+    'ACTIVE_APPOINTMENT_STATUSES',
+    'YARDS_PER_METER',
+    'availability_day_keys',
+    'load_day_availabilities',
+    'availability_window',
+    'load_window_appointments',
+    'nearby_appointment_distances',
+    'affected_day_keys'
+]
+
+# Appointment statuses that occupy a provider's time
+ACTIVE_APPOINTMENT_STATUSES = ('pending', 'confirmed', 'completed')
+
+# Discount tiers are configured in yards
+YARDS_PER_METER = 1.09361
+
+
+def availability_day_keys(start_date, days):
+    """Return the day_of_week keys ('YYYY-MM-DD') for `days` days from start_date"""
+    return [
+        (start_date + datetime.timedelta(days=offset)).strftime('%Y-%m-%d')
+        for offset in range(days)
+    ]
+
+
+def load_day_availabilities(provider, day_keys):
+    """
+    Fetch the provider's availability blocks for the requested days only.
+
+    Days with dated ProviderAvailability rows use those rows; every other
+    day is filled in from the provider's weekly AvailabilityRules.
+    """
+    availabilities = list(ProviderAvailability.objects.filter(
+        provider=provider,
+        day_of_week__in=day_keys
+    ))
+    dated_days = {avail.day_of_week for avail in availabilities}
+    rule_days = [day_key for day_key in day_keys if day_key not in dated_days]
+    if rule_days:
+        availabilities += expand_rules(provider_rule_table(provider.pk), rule_days)
+    return availabilities
+
+
+def availability_window(availabilities):
+    """
+    Return the (earliest start, latest end) covered by availability rows,
+    or None when there are none.
+    """
+    if not availabilities:
+        return None
+    return (
+        min(avail.start_time for avail in availabilities),
+        max(avail.end_time for avail in availabilities)
+    )
+
+
+def load_window_appointments(provider, window, statuses=ACTIVE_APPOINTMENT_STATUSES, margin_minutes=0):
+    """
+    Fetch the provider's appointments that can affect slots inside `window`.
+
+    Only appointments overlapping the window widened by `margin_minutes` on
+    both sides are returned, so the query cost follows the size of the
+    requested horizon rather than the provider's whole booking history.
+
+    Args:
+        provider: ServiceProvider whose appointments to load
+        window: (start, end) tuple from availability_window(), or None
+        statuses: appointment statuses to include
+        margin_minutes: widest buffer/adjacency the caller applies around
+                        an appointment
+    """
+    if window is None:
+        return Appointment.objects.none()
+
+    margin = datetime.timedelta(minutes=margin_minutes)
+    window_start, window_end = window
+    return Appointment.objects.filter(
+        service__provider=provider,
+        status__in=statuses,
+        start_time__lt=window_end + margin,
+        end_time__gt=window_start - margin
+    )
+
+
+def nearby_appointment_distances(appointments, location, max_distance_yards):
+    """
+    Measure how far the consumer is from each appointment, in one query.
+
+    ST_DWithin on the geography `location` column (served by its GiST
+    index) keeps only appointments within `max_distance_yards`, and
+    Distance annotates true geodesic meters.
+
+    Args:
+        appointments: Appointment queryset to search, e.g. from load_window_appointments
+        location: consumer Point
+        max_distance_yards: outer edge of the largest discount tier
+
+    Returns:
+        {appointment_id: distance_yards} for appointments with a location in range
+    """
+    nearby = appointments.filter(
+        location__dwithin=(location, D(m=max_distance_yards / YARDS_PER_METER))
+    ).annotate(
+        distance=Distance('location', location)
+    ).values_list('id', 'distance')
+    return {appointment_id: distance.m * YARDS_PER_METER for appointment_id, distance in nearby}
+
+
+def affected_day_keys(provider_id, start_time, end_time, margin_minutes=0):
+    """
+    Return the provider's day keys whose availability blocks come within
+    `margin_minutes` of [start_time, end_time), i.e. the days whose slots an
+    appointment in that range can change.
+    """
+    margin = datetime.timedelta(minutes=margin_minutes)
+    range_start = start_time - margin
+    range_end = end_time + margin
+    day_keys = set(ProviderAvailability.objects.filter(
+        provider_id=provider_id,
+        start_time__lt=range_end,
+        end_time__gt=range_start
+    ).values_list('day_of_week', flat=True).distinct())
+
+    # Days covered by weekly rules, checked one day either side of the range
+    candidate_days = availability_day_keys(
+        range_start.date() - datetime.timedelta(days=1),
+        (range_end.date() - range_start.date()).days + 3
+    )
+    for block in expand_rules(provider_rule_table(provider_id), candidate_days):
+        if block.start_time < range_end and block.end_time > range_start:
+            day_keys.add(block.day_of_week)
+    return list(day_keys)
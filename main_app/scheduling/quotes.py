@@ -0,0 +1,77 @@
+from .discounts import MAX_DISCOUNT_APPOINTMENTS
+from .queries import YARDS_PER_METER
+from .vectorized import np
+
+__all__ = [
+    'haversine_yards',
+    'quote_slot_discounts'
+]
+
+# Mean earth radius used for great-circle distances
+EARTH_RADIUS_METERS = 6371008.8
+
+
+def haversine_yards(point_lats, point_lngs, target_lats, target_lngs):
+    """
+    Great-circle distances between every point and every target.
+
+    Args:
+        point_lats, point_lngs: sequences of point coordinates in degrees
+        target_lats, target_lngs: sequences of target coordinates in degrees
+
+    Returns:
+        float64 array of yards with shape (points, targets)
+    """
+    lat1 = np.radians(np.asarray(point_lats, dtype=np.float64))[:, None]
+    lng1 = np.radians(np.asarray(point_lngs, dtype=np.float64))[:, None]
+    lat2 = np.radians(np.asarray(target_lats, dtype=np.float64))[None, :]
+    lng2 = np.radians(np.asarray(target_lngs, dtype=np.float64))[None, :]
+
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    meters = 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return meters * YARDS_PER_METER
+
+
+def quote_slot_discounts(discount_table, distances, slot_adjacency):
+    """
+    Discount percentage of every slot for every point.
+
+    Follows the availability view's rule: among a slot's time-adjacent
+    appointments, those within the largest tier count as nearby; the
+    closest one picks the tier and how many there are (capped at 5) picks
+    the column. Slots with the same adjacent appointments are priced once.
+
+    Args:
+        discount_table: CompiledDiscountTable of the provider
+        distances: (points, appointments) array of yards, e.g. from haversine_yards
+        slot_adjacency: per slot, a tuple of the column indexes of its
+                        time-adjacent appointments
+
+    Returns:
+        int64 array with shape (points, slots)
+    """
+    point_count = distances.shape[0]
+    result = np.zeros((point_count, len(slot_adjacency)), dtype=np.int64)
+    if not discount_table.is_active:
+        return result
+
+    slots_by_adjacency = {}
+    for slot_position, columns in enumerate(slot_adjacency):
+        if columns:
+            slots_by_adjacency.setdefault(columns, []).append(slot_position)
+
+    for columns, slot_positions in slots_by_adjacency.items():
+        adjacent = distances[:, list(columns)]
+        nearby = adjacent <= discount_table.max_distance
+        counts = nearby.sum(axis=1)
+        closest = np.where(nearby, adjacent, np.inf).min(axis=1)
+
+        discounts = np.zeros(point_count, dtype=np.int64)
+        qualifying = counts > 0
+        if qualifying.any():
+            discounts[qualifying] = discount_table.discounts(
+                closest[qualifying],
+                np.minimum(counts[qualifying], MAX_DISCOUNT_APPOINTMENTS)
+            )
+        result[:, slot_positions] = discounts[:, None]
+    return result
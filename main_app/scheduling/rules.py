@@ -0,0 +1,86 @@
+from collections import namedtuple
+import datetime
+
+from django.core.cache import cache
+from django.utils import timezone
+
+from ..models import AvailabilityRule
+from .cache import AVAILABILITY_CACHE_TIMEOUT, rule_table_cache_key
+
+__all__ = [
+    'ExpandedAvailability',
+    'compile_rules',
+    'provider_rule_table',
+    'expand_rules'
+]
+
+# One rule laid onto a concrete day. It has the attributes the slot engine
+# reads from ProviderAvailability rows, so both can be mixed freely.
+ExpandedAvailability = namedtuple('ExpandedAvailability', ['day_of_week', 'start_time', 'end_time'])
+
+
+def compile_rules(rules):
+    """
+    Index availability rules by weekday.
+
+    Args:
+        rules: iterable of AvailabilityRule objects
+
+    Returns:
+        {weekday: [(start_time, end_time, valid_from, valid_until, exceptions), ...]}
+        with each weekday's rules ordered by start time
+    """
+    table = {}
+    for rule in sorted(rules, key=lambda rule: (rule.start_time, rule.pk or 0)):
+        table.setdefault(rule.weekday, []).append((
+            rule.start_time,
+            rule.end_time,
+            rule.valid_from,
+            rule.valid_until,
+            frozenset(rule.exceptions or ())
+        ))
+    return table
+
+
+def provider_rule_table(provider_id):
+    """Return the provider's compiled rules, loading them once per rule change"""
+    key = rule_table_cache_key(provider_id)
+    if key is None:
+        # Availability caching is off
+        return compile_rules(AvailabilityRule.objects.filter(provider_id=provider_id))
+    table = cache.get(key)
+    if table is None:
+        table = compile_rules(AvailabilityRule.objects.filter(provider_id=provider_id))
+        cache.set(key, table, AVAILABILITY_CACHE_TIMEOUT)
+    return table
+
+
+def expand_rules(rule_table, day_keys):
+    """
+    Lay compiled rules onto the requested days.
+
+    Args:
+        rule_table: result of compile_rules / provider_rule_table
+        day_keys: list of "YYYY-MM-DD" day keys
+
+    Returns:
+        list of ExpandedAvailability in day order, then start time
+    """
+    if not rule_table:
+        return []
+
+    tz = timezone.get_current_timezone()
+    expanded = []
+    for day_key in day_keys:
+        day = datetime.date.fromisoformat(day_key)
+        for start_time, end_time, valid_from, valid_until, exceptions in rule_table.get(day.weekday(), ()):
+            if day < valid_from or (valid_until is not None and day > valid_until):
+                continue
+            if day_key in exceptions:
+                continue
+            expanded.append(ExpandedAvailability(
+                day_key,
+                datetime.datetime.combine(day, start_time, tzinfo=tz),
+                datetime.datetime.combine(day, end_time, tzinfo=tz)
+            ))
+    return expanded
@@ -0,0 +1,253 @@
+from bisect import bisect_left, bisect_right
+import datetime
+
+from django.utils import timezone
+
+__all__ = [
+    'BUFFER_MINUTES',
+    'DISCOUNT_ADJACENCY_MINUTES',
+    'TODAY_LEAD_MINUTES',
+    'BlockedIntervals',
+    'AdjacentAppointments',
+    'group_availability_by_day',
+    'clip_to_lead_time',
+    'iter_block_slots',
+    'iter_free_slots',
+    'day_free_intervals',
+    'iter_interval_slots'
+]
+
+# Define a global constant for buffer time in minutes
+# This ensures consistent buffer time across all functions
+BUFFER_MINUTES = 15
+
+# Appointments within this many minutes of a slot count as adjacent for proximity discounts
+DISCOUNT_ADJACENCY_MINUTES = 60
+
+# Slots offered for today must start at least this many minutes from now
+TODAY_LEAD_MINUTES = 60
+
+
+class BlockedIntervals:
+    """
+    Sorted, merged set of buffered appointment periods for one provider.
+
+    The periods are sorted and merged once, so checking whether a candidate
+    slot is free is a binary search rather than a scan over every appointment.
+    """
+
+    def __init__(self, periods, buffer_minutes=0):
+        """
+        Args:
+            periods: iterable of (start, end) datetime pairs
+            buffer_minutes: padding added to both sides of every period
+        """
+        buffer = datetime.timedelta(minutes=buffer_minutes)
+        padded = sorted((start - buffer, end + buffer) for start, end in periods)
+
+        starts = []
+        ends = []
+        for start, end in padded:
+            if ends and start < ends[-1]:
+                # Overlaps the previous period, extend it instead of adding a new one
+                if end > ends[-1]:
+                    ends[-1] = end
+            else:
+                starts.append(start)
+                ends.append(end)
+
+        self._starts = starts
+        self._ends = ends
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __iter__(self):
+        return iter(zip(self._starts, self._ends))
+
+    def is_free(self, start, end):
+        """Return True if [start, end) does not overlap any blocked period"""
+        # First merged period that ends after the slot starts is the only candidate
+        index = bisect_right(self._ends, start)
+        return index == len(self._starts) or self._starts[index] >= end
+
+    def free_gaps(self, start, end):
+        """Yield the (gap_start, gap_end) stretches of [start, end) that no blocked period covers"""
+        index = bisect_right(self._ends, start)
+        cursor = start
+        while index < len(self._starts) and self._starts[index] < end:
+            if self._starts[index] > cursor:
+                yield cursor, self._starts[index]
+            cursor = max(cursor, self._ends[index])
+            index += 1
+        if cursor < end:
+            yield cursor, end
+
+
+class AdjacentAppointments:
+    """
+    Appointments indexed by end time and by start time.
+
+    Finding the appointments that end shortly before or start shortly after
+    a slot takes two pairs of binary searches instead of a scan over every
+    appointment.
+    """
+
+    def __init__(self, appointments, threshold_minutes):
+        """
+        Args:
+            appointments: iterable of objects with start_time and end_time
+            threshold_minutes: how close in time an appointment must be to count as adjacent
+        """
+        appointments = list(appointments)
+        self._threshold = datetime.timedelta(minutes=threshold_minutes)
+        self._by_end = sorted(appointments, key=lambda appointment: appointment.end_time)
+        self._ends = [appointment.end_time for appointment in self._by_end]
+        self._by_start = sorted(appointments, key=lambda appointment: appointment.start_time)
+        self._starts = [appointment.start_time for appointment in self._by_start]
+
+    def __len__(self):
+        return len(self._by_end)
+
+    def around(self, start, end):
+        """
+        Return the appointments ending within the threshold before `start`
+        (start - threshold <= end_time <= start) or starting within it after
+        `end` (end <= start_time <= end + threshold).
+        """
+        before = self._by_end[
+            bisect_left(self._ends, start - self._threshold):bisect_right(self._ends, start)
+        ]
+        after = self._by_start[
+            bisect_left(self._starts, end):bisect_right(self._starts, end + self._threshold)
+        ]
+        return before + after
+
+
+def group_availability_by_day(availabilities):
+    """
+    Group ProviderAvailability rows into {day_of_week: [(start, end), ...]}.
+
+    The original row order is kept inside each day, so slot ids stay stable.
+    """
+    by_day = {}
+    for avail in availabilities:
+        by_day.setdefault(avail.day_of_week, []).append((avail.start_time, avail.end_time))
+    return by_day
+
+
+def clip_to_lead_time(start_time, end_time, now):
+    """
+    Move a block's start forward so today's slots begin at least
+    TODAY_LEAD_MINUTES from now.
+
+    Returns:
+        The adjusted start time, or None if no time is left in the block
+    """
+    min_time = (now + datetime.timedelta(minutes=TODAY_LEAD_MINUTES)).time()
+    if start_time.time() < min_time:
+        start_time = datetime.datetime.combine(
+            start_time.date(),
+            min_time,
+            tzinfo=timezone.get_current_timezone()
+        )
+    if start_time >= end_time:
+        return None
+    return start_time
+
+
+def iter_block_slots(start_time, end_time, duration_minutes, buffer_minutes):
+    """
+    Yield (slot_index, start, end) for every slot that fits in a block.
+
+    Consecutive slots are spaced by the service duration plus the buffer so
+    each booking keeps buffer time on both sides.
+    """
+    duration = datetime.timedelta(minutes=duration_minutes)
+    step = datetime.timedelta(minutes=duration_minutes + buffer_minutes)
+
+    slot_index = 0
+    current_start = start_time
+    while True:
+        current_end = current_start + duration
+        if current_end > end_time:
+            break
+        yield slot_index, current_start, current_end
+        slot_index += 1
+        current_start = current_start + step
+
+
+def iter_free_slots(date_str, day_blocks, duration_minutes, blocked, buffer_minutes, now=None):
+    """
+    Yield (slot_id, start, end) for every free slot in one day's availability.
+
+    Args:
+        date_str: the day key, used to build slot ids
+        day_blocks: list of (start, end) availability blocks for the day
+        duration_minutes: service duration
+        blocked: BlockedIntervals for the provider
+        buffer_minutes: spacing between consecutive slots
+        now: current time, only passed for today so blocks are trimmed
+             to the booking lead time
+    """
+    for block_start, block_end in day_blocks:
+        if now is not None:
+            block_start = clip_to_lead_time(block_start, block_end, now)
+            if block_start is None:
+                continue
+
+        for slot_index, start, end in iter_block_slots(block_start, block_end, duration_minutes, buffer_minutes):
+            if blocked.is_free(start, end):
+                yield f"slot-{date_str}-{slot_index}", start, end
+
+
+def day_free_intervals(day_blocks, blocked, now=None):
+    """
+    Compute the free stretches of one day's availability.
+
+    Args:
+        day_blocks: list of (start, end) availability blocks for the day
+        blocked: BlockedIntervals for the provider
+        now: current time, only passed for today so blocks are trimmed
+             to the booking lead time
+
+    Returns:
+        [(block_start, [(gap_start, gap_end), ...]), ...] in block order.
+        block_start is the (trimmed) start of the block, which anchors the
+        slot grid of that block.
+    """
+    intervals = []
+    for block_start, block_end in day_blocks:
+        if now is not None:
+            block_start = clip_to_lead_time(block_start, block_end, now)
+            if block_start is None:
+                continue
+        intervals.append((block_start, list(blocked.free_gaps(block_start, block_end))))
+    return intervals
+
+
+def iter_interval_slots(date_str, day_intervals, duration_minutes, buffer_minutes):
+    """
+    Yield (slot_id, start, end) for a duration from precomputed free intervals.
+
+    Produces exactly the slots of iter_free_slots: slots stay on each block's
+    grid of duration + buffer steps and must fit inside one free gap. The
+    work is per gap and per slot, independent of the number of appointments.
+
+    Args:
+        date_str: the day key, used to build slot ids
+        day_intervals: result of day_free_intervals for the day
+        duration_minutes: service duration
+        buffer_minutes: spacing between consecutive slots
+    """
+    duration = datetime.timedelta(minutes=duration_minutes)
+    step = datetime.timedelta(minutes=duration_minutes + buffer_minutes)
+
+    for block_start, gaps in day_intervals:
+        for gap_start, gap_end in gaps:
+            # First grid slot starting inside the gap, last one ending inside it
+            first_index = -((block_start - gap_start) // step)
+            last_index = (gap_end - duration - block_start) // step
+            for slot_index in range(max(first_index, 0), last_index + 1):
+                start = block_start + slot_index * step
+                yield f"slot-{date_str}-{slot_index}", start, start + duration
@@ -0,0 +1,98 @@
+import datetime
+import weakref
+
+from .slot_engine import clip_to_lead_time
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed when AVAILABILITY_SLOT_ENGINE = 'numpy'
+    np = None
+
+__all__ = [
+    'np',
+    'iter_free_slots_vectorized'
+]
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECONDS_PER_MINUTE = 60 * 1000 * 1000
+
+# Epoch arrays of each BlockedIntervals, built once and dropped with it
+_blocked_arrays = weakref.WeakKeyDictionary()
+
+
+def to_epoch_us(value):
+    """Convert an aware datetime to integer microseconds since the epoch"""
+    return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+
+def blocked_epoch_arrays(blocked):
+    """
+    Return (starts, ends) int64 epoch-microsecond arrays for a BlockedIntervals.
+
+    The arrays are sorted and non-overlapping because the periods already are.
+    """
+    arrays = _blocked_arrays.get(blocked)
+    if arrays is None:
+        starts = []
+        ends = []
+        for start, end in blocked:
+            starts.append(to_epoch_us(start))
+            ends.append(to_epoch_us(end))
+        arrays = (np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64))
+        _blocked_arrays[blocked] = arrays
+    return arrays
+
+
+def free_slot_mask(slot_starts, slot_ends, blocked_starts, blocked_ends):
+    """
+    Vectorized BlockedIntervals.is_free over arrays of candidate slots.
+
+    Args:
+        slot_starts, slot_ends: int64 arrays of candidate slot bounds
+        blocked_starts, blocked_ends: sorted, merged blocked periods
+
+    Returns:
+        Boolean array, True where the slot overlaps no blocked period
+    """
+    # First merged period that ends after each slot starts is the only candidate
+    index = np.searchsorted(blocked_ends, slot_starts, side='right')
+    free = index == len(blocked_starts)
+    candidates = ~free
+    free[candidates] = blocked_starts[index[candidates]] >= slot_ends[candidates]
+    return free
+
+
+def iter_free_slots_vectorized(date_str, day_blocks, duration_minutes, blocked, buffer_minutes, now=None):
+    """
+    NumPy version of iter_free_slots with the same arguments and output.
+
+    Slot starts for a whole block come from one np.arange and the conflict
+    check is one np.searchsorted, so only free slots are turned back into
+    datetimes. Slot datetimes are built as block start + offset, exactly as
+    the loop in iter_block_slots arrives at them, so both engines return
+    identical slots. Times are compared as epoch instants, which matches the
+    loop as long as TIME_ZONE has no DST changes inside a block (it is UTC).
+    """
+    blocked_starts, blocked_ends = blocked_epoch_arrays(blocked)
+    duration_us = duration_minutes * MICROSECONDS_PER_MINUTE
+    step_us = (duration_minutes + buffer_minutes) * MICROSECONDS_PER_MINUTE
+    duration = datetime.timedelta(minutes=duration_minutes)
+
+    for block_start, block_end in day_blocks:
+        if now is not None:
+            block_start = clip_to_lead_time(block_start, block_end, now)
+            if block_start is None:
+                continue
+
+        block_start_us = to_epoch_us(block_start)
+        span_us = to_epoch_us(block_end) - block_start_us
+        if span_us < duration_us:
+            continue
+
+        offsets = np.arange((span_us - duration_us) // step_us + 1, dtype=np.int64) * step_us
+        slot_starts = block_start_us + offsets
+        free = free_slot_mask(slot_starts, slot_starts + duration_us, blocked_starts, blocked_ends)
+
+        for slot_index in np.flatnonzero(free).tolist():
+            start = block_start + datetime.timedelta(microseconds=slot_index * step_us)
+            yield f"slot-{date_str}-{slot_index}", start, start + duration
@@ -0,0 +1,145 @@
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.gis.db.models import PolygonField
+from django.db import transaction
+from django.db.models import FloatField, Func, Value
+
+from ..models import DiscountZone, DiscountZoneDay
+from .availability import DISCOUNT_APPOINTMENT_STATUSES
+from .discounts import provider_discount_table
+from .free_slots import _lock_days, _try_lock_build
+from .queries import YARDS_PER_METER, load_day_availabilities, load_window_appointments
+from .slot_engine import DISCOUNT_ADJACENCY_MINUTES, group_availability_by_day
+
+__all__ = [
+    'PROXIMITY_DISCOUNT_ZONES',
+    'ZoneAppointment',
+    'build_discount_zones',
+    'discount_zones_ready',
+    'consumer_zone_appointments',
+    'invalidate_discount_zones'
+]
+
+# Price discounts from prebuilt zones where a day has them (see build_discount_zones)
+PROXIMITY_DISCOUNT_ZONES = getattr(settings, 'PROXIMITY_DISCOUNT_ZONES', False)
+
+# An appointment whose zone contains the consumer; quacks like an Appointment for AdjacentAppointments
+ZoneAppointment = namedtuple('ZoneAppointment', ['id', 'start_time', 'end_time', 'tier'])
+
+
+class GeographyBuffer(Func):
+    """ST_Buffer(geography, meters): a geodesic disk around a point"""
+    function = 'ST_Buffer'
+    output_field = PolygonField(geography=True)
+
+
+def build_discount_zones(provider, day_keys):
+    """
+    (Re)build a provider's discount zones for the requested days.
+
+    Every located appointment that can sit next to a slot on a day gets one
+    disk per tier, with the tier's outer distance as radius, buffered by
+    PostGIS on the geography column. Days are marked built even when they
+    have no zones, so empty days are not measured live either.
+
+    Each day is read and written in its own transaction under the same
+    advisory locks as the free slots, so a booking or availability change
+    cannot drop the day between the read and the write. Days whose lock is
+    held by a change (or a free-slot build) are skipped; they keep being
+    priced live until the next run.
+
+    Returns:
+        (number of zones written, number of days skipped)
+    """
+    zone_count = 0
+    skipped_days = 0
+    for day_key in day_keys:
+        with transaction.atomic():
+            if not _try_lock_build(provider.id, [day_key]):
+                skipped_days += 1
+                continue
+            zones = _day_zones(provider, day_key)
+            DiscountZone.objects.filter(provider=provider, day=day_key).delete()
+            DiscountZoneDay.objects.filter(provider=provider, day=day_key).delete()
+            DiscountZone.objects.bulk_create(zones, batch_size=500)
+            DiscountZoneDay.objects.create(provider=provider, day=day_key)
+            zone_count += len(zones)
+    return zone_count, skipped_days
+
+
+def _day_zones(provider, day_key):
+    """Unsaved DiscountZone rows of one day (none without an active discount config or availability)"""
+    discount_table = provider_discount_table(provider.id)
+    zones = []
+    if discount_table is not None and discount_table.is_active:
+        # Radii in meters for tiers 1-4
+        radii = [high / YARDS_PER_METER for _, high in discount_table.tier_bounds]
+        blocks = group_availability_by_day(load_day_availabilities(provider, [day_key])).get(day_key)
+        if blocks:
+            window = (min(start for start, _ in blocks), max(end for _, end in blocks))
+            appointments = load_window_appointments(
+                provider,
+                window,
+                statuses=DISCOUNT_APPOINTMENT_STATUSES,
+                margin_minutes=DISCOUNT_ADJACENCY_MINUTES
+            ).filter(location__isnull=False)
+            for tier, radius in enumerate(radii, start=1):
+                buffered = appointments.annotate(
+                    area=GeographyBuffer('location', Value(radius, output_field=FloatField()))
+                ).values_list('id', 'start_time', 'end_time', 'area')
+                zones.extend(
+                    DiscountZone(
+                        provider=provider,
+                        appointment_id=appointment_id,
+                        day=day_key,
+                        tier=tier,
+                        start_time=start_time,
+                        end_time=end_time,
+                        area=area
+                    )
+                    for appointment_id, start_time, end_time, area in buffered
+                )
+    return zones
+
+
+def discount_zones_ready(provider_id, day_keys):
+    """Whether every requested day has built discount zones"""
+    return DiscountZoneDay.objects.filter(provider_id=provider_id, day__in=day_keys).count() == len(set(day_keys))
+
+
+def consumer_zone_appointments(provider_id, day_keys, location):
+    """
+    Find the appointments whose discount zones contain the consumer, in one
+    point-in-polygon query on the GiST-indexed zones.
+
+    Returns:
+        list of ZoneAppointment, each with the closest tier it reaches
+    """
+    rows = DiscountZone.objects.filter(
+        provider_id=provider_id,
+        day__in=day_keys,
+        area__intersects=location
+    ).values_list('appointment_id', 'start_time', 'end_time', 'tier')
+
+    closest = {}
+    for appointment_id, start_time, end_time, tier in rows:
+        known = closest.get(appointment_id)
+        if known is None or tier < known.tier:
+            closest[appointment_id] = ZoneAppointment(appointment_id, start_time, end_time, tier)
+    return list(closest.values())
+
+
+def invalidate_discount_zones(provider_id, day_keys=None):
+    """
+    Drop built zones of a provider (on the given days, or all of them) so they
+    are rebuilt, under the days' locks so no build in progress stores them again
+    """
+    filters = {'provider_id': provider_id}
+    if day_keys is not None:
+        day_keys = list(day_keys)
+        filters['day__in'] = day_keys
+    with transaction.atomic():
+        _lock_days(provider_id, day_keys)
+        DiscountZoneDay.objects.filter(**filters).delete()
+        DiscountZone.objects.filter(**filters).delete()
@@ -0,0 +1,142 @@
+import datetime
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Appointment, AvailabilityRule, ProviderAvailability, ProximityDiscountConfig, Service
+from .scheduling import (
+    BUFFER_MINUTES, DISCOUNT_ADJACENCY_MINUTES, affected_day_keys, invalidate_cached_days,
+    invalidate_cached_discounts, invalidate_cached_rules, invalidate_cached_service, invalidate_discount_zones,
+    invalidate_free_slot_days, invalidate_free_slots, invalidate_service_free_slots
+)
+
+# An appointment changes a day's plain slots within the buffer and its
+# discounts within the adjacency window, so evict whichever reaches further
+APPOINTMENT_REACH_MINUTES = max(BUFFER_MINUTES, DISCOUNT_ADJACENCY_MINUTES)
+
+# Appointment fields that availability and discounts depend on; saves that
+# change none of them (e.g. notes) evict nothing
+APPOINTMENT_AVAILABILITY_FIELDS = ('service_id', 'start_time', 'end_time', 'location', 'status')
+
+
+def _stored_time(value):
+    """An appointment time as it will be stored; the views assign raw request strings"""
+    if isinstance(value, str):
+        value = parse_datetime(value)
+        if value is not None and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+    return value
+
+
+def _evict_appointment_days(provider_id, *time_ranges):
+    """Evict everything derived from the provider's days around the given (start, end) ranges"""
+    day_keys = set()
+    for start_time, end_time in time_ranges:
+        day_keys.update(
+            affected_day_keys(provider_id, start_time, end_time, margin_minutes=APPOINTMENT_REACH_MINUTES)
+        )
+    if not day_keys:
+        return
+    day_keys = sorted(day_keys)
+    invalidate_cached_days(provider_id, day_keys)
+    # Stored free slots are dropped in the saving transaction, so no build can store stale ones
+    invalidate_free_slot_days(provider_id, day_keys)
+    # Zones on these days are stale until the next build; pricing measures live meanwhile
+    invalidate_discount_zones(provider_id, day_keys)
+
+
+@receiver(pre_save, sender=Appointment)
+def remember_previous_appointment_times(sender, instance, raw=False, **kwargs):
+    """Keep the stored times of a rescheduled appointment so its old days are evicted too"""
+    if raw:
+        return
+    loaded = getattr(instance, '_loaded_values', {})
+    current = {field: getattr(instance, field) for field in APPOINTMENT_AVAILABILITY_FIELDS}
+    current['start_time'] = _stored_time(current['start_time'])
+    current['end_time'] = _stored_time(current['end_time'])
+    instance._availability_unchanged = not instance._state.adding and all(
+        field in loaded and loaded[field] == value for field, value in current.items()
+    )
+    if instance._availability_unchanged:
+        return
+    
+    loaded_times = (loaded.get('start_time'), loaded.get('end_time'))
+    if all(isinstance(value, datetime.datetime) for value in loaded_times):
+        # Loaded with the row, so no query is needed
+        instance._previous_times = loaded_times
+    elif instance._state.adding:
+        instance._previous_times = None
+    else:
+        instance._previous_times = Appointment.objects.filter(pk=instance.pk).values_list(
+            'start_time', 'end_time'
+        ).first()
+
+
+@receiver(post_save, sender=Appointment)
+def evict_availability_for_saved_appointment(sender, instance, raw=False, **kwargs):
+    if raw or getattr(instance, '_availability_unchanged', False):
+        return
+    time_ranges = []
+    previous_times = getattr(instance, '_previous_times', None)
+    if previous_times:
+        time_ranges.append(previous_times)
+    current_times = (_stored_time(instance.start_time), _stored_time(instance.end_time))
+    if all(isinstance(value, datetime.datetime) for value in current_times) and current_times != previous_times:
+        time_ranges.append(current_times)
+    # Kept in sync with the service by Appointment.save
+    _evict_appointment_days(instance.provider_id, *time_ranges)
+
+
+@receiver(post_delete, sender=Appointment)
+def evict_availability_for_deleted_appointment(sender, instance, **kwargs):
+    try:
+        provider_id = instance.service.provider_id
+    except Service.DoesNotExist:
+        # Deleted together with its service, which evicts on its own
+        return
+    _evict_appointment_days(provider_id, (instance.start_time, instance.end_time))
+
+
+@receiver(post_save, sender=ProviderAvailability)
+@receiver(post_delete, sender=ProviderAvailability)
+def evict_availability_for_block(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_cached_days(instance.provider_id, [instance.day_of_week])
+    invalidate_free_slot_days(instance.provider_id, [instance.day_of_week])
+    # Zones are built from the day's blocks, so new or wider hours need a rebuild
+    invalidate_discount_zones(instance.provider_id, [instance.day_of_week])
+
+
+@receiver(post_save, sender=AvailabilityRule)
+@receiver(post_delete, sender=AvailabilityRule)
+def evict_availability_for_rule(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_cached_rules(instance.provider_id)
+    invalidate_free_slots(instance.provider_id)
+    # A rule can change the blocks of any day zones were built for
+    invalidate_discount_zones(instance.provider_id)
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_delete, sender=Service)
+def evict_availability_for_service(sender, instance, raw=False, created=False, **kwargs):
+    if raw:
+        return
+    invalidate_cached_service(instance.pk)
+    # Slot length may have changed; deleted services lose their slots by cascade
+    if kwargs['signal'] is post_save and not created:
+        invalidate_service_free_slots(instance.pk, instance.provider_id)
+
+
+@receiver(post_save, sender=ProximityDiscountConfig)
+@receiver(post_delete, sender=ProximityDiscountConfig)
+def evict_discounts_for_config(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    invalidate_cached_discounts(instance.provider_id)
+    # Tier radii may have changed, so every built zone is stale
+    invalidate_discount_zones(instance.provider_id)
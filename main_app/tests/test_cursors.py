@@ -0,0 +1,37 @@
+import base64
+import datetime
+import uuid
+
+from django.test import SimpleTestCase
+
+from main_app.views import _decode_appointment_cursor, _encode_appointment_cursor
+
+
+class AppointmentCursorTests(SimpleTestCase):
+    def test_round_trip(self):
+        row = {
+            'start_time': datetime.datetime(2030, 5, 6, 9, 30, 15, 250, tzinfo=datetime.timezone.utc),
+            'id': uuid.uuid4()
+        }
+        self.assertEqual(_decode_appointment_cursor(_encode_appointment_cursor(row)), (row['start_time'], row['id']))
+
+    def test_cursor_is_url_safe(self):
+        cursor = _encode_appointment_cursor({
+            'start_time': datetime.datetime(2030, 5, 6, 9, 30, tzinfo=datetime.timezone.utc),
+            'id': uuid.uuid4()
+        })
+        self.assertRegex(cursor, r'^[A-Za-z0-9_=-]+$')
+
+    def test_malformed_cursors_raise_value_error(self):
+        cursors = [
+            '',
+            'not base64!',
+            base64.urlsafe_b64encode(b'{"a": 1}').decode(),
+            base64.urlsafe_b64encode(b'["2030-05-06T09:30:00+00:00"]').decode(),
+            base64.urlsafe_b64encode(b'["yesterday", "4f3c1f5e-5b1a-4f0e-9a53-4c2b9c8e2f10"]').decode(),
+            base64.urlsafe_b64encode(b'["2030-05-06T09:30:00+00:00", "not-a-uuid"]').decode(),
+        ]
+        for cursor in cursors:
+            with self.subTest(cursor=cursor):
+                with self.assertRaisesMessage(ValueError, 'cursor is invalid'):
+                    _decode_appointment_cursor(cursor)
@@ -0,0 +1,65 @@
+import itertools
+import unittest
+
+from django.test import SimpleTestCase
+
+from main_app.models import ProximityDiscountConfig
+from main_app.scheduling import CompiledDiscountTable, np
+
+DISTANCES = (0, 1, 199.5, 200, 200.5, 400, 600, 601, 1000, 1760, 1761, 5000, 5280, 5280.5, 10000)
+COUNTS = (-1, 0, 1, 2, 3, 4, 5, 6, 50)
+
+
+class CompiledDiscountTableTests(SimpleTestCase):
+    def setUp(self):
+        # Unsaved, so only the field defaults are used and no query is made
+        self.config = ProximityDiscountConfig()
+        self.table = CompiledDiscountTable(self.config)
+
+    def test_discount_matches_model_method(self):
+        for distance, count in itertools.product(DISTANCES, COUNTS):
+            with self.subTest(distance=distance, count=count):
+                self.assertEqual(
+                    self.table.discount(distance, count),
+                    self.config.get_discount_for_distance_and_count(distance, count)
+                )
+
+    def test_discount_matches_model_method_with_overlapping_and_gapped_tiers(self):
+        config = ProximityDiscountConfig(
+            tier1_distance=300, tier2_min_distance=250, tier2_max_distance=500,
+            tier3_min_distance=800, tier3_max_distance=1000,
+            tier4_min_distance=900, tier4_max_distance=2000
+        )
+        table = CompiledDiscountTable(config)
+        for distance, count in itertools.product((0, 260, 300, 400, 600, 850, 950, 1500, 2001), COUNTS):
+            with self.subTest(distance=distance, count=count):
+                self.assertEqual(table.discount(distance, count), config.get_discount_for_distance_and_count(distance, count))
+                self.assertEqual(table.discounts([distance], [count]), [table.discount(distance, count)])
+
+    def test_discounts_matches_discount(self):
+        pairs = list(itertools.product(DISTANCES, COUNTS))
+        distances = [distance for distance, _ in pairs]
+        counts = [count for _, count in pairs]
+        self.assertEqual(
+            self.table.discounts(distances, counts),
+            [self.table.discount(distance, count) for distance, count in pairs]
+        )
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_discounts_returns_plain_ints(self):
+        self.assertEqual([type(value) for value in self.table.discounts([100, 9000], [2, 2])], [int, int])
+
+    def test_tier_discounts(self):
+        self.assertEqual(
+            self.table.tier_discounts([1, 2, 3, 4, 0, 1], [1, 2, 3, 9, 3, 0]),
+            [15, 15, 12, 9, 0, 15]
+        )
+
+    def test_inactive_config_is_compiled(self):
+        table = CompiledDiscountTable(ProximityDiscountConfig(is_active=False))
+        self.assertFalse(table.is_active)
+        self.assertEqual(table.max_distance, 5280)
+
+    def test_table_is_immutable(self):
+        with self.assertRaises(AttributeError):
+            self.table.max_distance = 1
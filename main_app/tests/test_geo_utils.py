@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from main_app.utils import geo_utils
+from main_app.utils.geo_utils import TokenBucket, normalize_address
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping only moves the clock forward"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TokenBucketTests(SimpleTestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch.object(geo_utils, 'time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_burst_is_served_without_waiting(self):
+        bucket = TokenBucket(rate=2, capacity=3)
+        self.assertEqual([bucket.acquire() for _ in range(3)], [0.0, 0.0, 0.0])
+        self.assertEqual(self.clock.sleeps, [])
+
+    def test_waits_for_the_next_token_once_empty(self):
+        bucket = TokenBucket(rate=2, capacity=1)
+        bucket.acquire()
+        self.assertAlmostEqual(bucket.acquire(), 0.5)
+        self.assertAlmostEqual(bucket.acquire(), 0.5)
+
+    def test_tokens_refill_over_time_up_to_capacity(self):
+        bucket = TokenBucket(rate=1, capacity=2)
+        bucket.acquire()
+        bucket.acquire()
+        self.clock.now += 60
+        self.assertEqual([bucket.acquire(), bucket.acquire()], [0.0, 0.0])
+        self.assertAlmostEqual(bucket.acquire(), 1.0)
+
+    def test_pause_holds_back_the_next_caller(self):
+        bucket = TokenBucket(rate=1, capacity=1)
+        bucket.pause(5)
+        self.assertAlmostEqual(bucket.acquire(), 6.0)
+
+
+class NormalizeAddressTests(SimpleTestCase):
+    def test_spelling_variants_share_a_key(self):
+        self.assertEqual(
+            normalize_address('12 North Main Street.', 'Springfield', 'Illinois', '62701-1234', 'United States'),
+            normalize_address('12  n main st', 'springfield', 'IL', '62701', 'USA')
+        )
+
+    def test_key_format(self):
+        self.assertEqual(
+            normalize_address('500 Fifth Avenue, Apt. 3', 'New York', 'new york', '10110'),
+            '500 FIFTH AVE APT 3|NEW YORK|NY|10110|US'
+        )
+
+    def test_missing_country_and_zip(self):
+        self.assertEqual(normalize_address('1 Elm Rd', 'Austin', 'TX', None, ''), '1 ELM RD|AUSTIN|TX||US')
+
+    def test_other_countries_are_kept(self):
+        self.assertTrue(normalize_address('1 King St', 'Toronto', 'ON', 'M5H', 'Canada').endswith('|CANADA'))
+        self.assertNotEqual(
+            normalize_address('1 King St', 'Toronto', 'ON', '', 'Canada'),
+            normalize_address('1 King St', 'Toronto', 'ON', '', 'USA')
+        )
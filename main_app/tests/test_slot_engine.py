@@ -0,0 +1,124 @@
+import datetime
+import random
+import unittest
+
+from django.test import SimpleTestCase
+
+from main_app.scheduling import (
+    AdjacentAppointments, BlockedIntervals, day_free_intervals, iter_free_slots, iter_interval_slots, np
+)
+from main_app.scheduling.vectorized import iter_free_slots_vectorized
+
+DAY = datetime.datetime(2030, 5, 6, tzinfo=datetime.timezone.utc)
+
+
+def at(hour, minute=0):
+    return DAY + datetime.timedelta(hours=hour, minutes=minute)
+
+
+class Appointment:
+    def __init__(self, start_time, end_time):
+        self.start_time = start_time
+        self.end_time = end_time
+
+
+class BlockedIntervalsTests(SimpleTestCase):
+    def test_overlapping_periods_are_merged(self):
+        blocked = BlockedIntervals([
+            (at(10), at(11)),
+            (at(9), at(10, 30)),
+            (at(11), at(12)),
+            (at(14), at(15)),
+        ])
+        self.assertEqual(list(blocked), [(at(9), at(11)), (at(11), at(12)), (at(14), at(15))])
+
+    def test_buffer_pads_both_sides(self):
+        blocked = BlockedIntervals([(at(10), at(11))], buffer_minutes=15)
+        self.assertEqual(list(blocked), [(at(9, 45), at(11, 15))])
+        self.assertFalse(blocked.is_free(at(9), at(9, 50)))
+        self.assertTrue(blocked.is_free(at(9), at(9, 45)))
+        self.assertTrue(blocked.is_free(at(11, 15), at(12)))
+
+    def test_is_free(self):
+        blocked = BlockedIntervals([(at(10), at(11)), (at(13), at(14))])
+        self.assertTrue(blocked.is_free(at(8), at(10)))
+        self.assertTrue(blocked.is_free(at(11), at(13)))
+        self.assertTrue(blocked.is_free(at(14), at(18)))
+        self.assertFalse(blocked.is_free(at(10, 30), at(10, 45)))
+        self.assertFalse(blocked.is_free(at(9), at(15)))
+        self.assertTrue(BlockedIntervals([]).is_free(at(0), at(23)))
+
+    def test_free_gaps(self):
+        blocked = BlockedIntervals([(at(10), at(11)), (at(13), at(14))])
+        self.assertEqual(
+            list(blocked.free_gaps(at(9), at(15))),
+            [(at(9), at(10)), (at(11), at(13)), (at(14), at(15))]
+        )
+        self.assertEqual(list(blocked.free_gaps(at(10, 15), at(10, 45))), [])
+        self.assertEqual(list(blocked.free_gaps(at(10, 30), at(12))), [(at(11), at(12))])
+
+
+class AdjacentAppointmentsTests(SimpleTestCase):
+    def test_around_finds_appointments_within_the_threshold(self):
+        ends_just_before = Appointment(at(8), at(9, 30))
+        ends_too_early = Appointment(at(7), at(8, 30))
+        starts_just_after = Appointment(at(11), at(12))
+        starts_too_late = Appointment(at(11, 45), at(12, 30))
+        overlapping = Appointment(at(9, 45), at(10, 45))
+        adjacent = AdjacentAppointments(
+            [starts_too_late, overlapping, ends_just_before, starts_just_after, ends_too_early],
+            threshold_minutes=30
+        )
+
+        around = adjacent.around(at(10), at(11))
+
+        self.assertEqual(len(adjacent), 5)
+        self.assertCountEqual(around, [ends_just_before, starts_just_after])
+
+    def test_threshold_edges_are_inclusive(self):
+        ends_at_edge = Appointment(at(8), at(9))
+        starts_at_edge = Appointment(at(12), at(13))
+        adjacent = AdjacentAppointments([ends_at_edge, starts_at_edge], threshold_minutes=60)
+        self.assertCountEqual(adjacent.around(at(10), at(11)), [ends_at_edge, starts_at_edge])
+
+
+class SlotEngineEquivalenceTests(SimpleTestCase):
+    """The numpy engine and the free-interval path must return exactly the python engine's slots"""
+
+    def random_day(self, rng):
+        blocks = []
+        hour = 6
+        while hour < 20:
+            length = rng.randint(1, 5)
+            blocks.append((at(hour, rng.choice((0, 10, 30))), at(min(hour + length, 22))))
+            hour += length + rng.randint(0, 2)
+        periods = []
+        for _ in range(rng.randint(0, 12)):
+            start = at(6) + datetime.timedelta(minutes=rng.randrange(0, 16 * 60, 5))
+            periods.append((start, start + datetime.timedelta(minutes=rng.choice((15, 30, 45, 60, 90)))))
+        return blocks, BlockedIntervals(periods, buffer_minutes=15)
+
+    @unittest.skipIf(np is None, 'numpy is not installed')
+    def test_numpy_engine_matches_python_engine(self):
+        rng = random.Random(42)
+        for _ in range(200):
+            blocks, blocked = self.random_day(rng)
+            duration = rng.choice((15, 30, 45, 60, 90))
+            now = at(rng.randint(0, 23), rng.choice((0, 20, 40))) if rng.random() < 0.3 else None
+            args = ('2030-05-06', blocks, duration, blocked, 15)
+            self.assertEqual(
+                list(iter_free_slots_vectorized(*args, now=now)),
+                list(iter_free_slots(*args, now=now))
+            )
+
+    def test_interval_slots_match_python_engine(self):
+        rng = random.Random(7)
+        for _ in range(200):
+            blocks, blocked = self.random_day(rng)
+            duration = rng.choice((15, 30, 45, 60, 90))
+            now = at(rng.randint(0, 23), rng.choice((0, 20, 40))) if rng.random() < 0.3 else None
+            intervals = day_free_intervals(blocks, blocked, now=now)
+            self.assertEqual(
+                list(iter_interval_slots('2030-05-06', intervals, duration, 15)),
+                list(iter_free_slots('2030-05-06', blocks, duration, blocked, 15, now=now))
+            )
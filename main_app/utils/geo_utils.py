@@ -1,67 +1,366 @@
+from collections import OrderedDict
+import datetime
+import random
+import re
+import threading
+import time
+
+from geopy.adapters import RequestsAdapter
+from geopy.exc import GeocoderRateLimited
 from geopy.geocoders import Nominatim
 from django.contrib.gis.geos import Point
 from django.conf import settings
+from django.utils import timezone
 import logging
 
+from .geocoder_backends import geocoder_backends, geocoder_chain
+
 logger = logging.getLogger(__name__)
 
-def geocode_address(address_line1, city, state, zip_code, country="USA"):
+# Addresses that could not be geocoded are not looked up again for this long
+GEOCODE_NEGATIVE_CACHE_SECONDS = getattr(settings, 'GEOCODE_NEGATIVE_CACHE_SECONDS', 24 * 60 * 60)
+
+# Most recent lookups kept in memory in front of the GeocodeCache table
+GEOCODE_MEMORY_CACHE_SIZE = 4096
+
+# USPS abbreviations (Publication 28) for the words that vary most in entered addresses
+USPS_ABBREVIATIONS = {
+    'STREET': 'ST', 'AVENUE': 'AVE', 'AV': 'AVE', 'ROAD': 'RD', 'BOULEVARD': 'BLVD',
+    'DRIVE': 'DR', 'LANE': 'LN', 'COURT': 'CT', 'PLACE': 'PL', 'TERRACE': 'TER',
+    'PARKWAY': 'PKWY', 'HIGHWAY': 'HWY', 'CIRCLE': 'CIR', 'SQUARE': 'SQ', 'TRAIL': 'TRL',
+    'WAY': 'WAY', 'ALLEY': 'ALY', 'EXPRESSWAY': 'EXPY', 'FREEWAY': 'FWY', 'PLAZA': 'PLZ',
+    'POINT': 'PT', 'CROSSING': 'XING', 'HEIGHTS': 'HTS', 'MOUNT': 'MT', 'FORT': 'FT',
+    'APARTMENT': 'APT', 'SUITE': 'STE', 'BUILDING': 'BLDG', 'FLOOR': 'FL', 'UNIT': 'UNIT',
+    'NORTH': 'N', 'SOUTH': 'S', 'EAST': 'E', 'WEST': 'W',
+    'NORTHEAST': 'NE', 'NORTHWEST': 'NW', 'SOUTHEAST': 'SE', 'SOUTHWEST': 'SW',
+    'SAINT': 'ST',
+}
+
+US_STATE_ABBREVIATIONS = {
+    'ALABAMA': 'AL', 'ALASKA': 'AK', 'ARIZONA': 'AZ', 'ARKANSAS': 'AR', 'CALIFORNIA': 'CA',
+    'COLORADO': 'CO', 'CONNECTICUT': 'CT', 'DELAWARE': 'DE', 'DISTRICT OF COLUMBIA': 'DC',
+    'FLORIDA': 'FL', 'GEORGIA': 'GA', 'HAWAII': 'HI', 'IDAHO': 'ID', 'ILLINOIS': 'IL',
+    'INDIANA': 'IN', 'IOWA': 'IA', 'KANSAS': 'KS', 'KENTUCKY': 'KY', 'LOUISIANA': 'LA',
+    'MAINE': 'ME', 'MARYLAND': 'MD', 'MASSACHUSETTS': 'MA', 'MICHIGAN': 'MI', 'MINNESOTA': 'MN',
+    'MISSISSIPPI': 'MS', 'MISSOURI': 'MO', 'MONTANA': 'MT', 'NEBRASKA': 'NE', 'NEVADA': 'NV',
+    'NEW HAMPSHIRE': 'NH', 'NEW JERSEY': 'NJ', 'NEW MEXICO': 'NM', 'NEW YORK': 'NY',
+    'NORTH CAROLINA': 'NC', 'NORTH DAKOTA': 'ND', 'OHIO': 'OH', 'OKLAHOMA': 'OK', 'OREGON': 'OR',
+    'PENNSYLVANIA': 'PA', 'RHODE ISLAND': 'RI', 'SOUTH CAROLINA': 'SC', 'SOUTH DAKOTA': 'SD',
+    'TENNESSEE': 'TN', 'TEXAS': 'TX', 'UTAH': 'UT', 'VERMONT': 'VT', 'VIRGINIA': 'VA',
+    'WASHINGTON': 'WA', 'WEST VIRGINIA': 'WV', 'WISCONSIN': 'WI', 'WYOMING': 'WY',
+}
+
+US_COUNTRY_NAMES = {'US', 'USA', 'UNITED STATES', 'UNITED STATES OF AMERICA', 'AMERICA'}
+
+# Nominatim's usage policy allows one request per second per application
+GEOCODER_REQUESTS_PER_SECOND = getattr(settings, 'GEOCODER_REQUESTS_PER_SECOND', 1.0)
+GEOCODER_BURST = getattr(settings, 'GEOCODER_BURST', 1)
+GEOCODER_TIMEOUT_SECONDS = 10
+
+# Retries of a geocoder request (per address form) that errors, waiting
+# GEOCODER_BACKOFF_SECONDS * 2**n (plus jitter) before retry n + 1
+GEOCODER_HTTP_RETRIES = getattr(settings, 'GEOCODER_HTTP_RETRIES', 2)
+GEOCODER_BACKOFF_SECONDS = 1.0
+
+# Returned by cached_geocode when an address has not been looked up yet
+CACHE_MISS = object()
+
+# Returned by geocode_address(..., report_failure=True) when a backend
+# failed, so "not found" cannot be told apart from "not known yet"
+GEOCODER_FAILED = object()
+
+# address key -> (coordinates or None, expiry timestamp or None)
+_memory_cache = OrderedDict()
+_memory_cache_lock = threading.Lock()
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, holding at most `capacity`.
+
+    acquire() blocks until a token is available, so every caller in the
+    process shares one request budget.
     """
-    Geocode an address to latitude and longitude using Nominatim.
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping until one is available; returns the seconds waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds):
+        """Hold back every caller for `seconds`, e.g. when the provider asks us to slow down"""
+        with self._lock:
+            self._tokens = min(self._tokens, 0) - seconds * self.rate
+
+
+class GeocoderStats:
+    """Process-wide counters for geocoder cost, read with snapshot()"""
+
+    FIELDS = ('calls', 'cache_hits', 'cache_misses', 'not_found', 'errors', 'throttles',
+              'rate_limit_wait_seconds', 'latency_seconds', 'max_latency_seconds')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._values = dict.fromkeys(self.FIELDS, 0)
+
+    def increment(self, field, amount=1):
+        with self._lock:
+            self._values[field] += amount
+
+    def record_call(self, latency):
+        with self._lock:
+            self._values['calls'] += 1
+            self._values['latency_seconds'] += latency
+            self._values['max_latency_seconds'] = max(self._values['max_latency_seconds'], latency)
+
+    def snapshot(self):
+        """Copy of the counters, with the mean latency of a geocoder call added"""
+        with self._lock:
+            values = dict(self._values)
+        values['mean_latency_seconds'] = values['latency_seconds'] / values['calls'] if values['calls'] else 0.0
+        return values
+
+
+geocoder_stats = GeocoderStats()
+_rate_limiter = TokenBucket(GEOCODER_REQUESTS_PER_SECOND, GEOCODER_BURST)
+_geolocator = None
+_geolocator_lock = threading.Lock()
+
+
+def get_geolocator():
+    """
+    The process's shared Nominatim client.
+
+    It is created once and reused, and its requests adapter keeps a pooled
+    session, so calls reuse HTTP connections instead of opening new ones.
+    """
+    global _geolocator
+    if _geolocator is None:
+        with _geolocator_lock:
+            if _geolocator is None:
+                _geolocator = Nominatim(
+                    user_agent="viciniti-address-geocoder",
+                    timeout=GEOCODER_TIMEOUT_SECONDS,
+                    adapter_factory=RequestsAdapter
+                )
+    return _geolocator
+
+
+def _geocoder_query(query):
+    """One rate-limited, timed geocoder request; returns a geopy Location or None"""
+    geocoder_stats.increment('rate_limit_wait_seconds', _rate_limiter.acquire())
+    started = time.monotonic()
+    try:
+        return get_geolocator().geocode(query)
+    finally:
+        geocoder_stats.record_call(time.monotonic() - started)
+
+
+def _normalize_text(value):
+    """Upper-case, drop punctuation and collapse whitespace"""
+    value = re.sub(r"[^\w\s]", ' ', (value or '').upper())
+    return ' '.join(value.split())
+
+
+def normalize_street(address_line1):
+    """Street line in upper case with USPS abbreviations, e.g. "12 N MAIN ST" """
+    return ' '.join(
+        USPS_ABBREVIATIONS.get(word, word) for word in _normalize_text(address_line1).split()
+    )
+
+
+def normalize_address(address_line1, city, state, zip_code, country="USA"):
+    """
+    Canonical cache key for an address.
+
+    Case, punctuation and whitespace are ignored, street words use their
+    USPS abbreviations, US states their two-letter codes and ZIP codes
+    their first five digits, so "12 North Main Street." and "12 N Main St"
+    share a key.
+    """
+    street = normalize_street(address_line1)
+    state = _normalize_text(state)
+    state = US_STATE_ABBREVIATIONS.get(state, state)
+    zip5 = re.sub(r"\D", '', zip_code or '')[:5]
+    country = _normalize_text(country)
+    if not country or country in US_COUNTRY_NAMES:
+        country = 'US'
+    return '|'.join((street, _normalize_text(city), state, zip5, country))
+
+
+def _remember(address_key, coords, expires_at):
+    with _memory_cache_lock:
+        _memory_cache[address_key] = (coords, expires_at)
+        _memory_cache.move_to_end(address_key)
+        while len(_memory_cache) > GEOCODE_MEMORY_CACHE_SIZE:
+            _memory_cache.popitem(last=False)
+
+
+def cached_geocode(address_key):
+    """
+    Look an address key up in memory, then in the GeocodeCache table.
+
+    Returns:
+        (latitude, longitude), None for a known negative result, or CACHE_MISS
+    """
+    now = timezone.now()
+    with _memory_cache_lock:
+        entry = _memory_cache.get(address_key)
+        if entry is not None:
+            coords, expires_at = entry
+            if expires_at is None or expires_at > now:
+                _memory_cache.move_to_end(address_key)
+                return coords
+            del _memory_cache[address_key]
+
+    from ..models import GeocodeCache
+
+    row = GeocodeCache.objects.filter(address_key=address_key).values_list(
+        'latitude', 'longitude', 'expires_at'
+    ).first()
+    if row is None:
+        return CACHE_MISS
+    latitude, longitude, expires_at = row
+    if expires_at is not None and expires_at <= now:
+        return CACHE_MISS
+
+    coords = (latitude, longitude) if latitude is not None else None
+    _remember(address_key, coords, expires_at)
+    return coords
+
+
+def store_geocode(address_key, coords):
+    """Save a lookup result (coordinates, or None when the address was not found)"""
+    from ..models import GeocodeCache
+
+    expires_at = None
+    if coords is None:
+        expires_at = timezone.now() + datetime.timedelta(seconds=GEOCODE_NEGATIVE_CACHE_SECONDS)
+    latitude, longitude = coords if coords is not None else (None, None)
+    GeocodeCache.objects.update_or_create(
+        address_key=address_key,
+        defaults={'latitude': latitude, 'longitude': longitude, 'expires_at': expires_at}
+    )
+    _remember(address_key, coords, expires_at)
+
+
+def geocode_address(address_line1, city, state, zip_code, country="USA", report_failure=False):
+    """
+    Geocode an address to latitude and longitude, trying the GEOCODER_BACKENDS
+    chain (by default the geocode cache, then Nominatim) in order.
     Returns a tuple of (latitude, longitude) or None if geocoding fails.
+    With report_failure, returns GEOCODER_FAILED instead of None when a
+    backend errored and none found the address, so callers can retry later.
     """
     if not (address_line1 and city and state):
         logger.warning("Incomplete address provided for geocoding")
         return None
     
-    # Format the complete address
-    full_address = f"{address_line1}, {city}, {state} {zip_code}, {country}"
-    logger.info(f"Geocoding address: {full_address}")
-    print(f"DEBUG GEO_UTILS: Attempting to geocode: {full_address}")
+    use_cache = 'cache' in geocoder_chain()
+    address_key = normalize_address(address_line1, city, state, zip_code, country)
+    if use_cache:
+        coords = cached_geocode(address_key)
+        if coords is not CACHE_MISS:
+            geocoder_stats.increment('cache_hits')
+            print(f"DEBUG GEO_UTILS: Geocode cache hit for: {address_key}")
+            return coords
+        geocoder_stats.increment('cache_misses')
     
-    # Maximum retries for geocoding
-    max_retries = 3
-    retry_count = 0
-    
-    while retry_count < max_retries:
+    # Only remember "not found" when a cacheable backend said so and none failed
+    definitely_not_found = False
+    failed = False
+    for backend in geocoder_backends():
         try:
-            # Initialize the geolocator with user agent
-            geolocator = Nominatim(user_agent="viciniti-address-geocoder")
-            
-            # Get location information
-            location = geolocator.geocode(full_address, timeout=10)
-            
-            if location:
-                logger.info(f"Geocoded address to: {location.latitude}, {location.longitude}")
-                print(f"DEBUG GEO_UTILS: Successfully geocoded to: {location.latitude}, {location.longitude}")
-                return (location.latitude, location.longitude)
-            else:
-                # Try alternative formatting if the initial geocoding fails
-                if retry_count == 0:
-                    # Try without zip code
-                    full_address = f"{address_line1}, {city}, {state}, {country}"
-                    logger.warning(f"Failed to geocode with zip code. Trying without: {full_address}")
-                    print(f"DEBUG GEO_UTILS: Retrying without zip code: {full_address}")
-                elif retry_count == 1:
-                    # Try with just city and state (for major landmarks)
-                    full_address = f"{address_line1}, {city}, {state}"
-                    logger.warning(f"Failed again. Trying simplified address: {full_address}")
-                    print(f"DEBUG GEO_UTILS: Retrying with simplified address: {full_address}")
-                
-                retry_count += 1
-                
-                if retry_count >= max_retries:
-                    logger.warning(f"Failed to geocode address after {max_retries} attempts: {full_address}")
-                    print(f"DEBUG GEO_UTILS: Failed to geocode after {max_retries} attempts")
-                    return None
+            coords = backend.geocode(address_line1, city, state, zip_code, country)
         except Exception as e:
-            logger.error(f"Error geocoding address: {str(e)}")
-            print(f"DEBUG GEO_UTILS: Error during geocoding: {str(e)}")
-            retry_count += 1
-            
-            if retry_count >= max_retries:
-                return None
+            # Backend unreachable; nothing is cached so the next call tries again
+            logger.error(f"Error geocoding address with {backend.name}: {str(e)}")
+            failed = True
+            continue
+        
+        if coords is not None:
+            if use_cache and backend.cacheable:
+                store_geocode(address_key, coords)
+            return coords
+        definitely_not_found = definitely_not_found or backend.cacheable
+    
+    if failed and report_failure:
+        return GEOCODER_FAILED
+    geocoder_stats.increment('not_found')
+    if use_cache and definitely_not_found and not failed:
+        store_geocode(address_key, None)
+    return None
+
+
+def _nominatim_geocode(address_line1, city, state, zip_code, country):
+    """
+    Ask Nominatim for an address, falling back to less specific forms of it.
+    Returns (latitude, longitude) or None when not found; raises when the
+    geocoder keeps failing.
+    """
+    queries = [
+        f"{address_line1}, {city}, {state} {zip_code}, {country}",
+        # Try without zip code
+        f"{address_line1}, {city}, {state}, {country}",
+        # Try with just city and state (for major landmarks)
+        f"{address_line1}, {city}, {state}",
+    ]
+    
+    for full_address in queries:
+        logger.info(f"Geocoding address: {full_address}")
+        print(f"DEBUG GEO_UTILS: Attempting to geocode: {full_address}")
+        
+        attempt = 0
+        while True:
+            try:
+                location = _geocoder_query(full_address)
+                break
+            except Exception as e:
+                attempt += 1
+                if isinstance(e, GeocoderRateLimited):
+                    # Throttled: slow the whole process down, not just this call
+                    geocoder_stats.increment('throttles')
+                    # The next acquire() waits out the pause
+                    _rate_limiter.pause(e.retry_after or GEOCODER_BACKOFF_SECONDS * 2 ** attempt)
+                    delay = 0
+                else:
+                    geocoder_stats.increment('errors')
+                    delay = GEOCODER_BACKOFF_SECONDS * 2 ** (attempt - 1)
+                logger.error(f"Error geocoding address: {str(e)}")
+                print(f"DEBUG GEO_UTILS: Error during geocoding (attempt {attempt}): {str(e)}")
+                if attempt > GEOCODER_HTTP_RETRIES:
+                    raise
+                if delay:
+                    time.sleep(delay * (1 + random.random() / 2))
+        
+        if location:
+            logger.info(f"Geocoded address to: {location.latitude}, {location.longitude}")
+            print(f"DEBUG GEO_UTILS: Successfully geocoded to: {location.latitude}, {location.longitude}")
+            return (location.latitude, location.longitude)
+        logger.warning(f"Failed to geocode address: {full_address}")
     
+    print(f"DEBUG GEO_UTILS: Failed to geocode after {len(queries)} attempts")
     return None
 
 def create_point_from_coords(latitude, longitude):
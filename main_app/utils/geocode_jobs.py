@@ -0,0 +1,210 @@
+import datetime
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from ..models import Appointment, GeocodeJob, ServiceProvider, User
+from .geo_utils import (
+    GEOCODER_BACKOFF_SECONDS, GEOCODER_HTTP_RETRIES, GEOCODER_TIMEOUT_SECONDS, get_location_from_address
+)
+
+logger = logging.getLogger(__name__)
+
+# Jobs whose lookup keeps failing are given up after this many runs
+GEOCODE_JOB_MAX_ATTEMPTS = getattr(settings, 'GEOCODE_JOB_MAX_ATTEMPTS', 5)
+
+# First retry delay; doubled after every failed attempt
+GEOCODE_RETRY_SECONDS = 60
+
+# Longest one job can take: each of the three address forms tried once and
+# retried GEOCODER_HTTP_RETRIES times, every request timing out and backing off
+GEOCODE_JOB_MAX_SECONDS = 3 * (GEOCODER_HTTP_RETRIES + 1) * (
+    GEOCODER_TIMEOUT_SECONDS + GEOCODER_BACKOFF_SECONDS * 2 ** (GEOCODER_HTTP_RETRIES + 1) * 1.5
+)
+
+# How long claimed jobs are hidden from other workers. The lease of the
+# jobs still waiting in a batch is renewed before each one runs, so it
+# only has to outlast a single job (with room for rate limiter waits).
+GEOCODE_LEASE_SECONDS = int(2 * GEOCODE_JOB_MAX_SECONDS)
+
+
+def appointment_address_components(appointment):
+    """Address components of an appointment for get_location_from_address, or None if incomplete"""
+    if not (appointment.address_line1 and appointment.city and appointment.state):
+        return None
+    return {
+        'address_line1': appointment.address_line1,
+        'city': appointment.city,
+        'state': appointment.state,
+        'zip_code': appointment.zip_code or appointment.postal_code or '',
+        'country': appointment.country or 'United States'
+    }
+
+
+def enqueue_geocode(target_type, target_id):
+    """
+    Queue an address lookup. Call it inside the transaction that saves the
+    target, so the job only exists if the target does.
+    """
+    return GeocodeJob.objects.create(target_type=target_type, target_id=str(target_id))
+
+
+def _lease_until():
+    return timezone.now() + datetime.timedelta(seconds=GEOCODE_LEASE_SECONDS)
+
+
+def claim_geocode_jobs(limit):
+    """
+    Claim up to `limit` due jobs for this worker.
+
+    Rows locked by another worker are skipped, and claimed jobs have their
+    run_after pushed out by the lease so they are not handed out twice.
+    """
+    with transaction.atomic():
+        jobs = list(
+            GeocodeJob.objects.select_for_update(skip_locked=True)
+            .filter(status='pending', run_after__lte=timezone.now())
+            .order_by('run_after')[:limit]
+        )
+        if jobs:
+            GeocodeJob.objects.filter(pk__in=[job.pk for job in jobs]).update(run_after=_lease_until())
+    return jobs
+
+
+def renew_geocode_leases(jobs):
+    """Push the lease of claimed, still pending jobs forward again"""
+    GeocodeJob.objects.filter(pk__in=[job.pk for job in jobs], status='pending').update(run_after=_lease_until())
+
+
+def _geocode_appointment(appointment_id):
+    """
+    Look up an appointment's address and store the result.
+
+    Returns:
+        True when finished (resolved, or nothing left to geocode), False
+        when the lookup failed and should be retried
+    """
+    appointment = Appointment.objects.filter(pk=appointment_id).select_related('service').first()
+    if appointment is None:
+        # Deleted while queued
+        return True
+
+    address_components = appointment_address_components(appointment)
+    if address_components is None:
+        appointment.location_status = 'none'
+        appointment.save(update_fields=['location_status', 'updated_at'])
+        return True
+
+    location = get_location_from_address(address_components)
+    if location is None:
+        return False
+
+    appointment.location = location
+    # Also update the simple lat/lng fields for backward compatibility
+    appointment.latitude = location.y
+    appointment.longitude = location.x
+    appointment.location_status = 'resolved'
+    appointment.save(update_fields=['location', 'latitude', 'longitude', 'location_status', 'updated_at'])
+    print(f"DEBUG GEOCODE: Appointment {appointment.id} geocoded to {location.y}, {location.x}")
+    return True
+
+
+def _geocode_user(user_id):
+    """Look up a user's address queued by User.save; same return value as _geocode_appointment"""
+    user = User.objects.filter(pk=user_id).first()
+    if user is None or user.address_components() is None:
+        return True
+    if not user.geocode_now():
+        return False
+    user.save(update_fields=['location'], geocode=False)
+    print(f"DEBUG GEOCODE: User {user.pk} geocoded to {user.location.y}, {user.location.x}")
+
+    # A provider's business location follows the owner's address, as set by the profile endpoint
+    provider = ServiceProvider.objects.filter(user_id=user.pk).first()
+    if provider is not None:
+        provider.business_location = user.location
+        provider.latitude = user.location.y
+        provider.longitude = user.location.x
+        provider.save(update_fields=['business_location', 'latitude', 'longitude', 'updated_at'], geocode=False)
+    return True
+
+
+def _geocode_provider(provider_id):
+    """
+    Fill in a provider's missing business location, from the owner's
+    location or else the business address
+    """
+    provider = ServiceProvider.objects.filter(pk=provider_id).select_related('user').first()
+    if provider is None or provider.business_location:
+        return True
+
+    location = provider.user.location
+    if location is None:
+        address_components = provider.address_components()
+        if address_components is None:
+            return True
+        location = get_location_from_address(address_components)
+        if location is None:
+            return False
+
+    provider.business_location = location
+    provider.latitude = location.y
+    provider.longitude = location.x
+    provider.save(update_fields=['business_location', 'latitude', 'longitude', 'updated_at'], geocode=False)
+    print(f"DEBUG GEOCODE: Provider {provider.pk} located at {location.y}, {location.x}")
+    return True
+
+
+def _give_up_geocode(job):
+    """Record that a job's target could not be geocoded"""
+    if job.target_type == 'appointment':
+        Appointment.objects.filter(pk=job.target_id, location_status='pending').update(location_status='failed')
+
+
+GEOCODE_HANDLERS = {
+    'appointment': _geocode_appointment,
+    'user': _geocode_user,
+    'provider': _geocode_provider,
+}
+
+
+def run_geocode_job(job):
+    """
+    Run one claimed job and record the outcome on it.
+
+    Returns:
+        the job's new status ('done', 'pending' for a retry, or 'failed')
+    """
+    job.attempts += 1
+    try:
+        finished = GEOCODE_HANDLERS[job.target_type](job.target_id)
+        job.last_error = '' if finished else 'No location found for the address'
+    except Exception as e:
+        logger.error(f"Error running geocode job {job.pk}: {str(e)}")
+        finished = False
+        job.last_error = str(e)
+
+    if finished:
+        job.status = 'done'
+    elif job.attempts >= GEOCODE_JOB_MAX_ATTEMPTS:
+        job.status = 'failed'
+        _give_up_geocode(job)
+    else:
+        job.run_after = timezone.now() + datetime.timedelta(
+            seconds=GEOCODE_RETRY_SECONDS * 2 ** (job.attempts - 1)
+        )
+    job.save(update_fields=['status', 'attempts', 'last_error', 'run_after', 'updated_at'])
+    return job.status
+
+
+def run_geocode_jobs(limit=10):
+    """Claim and run up to `limit` due jobs; returns how many were run"""
+    jobs = claim_geocode_jobs(limit)
+    for position, job in enumerate(jobs):
+        if position:
+            # Earlier jobs may have used up much of the lease of the waiting ones
+            renew_geocode_leases(jobs[position:])
+        run_geocode_job(job)
+    return len(jobs)
@@ -0,0 +1,224 @@
+import hashlib
+import logging
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed by the offline backend
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Files of an offline dataset directory (see build_offline_dataset)
+ZIP_CENTROIDS_FILE = 'zip_centroids.npy'
+STREET_SEGMENTS_FILE = 'street_segments.npy'
+
+ZIP_CENTROID_DTYPE = [('zip', '<u4'), ('lat', '<f8'), ('lng', '<f8')]
+STREET_SEGMENT_DTYPE = [
+    ('key', '<u8'), ('from_number', '<u4'), ('to_number', '<u4'),
+    ('start_lat', '<f8'), ('start_lng', '<f8'), ('end_lat', '<f8'), ('end_lng', '<f8'),
+]
+
+# Words that start the unit part of a street line ("12 MAIN ST APT 4")
+UNIT_DESIGNATORS = {'APT', 'STE', 'UNIT', 'BLDG', 'FL', 'RM', 'LOT'}
+
+
+def street_key(street_name, zip5):
+    """Stable 64-bit key of a normalized street name within a ZIP code"""
+    digest = hashlib.blake2b(f"{street_name}|{zip5}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def split_house_number(street):
+    """
+    Split a normalized street line into (house number or None, street name),
+    dropping any unit part.
+    """
+    words = street.split()
+    number = None
+    if words and words[0].isdigit():
+        number = int(words[0])
+        words = words[1:]
+    for position, word in enumerate(words):
+        if word in UNIT_DESIGNATORS:
+            words = words[:position]
+            break
+    return number, ' '.join(words)
+
+
+class GeocoderBackend:
+    """
+    One way of turning an address into coordinates.
+
+    geocode() returns (latitude, longitude), or None when the backend does not
+    know the address, and raises when it cannot answer (e.g. network errors).
+    Results of `cacheable` backends are stored in the geocode cache.
+    """
+    name = None
+    cacheable = True
+
+    def geocode(self, address_line1, city, state, zip_code, country):
+        raise NotImplementedError
+
+
+class NominatimGeocoder(GeocoderBackend):
+    """The OpenStreetMap Nominatim service, through the shared rate-limited client"""
+    name = 'nominatim'
+
+    def geocode(self, address_line1, city, state, zip_code, country):
+        from .geo_utils import _nominatim_geocode
+        return _nominatim_geocode(address_line1, city, state, zip_code, country)
+
+
+class OfflineGeocoder(GeocoderBackend):
+    """
+    Geocodes from a local dataset, without network access.
+
+    The dataset is a directory of sorted numpy arrays, memory-mapped so
+    every process shares the pages and a lookup is a binary search:
+    street segments (optional) give an interpolated position along the
+    block, ZIP centroids a coarse fallback. Results are approximate, so
+    they are not stored in the geocode cache.
+    """
+    name = 'offline'
+    cacheable = False
+
+    def __init__(self, directory=None):
+        directory = directory or getattr(settings, 'OFFLINE_GEOCODER_DIR', 'geodata')
+        if np is None:
+            raise ImproperlyConfigured("The offline geocoder requires numpy to be installed")
+        zip_path = os.path.join(directory, ZIP_CENTROIDS_FILE)
+        if not os.path.exists(zip_path):
+            raise ImproperlyConfigured(
+                f"No offline geocoder dataset in {directory}; build one with manage.py build_offline_geocoder"
+            )
+        self.zips = np.load(zip_path, mmap_mode='r')
+        self._zip_codes = self.zips['zip']
+        street_path = os.path.join(directory, STREET_SEGMENTS_FILE)
+        self.streets = np.load(street_path, mmap_mode='r') if os.path.exists(street_path) else None
+        self._street_keys = self.streets['key'] if self.streets is not None else None
+
+    def geocode(self, address_line1, city, state, zip_code, country):
+        from .geo_utils import normalize_street
+
+        zip5 = re.sub(r"\D", '', zip_code or '')[:5]
+        if len(zip5) != 5:
+            return None
+
+        if self.streets is not None:
+            number, street_name = split_house_number(normalize_street(address_line1))
+            coords = self._street_position(street_key(street_name, zip5), number)
+            if coords is not None:
+                return coords
+
+        index = int(np.searchsorted(self._zip_codes, int(zip5)))
+        if index < len(self._zip_codes) and self._zip_codes[index] == int(zip5):
+            centroid = self.zips[index]
+            return (float(centroid['lat']), float(centroid['lng']))
+        return None
+
+    def _street_position(self, key, number):
+        """Point along the street segment holding the house number, or the first segment's midpoint"""
+        key = np.uint64(key)
+        start = int(np.searchsorted(self._street_keys, key, side='left'))
+        end = int(np.searchsorted(self._street_keys, key, side='right'))
+        if start == end:
+            return None
+
+        segments = self.streets[start:end]
+        segment, fraction = segments[0], 0.5
+        if number is not None:
+            for candidate in segments:
+                low, high = int(candidate['from_number']), int(candidate['to_number'])
+                if min(low, high) <= number <= max(low, high):
+                    segment = candidate
+                    fraction = (number - low) / (high - low) if high != low else 0.5
+                    break
+
+        return (
+            float(segment['start_lat'] + (segment['end_lat'] - segment['start_lat']) * fraction),
+            float(segment['start_lng'] + (segment['end_lng'] - segment['start_lng']) * fraction),
+        )
+
+
+def build_offline_dataset(directory, zip_rows, street_rows=()):
+    """
+    Write an OfflineGeocoder dataset.
+
+    Args:
+        directory: output directory, created if needed
+        zip_rows: iterable of (zip, latitude, longitude)
+        street_rows: iterable of (street name, zip, from number, to number,
+                     start latitude, start longitude, end latitude, end longitude)
+
+    Returns:
+        (number of ZIP centroids, number of street segments)
+    """
+    from .geo_utils import normalize_street
+
+    if np is None:
+        raise ImproperlyConfigured("The offline geocoder requires numpy to be installed")
+    os.makedirs(directory, exist_ok=True)
+
+    zips = np.array(
+        [(int(str(zip_code)[:5]), float(lat), float(lng)) for zip_code, lat, lng in zip_rows],
+        dtype=ZIP_CENTROID_DTYPE
+    )
+    zips.sort(order='zip')
+    np.save(os.path.join(directory, ZIP_CENTROIDS_FILE), zips)
+
+    streets = np.array(
+        [
+            (street_key(normalize_street(street), str(zip_code)[:5]), int(from_number), int(to_number),
+             float(start_lat), float(start_lng), float(end_lat), float(end_lng))
+            for street, zip_code, from_number, to_number, start_lat, start_lng, end_lat, end_lng in street_rows
+        ],
+        dtype=STREET_SEGMENT_DTYPE
+    )
+    street_path = os.path.join(directory, STREET_SEGMENTS_FILE)
+    if len(streets):
+        streets.sort(order=['key', 'from_number'])
+        np.save(street_path, streets)
+    elif os.path.exists(street_path):
+        os.remove(street_path)
+    return len(zips), len(streets)
+
+
+GEOCODER_BACKEND_CLASSES = {
+    'nominatim': NominatimGeocoder,
+    'offline': OfflineGeocoder,
+}
+
+# Built on first use from GEOCODER_BACKENDS
+_backends = None
+
+
+def geocoder_chain():
+    """
+    The configured lookup order, e.g. ['cache', 'offline', 'nominatim'].
+
+    'cache' is the GeocodeCache table (with its in-memory LRU); the other
+    names are GEOCODER_BACKEND_CLASSES.
+    """
+    chain = getattr(settings, 'GEOCODER_BACKENDS', ('cache', 'nominatim'))
+    if isinstance(chain, str):
+        chain = [name.strip() for name in chain.split(',') if name.strip()]
+    for name in chain:
+        if name != 'cache' and name not in GEOCODER_BACKEND_CLASSES:
+            raise ImproperlyConfigured(
+                f"Unknown geocoder backend {name!r} in GEOCODER_BACKENDS, expected 'cache', "
+                + ", ".join(repr(known) for known in GEOCODER_BACKEND_CLASSES)
+            )
+    return list(chain)
+
+
+def geocoder_backends():
+    """The configured backends (everything in the chain but 'cache'), created once per process"""
+    global _backends
+    if _backends is None:
+        _backends = [GEOCODER_BACKEND_CLASSES[name]() for name in geocoder_chain() if name != 'cache']
+    return _backends
@@ -0,0 +1,47 @@
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..models import SyncTombstone
+
+# Deletions are remembered this long; clients that last synced earlier get a full sync
+SYNC_TOMBSTONE_DAYS = getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30)
+
+# Rows are saved with the time of the save, not of the commit, so a client's
+# next sync looks back this far to catch rows committed after its last one
+SYNC_OVERLAP_SECONDS = getattr(settings, 'SYNC_OVERLAP_SECONDS', 10)
+
+
+def tombstone_appointments(rows):
+    """
+    Record deleted appointments for the sync endpoint.
+
+    Args:
+        rows: (id, provider_id, consumer_id) of each appointment, read before
+              the delete, e.g. with values_list('id', 'provider_id', 'consumer_id')
+    """
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(object_type='appointment', object_id=str(appointment_id),
+                      provider_id=provider_id, consumer_id=consumer_id)
+        for appointment_id, provider_id, consumer_id in rows
+    ])
+
+
+def tombstone_availability(provider_id, availability_ids):
+    """Record a provider's deleted availability blocks for the sync endpoint"""
+    SyncTombstone.objects.bulk_create([
+        SyncTombstone(object_type='availability', object_id=str(availability_id), provider_id=provider_id)
+        for availability_id in availability_ids
+    ])
+
+
+def sync_horizon():
+    """Oldest updated_since a delta sync can still answer; older clients need a full sync"""
+    return timezone.now() - datetime.timedelta(days=SYNC_TOMBSTONE_DAYS)
+
+
+def prune_sync_tombstones():
+    """Delete tombstones past the retention period; returns how many were deleted"""
+    deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=sync_horizon()).delete()
+    return deleted
@@ -7,9 +7,16 @@ from django.utils import timezone
 from django.db.models import Q
 from django.utils.dateparse import parse_datetime
 from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.conf import settings
 import json
+import base64
+import hashlib
 import uuid
 import datetime
 import random
@@ -24,18 +31,27 @@ from django.views.generic import ListView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.authtoken.models import Token
 from rest_framework import status as http_status
 from rest_framework.permissions import BasePermission
 
 from django.views.generic.list import ListView
-from .models import User, ServiceProvider, Service, Appointment, ProviderAvailability
+from .models import User, ServiceProvider, Service, Appointment, ProviderAvailability, SyncTombstone
 from .forms import UserRegistrationForm, ServiceProviderForm, ServiceForm, AppointmentForm
-
-# Define a global constant for buffer time in minutes
-# This ensures consistent buffer time across all functions
-BUFFER_MINUTES = 15
+from .utils.geocode_jobs import appointment_address_components, enqueue_geocode
+from .utils.geo_utils import geocoder_stats
+from .utils.sync import SYNC_OVERLAP_SECONDS, sync_horizon, tombstone_appointments, tombstone_availability
+from .scheduling import (
+    AVAILABILITY_MAX_DAYS, AVAILABILITY_STREAM_CHUNK_DAYS, AVAILABILITY_CACHE_TODAY_TIMEOUT,
+    DEFAULT_AVAILABILITY_DAYS, BUFFER_MINUTES, DISCOUNT_ADJACENCY_MINUTES, AdjacentAppointments,
+    availability_day_keys, free_slot_iterator, iter_interval_slots, nearby_appointment_distances,
+    compute_provider_slots, compute_service_slots, compute_provider_free_intervals,
+    load_discount_calendar, materialize_free_slots, read_free_slots,
+    AvailabilityCacheEntry, cached_service_provider_id, location_bucket, remember_service_provider,
+    provider_discount_table, haversine_yards, quote_slot_discounts, np, ACTIVE_APPOINTMENT_STATUSES,
+    PROXIMITY_DISCOUNT_ZONES, consumer_zone_appointments, discount_zones_ready, invalidate_discount_zones
+)
 
 # For parsing ISO format datetimes
 from dateutil.parser import parse as parse_datetime
@@ -131,33 +147,7 @@ class RegisterAPI(APIView):
                 zip_code=zip_code
             )
             
-            # Geocode the address if we have enough information
-            if street_address and city and state:
-                try:
-                    print(f"DEBUG RegisterAPI: Geocoding address during registration")
-                    from .utils.geo_utils import get_location_from_address
-                    
-                    address_components = {
-                        'address_line1': street_address,
-                        'city': city,
-                        'state': state,
-                        'zip_code': zip_code,
-                        'country': 'USA'
-                    }
-                    
-                    # Get location point from address
-                    location = get_location_from_address(address_components)
-                    
-                    if location:
-                        print(f"DEBUG RegisterAPI: Successfully geocoded to {location.y}, {location.x}")
-                        user.location = location
-                        user.latitude = location.y
-                        user.longitude = location.x
-                        user.save()
-                    else:
-                        print(f"DEBUG RegisterAPI: Failed to geocode address during registration")
-                except Exception as e:
-                    print(f"DEBUG RegisterAPI: Error geocoding address: {str(e)}")
+            # Saving a complete address queued a geocode job; the location is filled in by it
             
             # Create token
             token, _ = Token.objects.get_or_create(user=user)
@@ -405,6 +395,22 @@ class ServiceCreateAPI(APIView):
                 'error': str(e)
             }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _etag(*parts):
+    """Build a strong ETag from the values a response depends on"""
+    return quote_etag(hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest())
+
+def _not_modified(request, etag):
+    """Return a 304 response if the client's If-None-Match already has this ETag, otherwise None"""
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=etag)
+
+def _with_etag(response, etag):
+    """Attach the ETag to successful responses only, so errors are never revalidated as current"""
+    if etag is not None and response.status_code == 200:
+        response['ETag'] = etag
+    return response
+
 class ServiceListAPI(APIView):
     permission_classes = [AllowAny]  # Allow any user to view services
     
@@ -412,8 +418,21 @@ class ServiceListAPI(APIView):
         """Get all services"""
         try:
             from .models import Service
+            from django.db.models import Count, Max
             services = Service.objects.filter(is_active=True)
             
+            # Answer revalidation from a single aggregate before building the list.
+            # Edits bump updated_at and removals change the count.
+            version = services.aggregate(
+                count=Count('id'),
+                service_updated=Max('updated_at'),
+                provider_updated=Max('provider__updated_at')
+            )
+            etag = _etag('services', version['count'], version['service_updated'], version['provider_updated'])
+            not_modified = _not_modified(request, etag)
+            if not_modified is not None:
+                return not_modified
+            
             # Convert services to a list of dictionaries
             service_list = []
             for service in services:
@@ -431,7 +450,7 @@ class ServiceListAPI(APIView):
                     }
                 })
             
-            return Response(service_list)
+            return _with_etag(Response(service_list), etag)
         except Exception as e:
             return Response({
                 'error': str(e)
@@ -444,6 +463,14 @@ class ServiceDetailAPI(APIView):
         """Get service by ID"""
         try:
             from .models import Service
+            
+            # Answer revalidation from the update timestamps alone
+            version = Service.objects.filter(id=service_id).values_list('updated_at', 'provider__updated_at').first()
+            etag = _etag('service', service_id, *version) if version else None
+            not_modified = _not_modified(request, etag)
+            if not_modified is not None:
+                return not_modified
+            
             try:
                 service = Service.objects.get(id=service_id)
             except Service.DoesNotExist:
@@ -466,7 +493,7 @@ class ServiceDetailAPI(APIView):
                 }
             }
             
-            return Response(service_data)
+            return _with_etag(Response(service_data), etag)
         except Exception as e:
             return Response({
                 'error': str(e)
@@ -622,9 +649,6 @@ class UserProfileAPI(APIView):
         state = request.data.get('state')
         zip_code = request.data.get('zip_code')
         
-        # Track if address fields were updated to trigger geocoding
-        address_updated = False
-        
         if email:
             # Check if email already exists but belongs to another user
             if User.objects.filter(email=email).exclude(id=user.id).exists():
@@ -642,22 +666,18 @@ class UserProfileAPI(APIView):
         # Update new address fields
         if street_address is not None:
             user.street_address = street_address
-            address_updated = True
             
         if apartment is not None:
             user.apartment = apartment
             
         if city is not None:
             user.city = city
-            address_updated = True
             
         if state is not None:
             user.state = state
-            address_updated = True
             
         if zip_code is not None:
             user.zip_code = zip_code
-            address_updated = True
             
         # If address fields are provided but address is not, create a combined address
         if not address and any([street_address, apartment, city, state, zip_code]):
@@ -680,41 +700,7 @@ class UserProfileAPI(APIView):
                 
             user.address = '\n'.join(address_parts)
         
-        # Try to geocode the address if address fields were updated or if there's no location
-        should_geocode = address_updated or user.location is None
-        
-        if should_geocode and user.street_address and user.city and user.state:
-            try:
-                print(f"DEBUG UserProfileAPI: Geocoding address for {user.street_address}, {user.city}, {user.state}")
-                from .utils.geo_utils import get_location_from_address
-                
-                address_components = {
-                    'address_line1': user.street_address,
-                    'city': user.city,
-                    'state': user.state,
-                    'zip_code': user.zip_code,
-                    'country': 'USA'
-                }
-                
-                print(f"DEBUG UserProfileAPI: Geocoding with components: {address_components}")
-                
-                # Get location point from address
-                location = get_location_from_address(address_components)
-                
-                if location:
-                    print(f"DEBUG UserProfileAPI: Successfully geocoded to {location.y}, {location.x}")
-                    user.location = location
-                    # Also update the simple lat/lng fields for backward compatibility
-                    user.latitude = location.y
-                    user.longitude = location.x
-                else:
-                    print(f"DEBUG UserProfileAPI: Failed to geocode address")
-            except Exception as e:
-                print(f"DEBUG UserProfileAPI: Error geocoding user address: {str(e)}")
-                import traceback
-                traceback.print_exc()
-        
-        # Save the user after all updates
+        # Save the user after all updates; a changed address queues a geocode job
         user.save()
         
         # Update provider profile location if it exists
@@ -759,11 +745,21 @@ class UserProfileAPI(APIView):
         try:
             # Delete the user's appointments
             from .models import Appointment
-            Appointment.objects.filter(consumer=user).delete()
+            # Their providers get that time back through the delete signals
+            user_appointments = Appointment.objects.filter(consumer=user)
+            with transaction.atomic():
+                tombstone_appointments(user_appointments.values_list('id', 'provider_id', 'consumer_id'))
+                user_appointments.delete()
             
             # Delete the user's provider profile if it exists
             if hasattr(user, 'provider_profile'):
-                user.provider_profile.delete()
+                with transaction.atomic():
+                    # Its appointments go with it; their consumers are told through tombstones
+                    tombstone_appointments(
+                        Appointment.objects.filter(provider=user.provider_profile)
+                        .values_list('id', 'provider_id', 'consumer_id')
+                    )
+                    user.provider_profile.delete()
             
             # Delete the user's auth token
             from rest_framework.authtoken.models import Token
@@ -1042,213 +1038,399 @@ class ProviderAvailabilityAPI(APIView):
             # Get availability data
             availability_data = request.data
             
-            # Delete existing availability
-            ProviderAvailability.objects.filter(provider=provider).delete()
-            
-            # Create new availability blocks
+            # The blocks the provider should end up with, by (day, start, end)
+            wanted_blocks = set()
             for day_key, blocks in availability_data.items():
                 for block in blocks:
+                    start_time = parse_datetime(block['start'])
+                    end_time = parse_datetime(block['end'])
+                    wanted_blocks.add((
+                        day_key,
+                        timezone.make_aware(start_time) if timezone.is_naive(start_time) else start_time,
+                        timezone.make_aware(end_time) if timezone.is_naive(end_time) else end_time
+                    ))
+            
+            with transaction.atomic():
+                # Unchanged blocks are kept, so syncing clients only see the ones that changed
+                existing_blocks = {
+                    (block.day_of_week, block.start_time, block.end_time): block.id
+                    for block in ProviderAvailability.objects.filter(provider=provider)
+                }
+                removed_ids = [
+                    block_id for block_key, block_id in existing_blocks.items() if block_key not in wanted_blocks
+                ]
+                ProviderAvailability.objects.filter(id__in=removed_ids).delete()
+                tombstone_availability(provider.id, removed_ids)
+                
+                # Create new availability blocks
+                added_blocks = wanted_blocks - existing_blocks.keys()
+                for day_key, start_time, end_time in added_blocks:
                     ProviderAvailability.objects.create(
                         provider=provider,
                         day_of_week=day_key,
-                        start_time=block['start'],
-                        end_time=block['end']
+                        start_time=start_time,
+                        end_time=end_time
                     )
             
+            # Zones of the changed days were built from their old blocks
+            changed_days = {day_key for day_key, _, _ in added_blocks}
+            changed_days.update(
+                day_key for (day_key, _, _), block_id in existing_blocks.items() if block_id in removed_ids
+            )
+            if changed_days:
+                invalidate_discount_zones(provider.id, sorted(changed_days))
+            
             return Response(availability_data)
         except Exception as e:
             return Response({
                 'error': str(e)
             }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-class ServiceAvailabilityAPI(APIView):
-    permission_classes = [AllowAny]  # Allow anyone to view availability
+def _serialize_availability_rule(rule):
+    return {
+        'id': rule.id,
+        'weekday': rule.weekday,
+        'start': rule.start_time.strftime('%H:%M'),
+        'end': rule.end_time.strftime('%H:%M'),
+        'valid_from': rule.valid_from.isoformat(),
+        'valid_until': rule.valid_until.isoformat() if rule.valid_until else None,
+        'exceptions': rule.exceptions
+    }
 
-    def get(self, request, service_id):
-        """Get availability for a specific service with accurate conflict detection"""
+def _apply_availability_rule_data(rule, data):
+    """
+    Copy request data onto an AvailabilityRule, leaving missing fields as they are.
+
+    Expects {"weekday": 0-6 (Monday is 0), "start": "HH:MM", "end": "HH:MM",
+    "valid_from": "YYYY-MM-DD", "valid_until": "YYYY-MM-DD" or null,
+    "exceptions": ["YYYY-MM-DD", ...]}.
+
+    Raises:
+        ValueError: with a message for the client when the data is invalid
+    """
+    if 'weekday' in data:
         try:
-            # Add debug logging
-            print(f"DEBUG AVAILABILITY: Calculating availability for service {service_id}")
+            rule.weekday = int(data['weekday'])
+        except (TypeError, ValueError):
+            raise ValueError('weekday must be an integer from 0 (Monday) to 6 (Sunday)')
+    if rule.weekday is None or not 0 <= rule.weekday <= 6:
+        raise ValueError('weekday must be an integer from 0 (Monday) to 6 (Sunday)')
+    
+    try:
+        if 'start' in data:
+            rule.start_time = datetime.time.fromisoformat(data['start'])
+        if 'end' in data:
+            rule.end_time = datetime.time.fromisoformat(data['end'])
+    except (TypeError, ValueError):
+        raise ValueError('start and end must be times in HH:MM format')
+    if rule.start_time is None or rule.end_time is None or rule.start_time >= rule.end_time:
+        raise ValueError('start must be before end')
+    
+    try:
+        if 'valid_from' in data:
+            rule.valid_from = datetime.date.fromisoformat(data['valid_from'])
+        if 'valid_until' in data:
+            rule.valid_until = datetime.date.fromisoformat(data['valid_until']) if data['valid_until'] else None
+        if 'exceptions' in data:
+            rule.exceptions = sorted({datetime.date.fromisoformat(day).isoformat() for day in data['exceptions']})
+    except (TypeError, ValueError):
+        raise ValueError('valid_from, valid_until and exceptions must be dates in YYYY-MM-DD format')
+    if rule.valid_from is None:
+        rule.valid_from = timezone.now().date()
+    if rule.valid_until is not None and rule.valid_until < rule.valid_from:
+        raise ValueError('valid_until cannot be before valid_from')
+
+def _owned_provider(request, provider_id):
+    """Return the provider if it belongs to the signed-in user, otherwise None"""
+    if not request.user.is_authenticated:
+        return None
+    return ServiceProvider.objects.filter(id=provider_id, user=request.user).first()
+
+class ProviderAvailabilityRulesAPI(APIView):
+    def get(self, request, provider_id):
+        """List a provider's weekly availability rules"""
+        try:
+            from .models import AvailabilityRule
             
-            from .models import Service, ProviderAvailability, Appointment
-            # Check if service exists
-            service = Service.objects.get(id=service_id)
+            if not ServiceProvider.objects.filter(id=provider_id).exists():
+                return Response({
+                    'error': 'Provider not found'
+                }, http_status.HTTP_404_NOT_FOUND)
             
-            # Get provider associated with this service
-            provider = service.provider
-            print(f"DEBUG AVAILABILITY: Found provider: {provider.business_name}")
+            rules = AvailabilityRule.objects.filter(provider_id=provider_id).order_by('weekday', 'start_time')
+            return Response([_serialize_availability_rule(rule) for rule in rules])
+        except Exception as e:
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def post(self, request, provider_id):
+        """Add one weekly availability rule; the write size does not depend on how far ahead it applies"""
+        try:
+            from .models import AvailabilityRule
             
-            # Get existing appointments for this provider (not just this service)
-            # This ensures we account for all provider commitments
-            existing_appointments = Appointment.objects.filter(
-                service__provider=provider,  # All provider appointments
-                status__in=['pending', 'confirmed', 'completed']  # Only active appointments
-            )
+            provider = _owned_provider(request, provider_id)
+            if provider is None:
+                return Response({
+                    'error': 'You do not have permission to update this provider\'s availability'
+                }, http_status.HTTP_403_FORBIDDEN)
             
-            print(f"DEBUG AVAILABILITY: Found {existing_appointments.count()} existing appointments")
-            for appt in existing_appointments:
-                print(f"DEBUG AVAILABILITY: Existing appointment: {appt.service.name} - {appt.start_time} to {appt.end_time}")
+            rule = AvailabilityRule(provider=provider)
+            try:
+                _apply_availability_rule_data(rule, request.data)
+            except ValueError as e:
+                return Response({
+                    'error': str(e)
+                }, http_status.HTTP_400_BAD_REQUEST)
+            rule.save()
             
-            # Buffer time in minutes to add to both sides of appointments
-            buffer_minutes = BUFFER_MINUTES
+            return Response(_serialize_availability_rule(rule), http_status.HTTP_201_CREATED)
+        except Exception as e:
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ProviderAvailabilityRuleDetailAPI(APIView):
+    def put(self, request, provider_id, rule_id):
+        """Update a weekly availability rule"""
+        try:
+            from .models import AvailabilityRule
             
-            # Create buffered time blocks for existing appointments
-            blocked_periods = []
-            for appointment in existing_appointments:
-                # Add buffer before and after the appointment
-                buffered_start = appointment.start_time - timezone.timedelta(minutes=buffer_minutes)
-                buffered_end = appointment.end_time + timezone.timedelta(minutes=buffer_minutes)
-                
-                blocked_periods.append({
-                    'start': buffered_start,
-                    'end': buffered_end,
-                    'original_appointment': appointment
-                })
-                print(f"DEBUG AVAILABILITY: Blocked period: {buffered_start} to {buffered_end} (from appointment {appointment.id})")
+            provider = _owned_provider(request, provider_id)
+            if provider is None:
+                return Response({
+                    'error': 'You do not have permission to update this provider\'s availability'
+                }, http_status.HTTP_403_FORBIDDEN)
             
-            # Get provider's availabilities
-            availabilities = ProviderAvailability.objects.filter(provider=provider)
-            print(f"DEBUG AVAILABILITY: Found {availabilities.count()} availability blocks")
+            try:
+                rule = AvailabilityRule.objects.get(id=rule_id, provider=provider)
+            except AvailabilityRule.DoesNotExist:
+                return Response({
+                    'error': 'Availability rule not found'
+                }, http_status.HTTP_404_NOT_FOUND)
             
-            # Organize availability by date
-            date_availability = {}
+            try:
+                _apply_availability_rule_data(rule, request.data)
+            except ValueError as e:
+                return Response({
+                    'error': str(e)
+                }, http_status.HTTP_400_BAD_REQUEST)
+            rule.save()
             
-            # Show 14 days of availability starting from today
-            for i in range(14):
-                curr_date = timezone.now().date() + timezone.timedelta(days=i)
-                date_str = curr_date.strftime('%Y-%m-%d')
-                date_availability[date_str] = []
-                
-                # Get availability records that match this specific date
-                matching_avail = [avail for avail in availabilities if avail.day_of_week == date_str]
-                
-                if not matching_avail:
-                    # If no explicit date match, continue to next date
-                    continue
-                
-                for avail in matching_avail:
-                    # Create available time blocks
-                    start_time = avail.start_time
-                    end_time = avail.end_time
-                    
-                    # For current day, adjust start_time if it's in the past or within the buffer period
-                    if i == 0:  # Today
-                        # Calculate minimum start time (now + 1 hour)
-                        now_plus_hour = timezone.now() + timezone.timedelta(hours=1)
-                        min_time = now_plus_hour.time()
-                        
-                        # Make sure we're comparing time objects to time objects
-                        start_time_value = start_time
-                        if isinstance(start_time, datetime.datetime):
-                            start_time_value = start_time.time()
-                        
-                        # If availability starts before the minimum time, adjust it
-                        if start_time_value < min_time:
-                            print(f"DEBUG AVAILABILITY: Adjusting today's availability from {start_time} to {min_time}")
-                            # Convert min_time (a time object) to a datetime object with the same date as end_time
-                            if isinstance(start_time, datetime.datetime) and isinstance(min_time, datetime.time):
-                                min_datetime = datetime.datetime.combine(
-                                    start_time.date(),
-                                    min_time,
-                                    tzinfo=timezone.get_current_timezone()
-                                )
-                                start_time = min_datetime
-                            else:
-                                start_time = min_time
-                        
-                        # If the entire availability block is now invalid, skip it
-                        # Ensure both are the same type before comparison
-                        if isinstance(start_time, datetime.time) and isinstance(end_time, datetime.datetime):
-                            # Convert start_time to datetime for comparison
-                            start_datetime = datetime.datetime.combine(
-                                end_time.date(),
-                                start_time,
-                                tzinfo=timezone.get_current_timezone()
-                            )
-                            if start_datetime >= end_time:
-                                print(f"DEBUG AVAILABILITY: Skipping availability block - no valid time left today")
-                                continue
-                        elif isinstance(start_time, datetime.datetime) and isinstance(end_time, datetime.time):
-                            # Convert end_time to datetime for comparison
-                            end_datetime = datetime.datetime.combine(
-                                start_time.date(),
-                                end_time,
-                                tzinfo=timezone.get_current_timezone()
-                            )
-                            if start_time >= end_datetime:
-                                print(f"DEBUG AVAILABILITY: Skipping availability block - no valid time left today")
-                                continue
-                        else:
-                            # Both are the same type, can compare directly
-                            if start_time >= end_time:
-                                print(f"DEBUG AVAILABILITY: Skipping availability block - no valid time left today")
-                                continue
-                    
-                    # Calculate how many service slots fit in this availability block
-                    duration_minutes = service.duration
-                    
-                    # Calculate total block minutes available
-                    block_minutes = (end_time - start_time).total_seconds() / 60
-                    print(f"DEBUG AVAILABILITY: Block {date_str} from {start_time} to {end_time} ({block_minutes} minutes)")
-                    
-                    # Calculate slots using service duration
-                    available_slots = []
-                    current_start = start_time
-                    slot_index = 0
-                    
-                    # Loop until we can't fit another appointment
-                    while True:
-                        # Calculate end time for this slot
-                        current_end = current_start + timezone.timedelta(minutes=duration_minutes)
-                        
-                        # If this slot would exceed the availability block, break
-                        if current_end > end_time:
-                            break
-                        
-                        # Create a slot
-                        slot = {
-                            'id': f"slot-{date_str}-{slot_index}",
-                            'start': current_start,
-                            'end': current_end,
-                            'duration': duration_minutes
-                        }
-                        
-                        # Check if slot overlaps with ANY buffered appointment block
-                        is_available = True
-                        for blocked in blocked_periods:
-                            # Only check same day blocked periods
-                            block_date = blocked['start'].strftime('%Y-%m-%d')
-                            slot_date = current_start.strftime('%Y-%m-%d')
-                            if block_date != slot_date:
-                                continue
-                                
-                            # Check if this slot overlaps with the blocked period
-                            # (slot starts before blocked period ends AND slot ends after blocked period starts)
-                            if slot['start'] < blocked['end'] and slot['end'] > blocked['start']:
-                                print(f"DEBUG AVAILABILITY: Slot {slot['id']} at {slot['start']} conflicts with appointment {blocked['original_appointment'].id} " + 
-                                      f"({blocked['original_appointment'].service.name}) at {blocked['original_appointment'].start_time} - {blocked['original_appointment'].end_time} " +
-                                      f"[buffered: {blocked['start']} - {blocked['end']}]")
-                                is_available = False
-                                break
-                        
-                        if is_available:
-                            available_slots.append(slot)
-                            print(f"DEBUG AVAILABILITY: Added available slot: {slot['id']} at {slot['start']}")
-                        
-                        # Move to the next potential slot - add duration PLUS buffer time for spacing between slots
-                        # This ensures each appointment has buffer time on both sides
-                        slot_index += 1
-                        current_start = current_start + timezone.timedelta(minutes=duration_minutes + BUFFER_MINUTES)
-                    
-                    # Add valid slots to the output for this date
-                    for slot in available_slots:
-                        date_availability[date_str].append({
-                            'id': slot['id'],
-                            'start': slot['start'].isoformat(),
-                            'end': slot['end'].isoformat()
-                        })
-            
-            return Response(date_availability)
+            return Response(_serialize_availability_rule(rule))
+        except Exception as e:
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def delete(self, request, provider_id, rule_id):
+        """Delete a weekly availability rule"""
+        try:
+            from .models import AvailabilityRule
+            
+            provider = _owned_provider(request, provider_id)
+            if provider is None:
+                return Response({
+                    'error': 'You do not have permission to update this provider\'s availability'
+                }, http_status.HTTP_403_FORBIDDEN)
+            
+            deleted, _ = AvailabilityRule.objects.filter(id=rule_id, provider=provider).delete()
+            if not deleted:
+                return Response({
+                    'error': 'Availability rule not found'
+                }, http_status.HTTP_404_NOT_FOUND)
+            
+            return Response(status=http_status.HTTP_204_NO_CONTENT)
+        except Exception as e:
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _availability_cache_entry(service_id, day_keys, variant='plain', discount=False):
+    """
+    Build the cache entry for a service's availability, resolving the provider
+    from the cache when possible so a cache hit never touches the database
+    """
+    provider_id = cached_service_provider_id(service_id)
+    if provider_id is None:
+        provider_id = Service.objects.values_list('provider_id', flat=True).get(id=service_id)
+        remember_service_provider(service_id, provider_id)
+    return AvailabilityCacheEntry(service_id, provider_id, day_keys, variant=variant, discount=discount)
+
+def _format_slots(slots):
+    """Serialize (slot_id, start, end) tuples the way the availability endpoints return them"""
+    return [
+        {
+            'id': slot_id,
+            'start': start.isoformat(),
+            'end': end.isoformat()
+        }
+        for slot_id, start, end in slots
+    ]
+
+def _availability_version(service_id, day_keys, discount=False):
+    """
+    Database state an availability response is computed from, for ETags when
+    availability caching is off (and so there are no generations): the service,
+    the provider's blocks for the days and weekly rules, the appointments
+    around the days and, with discounts, the discount config. Counts change
+    when rows are deleted and the latest updated_at on every other write,
+    so every process derives the same version from the same data.
+    
+    Raises:
+        Service.DoesNotExist: when there is no such service
+    """
+    from django.db.models import Count, Max
+    from .models import AvailabilityRule, ProximityDiscountConfig
+    
+    service_updated, provider_id = Service.objects.values_list('updated_at', 'provider_id').get(id=service_id)
+    
+    # Buffers, adjacency and blocks running past midnight let appointments
+    # on the neighbouring days change a day's slots too
+    first_day = datetime.date.fromisoformat(day_keys[0]) - datetime.timedelta(days=1)
+    last_day = datetime.date.fromisoformat(day_keys[-1]) + datetime.timedelta(days=2)
+    window_start = timezone.make_aware(datetime.datetime.combine(first_day, datetime.time.min))
+    window_end = timezone.make_aware(datetime.datetime.combine(last_day, datetime.time.min))
+    
+    version = [service_updated]
+    for rows in (
+        ProviderAvailability.objects.filter(provider_id=provider_id, day_of_week__in=day_keys),
+        AvailabilityRule.objects.filter(provider_id=provider_id),
+        Appointment.objects.filter(provider_id=provider_id, start_time__lt=window_end, end_time__gt=window_start),
+    ):
+        state = rows.aggregate(count=Count('pk'), updated=Max('updated_at'))
+        version += [state['count'], state['updated']]
+    if discount:
+        version.append(
+            ProximityDiscountConfig.objects.filter(provider_id=provider_id).values_list('updated_at', flat=True).first()
+        )
+    return version
+
+def _availability_etag(request, cache_entry, now, service_id, discount=False):
+    """
+    ETag for an availability response. With availability caching on it is
+    derived from the cache generations the entry already read, so it needs
+    no database work at all; the cache is then shared by every process, so
+    they all agree. With caching off it falls back to the database state
+    (see _availability_version). Today's slots move with the clock, so a
+    range that includes today also carries the current
+    AVAILABILITY_CACHE_TODAY_TIMEOUT window.
+    """
+    version = cache_entry.version()
+    if version is None:
+        version = _availability_version(service_id, cache_entry.day_keys, discount=discount)
+    parts = [cache_entry.variant, version, _wants_stream(request)]
+    if now.date().strftime('%Y-%m-%d') in cache_entry.day_keys:
+        parts.append(int(now.timestamp()) // AVAILABILITY_CACHE_TODAY_TIMEOUT)
+    return _etag(*parts)
+
+def _requested_day_keys(request, now):
+    """
+    Resolve the days an availability request covers.
+
+    Args:
+        request: DRF request with optional `start` (YYYY-MM-DD, default today)
+                 and `days` (default DEFAULT_AVAILABILITY_DAYS) query parameters
+        now: current time
+
+    Returns:
+        list of "YYYY-MM-DD" day keys
+
+    Raises:
+        ValueError: with a message for the client when a parameter is invalid
+    """
+    start_param = request.query_params.get('start')
+    days_param = request.query_params.get('days')
+    
+    try:
+        start_date = datetime.date.fromisoformat(start_param) if start_param else now.date()
+    except ValueError:
+        raise ValueError('start must be a date in YYYY-MM-DD format')
+    
+    if start_date < now.date():
+        raise ValueError('start cannot be in the past')
+    
+    try:
+        days = int(days_param) if days_param else DEFAULT_AVAILABILITY_DAYS
+    except ValueError:
+        raise ValueError('days must be an integer')
+    
+    if days < 1 or days > AVAILABILITY_MAX_DAYS:
+        raise ValueError(f'days must be between 1 and {AVAILABILITY_MAX_DAYS}')
+    
+    return availability_day_keys(start_date, days)
+
+def _wants_stream(request):
+    """Whether the client asked for availability to be streamed day by day"""
+    return request.query_params.get('stream', '').lower() in ('1', 'true', 'ndjson')
+
+def _stream_availability(day_keys, compute_days):
+    """
+    Stream availability as newline-delimited JSON, one {"date", "slots"} line per day.
+
+    Days are computed AVAILABILITY_STREAM_CHUNK_DAYS at a time so the first
+    lines go out while later days are still being worked on. The first chunk
+    is computed before the response starts, so errors such as an unknown
+    service still come back with a proper status code.
+
+    Args:
+        day_keys: list of "YYYY-MM-DD" day keys to stream
+        compute_days: callable taking a list of day keys and returning
+                      {day_key: slots} for them
+    """
+    chunks = [
+        day_keys[i:i + AVAILABILITY_STREAM_CHUNK_DAYS]
+        for i in range(0, len(day_keys), AVAILABILITY_STREAM_CHUNK_DAYS)
+    ]
+    first_chunk = compute_days(chunks[0])
+    
+    def lines():
+        for index, chunk_keys in enumerate(chunks):
+            date_availability = first_chunk if index == 0 else compute_days(chunk_keys)
+            for date_str in chunk_keys:
+                yield json.dumps({'date': date_str, 'slots': date_availability[date_str]}, cls=DjangoJSONEncoder) + '\n'
+    
+    return StreamingHttpResponse(lines(), content_type='application/x-ndjson')
+
+class ServiceAvailabilityAPI(APIView):
+    permission_classes = [AllowAny]  # Allow anyone to view availability
+
+    def get(self, request, service_id):
+        """
+        Get availability for a specific service with accurate conflict detection.
+        
+        Optional query parameters: `start` (YYYY-MM-DD, default today), `days`
+        (default 14, capped at AVAILABILITY_MAX_DAYS) and `stream=1` to get one
+        NDJSON line per day instead of a single JSON object.
+        """
+        try:
+            # Add debug logging
+            print(f"DEBUG AVAILABILITY: Calculating availability for service {service_id}")
+            
+            now = timezone.now()
+            try:
+                day_keys = _requested_day_keys(request, now)
+            except ValueError as e:
+                return Response({
+                    'error': str(e)
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            # Nothing changed since the client's copy: skip the slot computation
+            cache_entry = _availability_cache_entry(service_id, day_keys)
+            etag = _availability_etag(request, cache_entry, now, service_id)
+            not_modified = _not_modified(request, etag)
+            if not_modified is not None:
+                return not_modified
+            
+            if _wants_stream(request):
+                response = _stream_availability(
+                    day_keys,
+                    lambda chunk_keys: self._compute_days(service_id, chunk_keys, now)
+                )
+            else:
+                response = Response(self._compute_days(service_id, day_keys, now, cache_entry=cache_entry))
+            
+            return _with_etag(response, etag)
         except Service.DoesNotExist:
             return Response({
                 'error': 'Service not found'
@@ -1260,330 +1442,112 @@ class ServiceAvailabilityAPI(APIView):
             return Response({
                 'error': str(e)
             }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def _compute_days(self, service_id, day_keys, now, cache_entry=None):
+        """Formatted slots for the given days, served from the cache when every day is there"""
+        if cache_entry is None:
+            cache_entry = _availability_cache_entry(service_id, day_keys)
+        date_availability = cache_entry.get()
+        if date_availability is not None:
+            return date_availability
+        
+        # Check if service exists
+        service = Service.objects.get(id=service_id)
+        
+        # Today's slots depend on the current time, so they are always computed live
+        today_key = now.date().strftime('%Y-%m-%d')
+        live_keys = [date_str for date_str in day_keys if date_str == today_key]
+        stored_keys = [date_str for date_str in day_keys if date_str != today_key]
+        slots_by_day = compute_service_slots(service, live_keys, now=now) if live_keys else {}
+        
+        # Later days are served from the materialized free-slot table,
+        # building any day that is missing or was invalidated by a booking
+        if stored_keys:
+            unstored_slots = materialize_free_slots(service, stored_keys)
+            slots_by_day.update(read_free_slots(service, stored_keys))
+            # Days a concurrent change kept from being stored were computed live
+            slots_by_day.update(unstored_slots)
+        
+        # Organize availability by date
+        date_availability = {
+            date_str: _format_slots(slots_by_day[date_str])
+            for date_str in day_keys
+        }
+        
+        cache_entry.set(date_availability, today_key=today_key)
+        
+        return date_availability
 
 class ServiceAvailabilityWithDiscountAPI(APIView):
     permission_classes = [AllowAny]  # Allow anyone to view availability
 
     def get(self, request, service_id):
-        """Get availability for a specific service with discount calculations applied"""
+        """
+        Get availability for a specific service with discount calculations applied.
+        
+        Takes the same `start`, `days` and `stream` query parameters as
+        ServiceAvailabilityAPI.
+        """
         try:
             # Add debug logging
             print(f"DEBUG AVAILABILITY: Calculating availability with discounts for service {service_id}")
             
-            from .models import Service, ProviderAvailability, Appointment, ProximityDiscountConfig, User
-            from django.contrib.gis.db.models.functions import Distance
-            from django.contrib.gis.measure import D
-            
-            # Check if service exists
-            service = Service.objects.get(id=service_id)
-            
-            # Get provider associated with this service
-            provider = service.provider
-            print(f"DEBUG DISCOUNT: Found provider: {provider.business_name}")
-            
-            # Get the provider's discount configuration
-            discount_config = ProximityDiscountConfig.objects.filter(provider=provider).first()
-            
-            # Log the discount configuration
-            if discount_config:
-                print(f"DEBUG DISCOUNT CONFIG: Tiers and distances:")
-                print(f"  - Tier 1: 0-{discount_config.tier1_distance} yards - Discounts: {discount_config.tier1_1appt_discount}%-{discount_config.tier1_5appt_discount}%")
-                print(f"  - Tier 2: {discount_config.tier2_min_distance}-{discount_config.tier2_max_distance} yards - Discounts: {discount_config.tier2_1appt_discount}%-{discount_config.tier2_5appt_discount}%")
-                print(f"  - Tier 3: {discount_config.tier3_min_distance}-{discount_config.tier3_max_distance} yards - Discounts: {discount_config.tier3_1appt_discount}%-{discount_config.tier3_5appt_discount}%")
-                print(f"  - Tier 4: {discount_config.tier4_min_distance}-{discount_config.tier4_max_distance} yards - Discounts: {discount_config.tier4_1appt_discount}%-{discount_config.tier4_5appt_discount}%")
-            
-            # Check if discounts are enabled
-            discounts_enabled = discount_config and discount_config.is_active
-            print(f"DEBUG DISCOUNT: Discounts enabled: {discounts_enabled}")
-            
-            # Get existing appointments for this provider (not just this service)
-            existing_appointments = Appointment.objects.filter(
-                service__provider=provider,  # All provider appointments
-                status__in=['pending', 'confirmed']  # Only active appointments
-            )
-            
-            print(f"DEBUG DISCOUNT: Found {existing_appointments.count()} existing appointments")
-            
-            # Buffer time in minutes to add to both sides of appointments
-            buffer_minutes = BUFFER_MINUTES
-            
-            # Create buffered time blocks for existing appointments
-            blocked_periods = []
-            for appointment in existing_appointments:
-                # Add buffer before and after the appointment
-                buffered_start = appointment.start_time - timezone.timedelta(minutes=buffer_minutes)
-                buffered_end = appointment.end_time + timezone.timedelta(minutes=buffer_minutes)
-                
-                blocked_periods.append({
-                    'start': buffered_start,
-                    'end': buffered_end,
-                    'original_appointment': appointment
-                })
-            
-            # Get provider's availabilities
-            availabilities = ProviderAvailability.objects.filter(provider=provider)
+            now = timezone.now()
+            try:
+                day_keys = _requested_day_keys(request, now)
+            except ValueError as e:
+                return Response({
+                    'error': str(e)
+                }, http_status.HTTP_400_BAD_REQUEST)
             
-            # Get consumer's location from user profile if authenticated
-            consumer_location = None
-            if request.user.is_authenticated:
-                try:
-                    user = User.objects.get(id=request.user.id)
-                    consumer_location = user.location
-                    print(f"DEBUG DISCOUNT: Consumer location found: {consumer_location is not None}")
-                except Exception as e:
-                    print(f"DEBUG DISCOUNT: Error getting consumer location: {str(e)}")
-            
-            # Log a warning if user doesn't have location data
-            if request.user.is_authenticated and not consumer_location:
-                print(f"DEBUG DISCOUNT WARNING: User {request.user.id} is missing location data for discount calculations")
-                print(f"DEBUG USER ADDRESS: Street={request.user.street_address}, City={request.user.city}, State={request.user.state}, Zip={request.user.zip_code}")
+            # Signed-in consumers without a stored location skip the cache
+            # so the live path can try to geocode them
+            stored_location = getattr(request.user, 'location', None)
+            use_cache = not request.user.is_authenticated or stored_location
+            
+            # Service, discount configuration and consumer location, loaded
+            # on the first cache miss and shared by every chunk of days
+            pricing = {}
+            
+            variant = f"discount:{location_bucket(stored_location)}"
+            
+            def cache_entry_for(chunk_keys):
+                return _availability_cache_entry(service_id, chunk_keys, variant=variant, discount=True)
+            
+            # Nothing changed since the client's copy: skip the slot computation.
+            # Uncacheable requests (live geocoding) are not tagged either.
+            full_entry = cache_entry_for(day_keys) if use_cache else None
+            etag = None
+            if full_entry is not None:
+                etag = _availability_etag(request, full_entry, now, service_id, discount=True)
+            not_modified = _not_modified(request, etag)
+            if not_modified is not None:
+                return not_modified
+            
+            def compute_days(chunk_keys, cache_entry=None):
+                if use_cache and cache_entry is None:
+                    cache_entry = cache_entry_for(chunk_keys)
+                if cache_entry is not None:
+                    cached_availability = cache_entry.get()
+                    if cached_availability is not None:
+                        return cached_availability
                 
-                # Try to geocode the address now if fields are available
-                try:
-                    user = User.objects.get(id=request.user.id)
-                    if user.street_address and user.city and user.state:
-                        from .utils.geo_utils import get_location_from_address
-                        
-                        address_components = {
-                            'address_line1': user.street_address,
-                            'city': user.city,
-                            'state': user.state,
-                            'zip_code': user.zip_code,
-                            'country': 'USA'
-                        }
-                        
-                        print(f"DEBUG GEOCODING: Attempting to geocode {address_components}")
-                        
-                        # Get location point from address
-                        location = get_location_from_address(address_components)
-                        
-                        if location:
-                            print(f"DEBUG DISCOUNT: Successfully geocoded user location to {location.y}, {location.x}")
-                            user.location = location
-                            user.latitude = location.y
-                            user.longitude = location.x
-                            user.save()
-                            consumer_location = location
-                            print(f"DEBUG GEOCODING: Updated user record with new location")
-                except Exception as e:
-                    print(f"DEBUG DISCOUNT: Real-time geocoding failed: {str(e)}")
-            
-            # Organize availability by date
-            date_availability = {}
-            
-            # Show 14 days of availability starting from today
-            for i in range(14):
-                curr_date = timezone.now().date() + timezone.timedelta(days=i)
-                date_str = curr_date.strftime('%Y-%m-%d')
-                date_availability[date_str] = []
+                if not pricing:
+                    pricing.update(self._load_pricing(request, service_id))
                 
-                # Get availability records that match this specific date
-                matching_avail = [avail for avail in availabilities if avail.day_of_week == date_str]
+                date_availability = self._compute_days(chunk_keys, now, **pricing)
                 
-                if not matching_avail:
-                    # If no explicit date match, continue to next date
-                    continue
+                if cache_entry is not None:
+                    cache_entry.set(date_availability, today_key=now.date().strftime('%Y-%m-%d'))
                 
-                for avail in matching_avail:
-                    # Create available time blocks
-                    start_time = avail.start_time
-                    end_time = avail.end_time
-                    
-                    # For current day, adjust start_time if it's in the past or within the buffer period
-                    if i == 0:  # Today
-                        # Calculate minimum start time (now + 1 hour)
-                        now_plus_hour = timezone.now() + timezone.timedelta(hours=1)
-                        min_time = now_plus_hour.time()
-                        
-                        # Make sure we're comparing time objects to time objects
-                        start_time_value = start_time
-                        if isinstance(start_time, datetime.datetime):
-                            start_time_value = start_time.time()
-                        
-                        # If availability starts before the minimum time, adjust it
-                        if start_time_value < min_time:
-                            print(f"DEBUG AVAILABILITY: Adjusting today's availability from {start_time} to {min_time}")
-                            # Convert min_time (a time object) to a datetime object with the same date as end_time
-                            if isinstance(start_time, datetime.datetime) and isinstance(min_time, datetime.time):
-                                min_datetime = datetime.datetime.combine(
-                                    start_time.date(),
-                                    min_time,
-                                    tzinfo=timezone.get_current_timezone()
-                                )
-                                start_time = min_datetime
-                            else:
-                                start_time = min_time
-                        
-                        # If the entire availability block is now invalid, skip it
-                        # Ensure both are the same type before comparison
-                        if isinstance(start_time, datetime.time) and isinstance(end_time, datetime.datetime):
-                            # Convert start_time to datetime for comparison
-                            start_datetime = datetime.datetime.combine(
-                                end_time.date(),
-                                start_time,
-                                tzinfo=timezone.get_current_timezone()
-                            )
-                            if start_datetime >= end_time:
-                                print(f"DEBUG AVAILABILITY: Skipping availability block - no valid time left today")
-                                continue
-                        elif isinstance(start_time, datetime.datetime) and isinstance(end_time, datetime.time):
-                            # Convert end_time to datetime for comparison
-                            end_datetime = datetime.datetime.combine(
-                                start_time.date(),
-                                end_time,
-                                tzinfo=timezone.get_current_timezone()
-                            )
-                            if start_time >= end_datetime:
-                                print(f"DEBUG AVAILABILITY: Skipping availability block - no valid time left today")
-                                continue
-                        else:
-                            # Both are the same type, can compare directly
-                            if start_time >= end_time:
-                                print(f"DEBUG AVAILABILITY: Skipping availability block - no valid time left today")
-                                continue
-                    
-                    # Calculate how many service slots fit in this availability block
-                    duration_minutes = service.duration
-                    
-                    # Calculate total block minutes available
-                    block_minutes = (end_time - start_time).total_seconds() / 60
-                    
-                    # Calculate slots using service duration
-                    available_slots = []
-                    current_start = start_time
-                    slot_index = 0
-                    
-                    # Loop until we can't fit another appointment
-                    while True:
-                        # Calculate end time for this slot
-                        current_end = current_start + timezone.timedelta(minutes=duration_minutes)
-                        
-                        # If this slot would exceed the availability block, break
-                        if current_end > end_time:
-                            break
-                        
-                        # Create a slot
-                        slot = {
-                            'id': f"slot-{date_str}-{slot_index}",
-                            'start': current_start,
-                            'end': current_end,
-                            'duration': duration_minutes,
-                            'original_price': float(service.price),
-                            'discount_percentage': 0,
-                            # Include buffer information so the frontend knows about buffer zones
-                            'buffer_info': {
-                                'buffer_minutes': buffer_minutes,
-                                'buffered_start': (current_start - timezone.timedelta(minutes=buffer_minutes)).isoformat(),
-                                'buffered_end': (current_end + timezone.timedelta(minutes=buffer_minutes)).isoformat(),
-                                'has_buffer': True
-                            },
-                            'discounted_price': float(service.price)
-                        }
-                        
-                        # Check if slot overlaps with ANY buffered appointment block
-                        is_available = True
-                        for blocked in blocked_periods:
-                            # Only check same day blocked periods
-                            block_date = blocked['start'].strftime('%Y-%m-%d')
-                            slot_date = current_start.strftime('%Y-%m-%d')
-                            if block_date != slot_date:
-                                continue
-                                
-                            # Check if this slot overlaps with the blocked period
-                            # (slot starts before blocked period ends AND slot ends after blocked period starts)
-                            if slot['start'] < blocked['end'] and slot['end'] > blocked['start']:
-                                is_available = False
-                                break
-                        
-                        # If the slot is available and discounts are enabled, calculate any applicable discount
-                        if is_available and discounts_enabled and consumer_location:
-                            # First filter for time-adjacent appointments (immediately before or after this slot)
-                            # Define what "adjacent" means in minutes
-                            time_adjacency_threshold_minutes = 60  # Consider appointments within 1 hour to be adjacent
-                            
-                            # Convert time adjacency to timedelta
-                            time_adjacency_threshold = timezone.timedelta(minutes=time_adjacency_threshold_minutes)
-                            
-                            # Filter for appointments that are close in time to this slot
-                            time_adjacent_appointments = []
-                            for appt in existing_appointments:
-                                # Check if appointment ends shortly before this slot begins
-                                if slot['start'] - time_adjacency_threshold <= appt.end_time <= slot['start']:
-                                    time_adjacent_appointments.append(appt)
-                                
-                                # Check if appointment begins shortly after this slot ends
-                                elif slot['end'] <= appt.start_time <= slot['end'] + time_adjacency_threshold:
-                                    time_adjacent_appointments.append(appt)
-                            
-                            # Only proceed if we have time-adjacent appointments
-                            if time_adjacent_appointments:
-                                # Now filter for appointments that are also geographically close
-                                nearby_appointments = []
-                                
-                                # Find nearby appointments within maximum tier distance
-                                max_distance = discount_config.tier4_max_distance  # Use the largest tier distance
-                                
-                                for appt in time_adjacent_appointments:
-                                    # Skip if appointment has no location
-                                    if not appt.location or not consumer_location:
-                                        continue
-                                        
-                                    # Calculate distance between consumer and appointment location in yards
-                                    # PostGIS uses meters for geography calculations
-                                    try:
-                                        distance_m = consumer_location.distance(appt.location) * 100000  # Convert to meters
-                                        distance_yards = distance_m * 1.09361  # Convert meters to yards
-                                        
-                                        if distance_yards <= max_distance:
-                                            nearby_appointments.append({
-                                                'appointment': appt,
-                                                'distance_yards': distance_yards
-                                            })
-                                    except Exception as e:
-                                        continue
-                                
-                                # Sort by distance (closest first)
-                                nearby_appointments.sort(key=lambda x: x['distance_yards'])
-                                
-                                # If we have nearby and time-adjacent appointments, calculate a discount
-                                if nearby_appointments:
-                                    # Get the closest appointment's distance
-                                    closest_distance = nearby_appointments[0]['distance_yards']
-                                    appt_count = min(len(nearby_appointments), 5)  # Cap at 5 for discount tiers
-                                    
-                                    # Calculate discount based on distance and appointment count
-                                    discount_percentage = discount_config.get_discount_for_distance_and_count(
-                                        closest_distance, appt_count
-                                    )
-                                    
-                                    if discount_percentage > 0:
-                                        slot['discount_percentage'] = discount_percentage
-                                        slot['discounted_price'] = round(slot['original_price'] * (1 - discount_percentage / 100), 2)
-                        
-                        if is_available:
-                            available_slots.append(slot)
-                        
-                        # Move to the next potential slot - add duration PLUS buffer time for spacing between slots
-                        # This ensures each appointment has buffer time on both sides
-                        slot_index += 1
-                        current_start = current_start + timezone.timedelta(minutes=duration_minutes + BUFFER_MINUTES)
-                    
-                    # Add available slots to the time block for this date
-                    for slot in available_slots:
-                        # Create new slot for the API response
-                        new_slot = {
-                            'id': slot['id'],
-                            'start': slot['start'].isoformat(),
-                            'end': slot['end'].isoformat(),
-                            'duration': slot['duration'],
-                            'original_price': slot['original_price'],
-                            'discount_percentage': slot['discount_percentage'],
-                            'discounted_price': slot['discounted_price'],
-                            'buffer_info': slot['buffer_info']
-                        }
-                        date_availability[date_str].append(new_slot)
-            
-            return Response(date_availability)
+                return date_availability
+            
+            if _wants_stream(request):
+                response = _stream_availability(day_keys, compute_days)
+            else:
+                response = Response(compute_days(day_keys, cache_entry=full_entry))
+            
+            return _with_etag(response, etag)
         
         except Exception as e:
             print(f"ERROR in ServiceAvailabilityWithDiscountAPI: {str(e)}")
@@ -1593,58 +1557,903 @@ class ServiceAvailabilityWithDiscountAPI(APIView):
                 {'error': str(e)},
                 status=http_status.HTTP_500_INTERNAL_SERVER_ERROR
             )
-
-class AppointmentListAPI(APIView):
-    permission_classes = [IsAuthenticated]
     
-    def get(self, request):
-        """Get all appointments for the authenticated user or provider"""
-        try:
-            # Get appointments based on user type
-            if request.user.user_type == 'provider':
-                # Providers see appointments for their services
-                appointments = Appointment.objects.filter(
-                    service__provider__user=request.user
-                ).order_by('start_time')
-            else:
-                # Consumers see their own appointments
-                appointments = Appointment.objects.filter(
-                    consumer=request.user
-                ).order_by('start_time')
-            
-            # Serialize appointments
-            appointment_list = []
-            for appointment in appointments:
-                appointment_list.append({
-                    'id': str(appointment.id),  # Ensure UUID is converted to string
-                    'service': {
-                        'id': appointment.service.id,
-                        'name': appointment.service.name,
-                        'duration': appointment.service.duration,
-                        'price': float(appointment.service.price),
-                        'provider': {
-                            'id': appointment.service.provider.id,
-                            'business_name': appointment.service.provider.business_name
-                        }
-                    },
-                    'consumer': {
-                        'id': appointment.consumer.id,
-                        'username': appointment.consumer.username,
-                        'email': appointment.consumer.email
-                    },
-                    'start_time': appointment.start_time.isoformat(),
-                    'end_time': appointment.end_time.isoformat(),
-                    'status': appointment.status,
-                    'notes': appointment.notes,
-                    'created_at': appointment.created_at.isoformat(),
-                    'updated_at': appointment.updated_at.isoformat()
-                })
+    def _load_pricing(self, request, service_id):
+        """Load the service, its provider's discount configuration and the consumer's location"""
+        from .models import User
+        
+        # Check if service exists
+        service = Service.objects.get(id=service_id)
+        
+        # Get provider associated with this service
+        provider = service.provider
+        print(f"DEBUG DISCOUNT: Found provider: {provider.business_name}")
+        
+        # Get the provider's compiled discount configuration; the config row
+        # is only read again after it changes
+        discount_table = provider_discount_table(provider.id)
+        
+        # Log the discount configuration
+        if discount_table:
+            print(f"DEBUG DISCOUNT CONFIG: Tiers and distances:")
+            for tier, ((low, high), discounts) in enumerate(zip(discount_table.tier_bounds, discount_table.matrix), start=1):
+                print(f"  - Tier {tier}: {max(low, 0)}-{high} yards - Discounts: {discounts[0]}%-{discounts[-1]}%")
+        
+        # Get consumer's location from user profile if authenticated
+        consumer_location = None
+        if request.user.is_authenticated:
+            try:
+                user = User.objects.get(id=request.user.id)
+                consumer_location = user.location
+                print(f"DEBUG DISCOUNT: Consumer location found: {consumer_location is not None}")
+            except Exception as e:
+                print(f"DEBUG DISCOUNT: Error getting consumer location: {str(e)}")
+        
+        # Log a warning if user doesn't have location data
+        if request.user.is_authenticated and not consumer_location:
+            print(f"DEBUG DISCOUNT WARNING: User {request.user.id} is missing location data for discount calculations")
+            print(f"DEBUG USER ADDRESS: Street={request.user.street_address}, City={request.user.city}, State={request.user.state}, Zip={request.user.zip_code}")
+            
+            # Try to geocode the address now if fields are available
+            try:
+                user = User.objects.get(id=request.user.id)
+                if user.street_address and user.city and user.state:
+                    from .utils.geo_utils import get_location_from_address
+                    
+                    address_components = {
+                        'address_line1': user.street_address,
+                        'city': user.city,
+                        'state': user.state,
+                        'zip_code': user.zip_code,
+                        'country': 'USA'
+                    }
+                    
+                    print(f"DEBUG GEOCODING: Attempting to geocode {address_components}")
+                    
+                    # Get location point from address
+                    location = get_location_from_address(address_components)
+                    
+                    if location:
+                        print(f"DEBUG DISCOUNT: Successfully geocoded user location to {location.y}, {location.x}")
+                        user.location = location
+                        user.latitude = location.y
+                        user.longitude = location.x
+                        user.save()
+                        consumer_location = location
+                        print(f"DEBUG GEOCODING: Updated user record with new location")
+            except Exception as e:
+                print(f"DEBUG DISCOUNT: Real-time geocoding failed: {str(e)}")
+        
+        return {
+            'service': service,
+            'discount_table': discount_table,
+            'consumer_location': consumer_location
+        }
+    
+    def _compute_days(self, day_keys, now, service, discount_table, consumer_location):
+        """Priced slots for the given days, keyed by "YYYY-MM-DD" """
+        provider = service.provider
+        
+        # Check if discounts are enabled
+        discounts_enabled = discount_table and discount_table.is_active
+        print(f"DEBUG DISCOUNT: Discounts enabled: {discounts_enabled}")
+        
+        # Buffer time in minutes to add to both sides of appointments
+        buffer_minutes = BUFFER_MINUTES
+        
+        # Get provider's availabilities for the requested days only, and the
+        # active appointments (of any of its services) that can block or sit
+        # next to a slot in those days
+        calendar = load_discount_calendar(provider, day_keys)
+        window_appointments = calendar.appointment_query
+        existing_appointments = calendar.appointments
+        
+        print(f"DEBUG DISCOUNT: Found {len(existing_appointments)} existing appointments")
+        
+        # When every day has prebuilt discount zones, one point-in-polygon query
+        # finds the appointments near the consumer together with their tier
+        use_zones = bool(
+            discounts_enabled and consumer_location and PROXIMITY_DISCOUNT_ZONES
+            and discount_zones_ready(provider.id, day_keys)
+        )
+        
+        # Otherwise, distances (in yards) from the consumer to the appointments within
+        # the largest discount tier, from one spatial query for the whole request
+        nearby_distances = {}
+        if use_zones:
+            nearby_appointments_by_zone = consumer_zone_appointments(provider.id, day_keys, consumer_location)
+            print(f"DEBUG DISCOUNT: {len(nearby_appointments_by_zone)} appointments with a discount zone around the consumer")
+        elif discounts_enabled and consumer_location:
+            nearby_distances = nearby_appointment_distances(
+                window_appointments,
+                consumer_location,
+                discount_table.max_distance  # Use the largest tier distance
+            )
+            print(f"DEBUG DISCOUNT: {len(nearby_distances)} appointments within {discount_table.max_distance} yards")
+        
+        # Index the nearby appointments by start and end time once. Only these
+        # can earn a discount, so the others are left out of the index entirely.
+        adjacent_appointments = AdjacentAppointments(
+            nearby_appointments_by_zone if use_zones else
+            (appointment for appointment in existing_appointments if appointment.id in nearby_distances),
+            DISCOUNT_ADJACENCY_MINUTES
+        )
+        
+        # Buffered appointment blocks, sorted and merged once for conflict checks
+        blocked = calendar.blocked
+        
+        # Organize availability by date
+        date_availability = {}
+        availability_by_day = calendar.availability_by_day
+        duration_minutes = service.duration
+        today_key = now.date().strftime('%Y-%m-%d')
+        iter_day_slots = free_slot_iterator()
+        
+        # Slots that qualify for a discount, with the closest nearby distance
+        # (or tier, with zones) and appointment count, priced together once
+        # every day is built
+        discounted_slots = []
+        discount_closest = []
+        discount_counts = []
+        
+        for date_str in day_keys:
+            date_availability[date_str] = []
+            
+            # Today's blocks are trimmed so slots start at least an hour from now
+            free_slots = iter_day_slots(
+                date_str,
+                availability_by_day.get(date_str, []),
+                duration_minutes,
+                blocked,
+                buffer_minutes,
+                now=now if date_str == today_key else None
+            )
+            
+            for slot_id, slot_start, slot_end in free_slots:
+                # Create a slot
+                slot = {
+                    'id': slot_id,
+                    'start': slot_start,
+                    'end': slot_end,
+                    'duration': duration_minutes,
+                    'original_price': float(service.price),
+                    'discount_percentage': 0,
+                    # Include buffer information so the frontend knows about buffer zones
+                    'buffer_info': {
+                        'buffer_minutes': buffer_minutes,
+                        'buffered_start': (slot_start - timezone.timedelta(minutes=buffer_minutes)).isoformat(),
+                        'buffered_end': (slot_end + timezone.timedelta(minutes=buffer_minutes)).isoformat(),
+                        'has_buffer': True
+                    },
+                    'discounted_price': float(service.price)
+                }
+                
+                # Create new slot for the API response
+                new_slot = {
+                    'id': slot['id'],
+                    'start': slot['start'].isoformat(),
+                    'end': slot['end'].isoformat(),
+                    'duration': slot['duration'],
+                    'original_price': slot['original_price'],
+                    'discount_percentage': slot['discount_percentage'],
+                    'discounted_price': slot['discounted_price'],
+                    'buffer_info': slot['buffer_info']
+                }
+                date_availability[date_str].append(new_slot)
+                
+                # If discounts are enabled, find what any discount depends on
+                if discounts_enabled and consumer_location:
+                    # First find time-adjacent appointments: those ending within
+                    # DISCOUNT_ADJACENCY_MINUTES before this slot begins or starting
+                    # within it after this slot ends (binary searches, no scan)
+                    time_adjacent_appointments = adjacent_appointments.around(slot['start'], slot['end'])
+                    
+                    # With zones, the closest tier among adjacent appointments picks the row
+                    if use_zones and time_adjacent_appointments:
+                        discounted_slots.append(new_slot)
+                        discount_closest.append(min(appt.tier for appt in time_adjacent_appointments))
+                        discount_counts.append(min(len(time_adjacent_appointments), 5))  # Cap at 5 for discount tiers
+                    
+                    # Only proceed if we have time-adjacent appointments
+                    elif time_adjacent_appointments:
+                        # Now filter for appointments that are also geographically close.
+                        # Appointments without a location or beyond the largest tier
+                        # are not in nearby_distances.
+                        nearby_appointments = []
+                        
+                        for appt in time_adjacent_appointments:
+                            distance_yards = nearby_distances.get(appt.id)
+                            if distance_yards is not None:
+                                nearby_appointments.append({
+                                    'appointment': appt,
+                                    'distance_yards': distance_yards
+                                })
+                        
+                        # Sort by distance (closest first)
+                        nearby_appointments.sort(key=lambda x: x['distance_yards'])
+                        
+                        # If we have nearby and time-adjacent appointments, calculate a discount
+                        if nearby_appointments:
+                            # Get the closest appointment's distance
+                            closest_distance = nearby_appointments[0]['distance_yards']
+                            appt_count = min(len(nearby_appointments), 5)  # Cap at 5 for discount tiers
+                            
+                            # The discount depends on distance and appointment count
+                            discounted_slots.append(new_slot)
+                            discount_closest.append(closest_distance)
+                            discount_counts.append(appt_count)
+        
+        # Price every qualifying slot in one pass over the compiled discount table
+        if discounted_slots:
+            if use_zones:
+                discount_percentages = discount_table.tier_discounts(discount_closest, discount_counts)
+            else:
+                discount_percentages = discount_table.discounts(discount_closest, discount_counts)
+            for new_slot, discount_percentage in zip(discounted_slots, discount_percentages):
+                if discount_percentage > 0:
+                    new_slot['discount_percentage'] = discount_percentage
+                    new_slot['discounted_price'] = round(new_slot['original_price'] * (1 - discount_percentage / 100), 2)
+        
+        return date_availability
+
+class AvailabilityBatchAPI(APIView):
+    permission_classes = [AllowAny]  # Allow anyone to view availability
+    
+    # Upper bound on services per request
+    MAX_SERVICES = 100
+    
+    def post(self, request):
+        """
+        Get availability for many services in one request.
+        
+        Expects {"service_ids": [...], "start": "YYYY-MM-DD", "end": "YYYY-MM-DD"}.
+        Dates are optional and default to the usual 14 days from today.
+        Each provider's availability and appointments are loaded once and
+        shared by all of its requested services.
+        """
+        try:
+            service_ids = request.data.get('service_ids')
+            if not isinstance(service_ids, list) or not service_ids:
+                return Response({
+                    'error': 'service_ids must be a non-empty list'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                service_ids = list(dict.fromkeys(int(service_id) for service_id in service_ids))
+            except (TypeError, ValueError):
+                return Response({
+                    'error': 'service_ids must contain integer ids'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            if len(service_ids) > self.MAX_SERVICES:
+                return Response({
+                    'error': f'At most {self.MAX_SERVICES} services can be requested at once'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            # Resolve the date range
+            now = timezone.now()
+            try:
+                start_date = datetime.date.fromisoformat(request.data['start']) if request.data.get('start') else now.date()
+                end_date = (
+                    datetime.date.fromisoformat(request.data['end']) if request.data.get('end')
+                    else start_date + timezone.timedelta(days=DEFAULT_AVAILABILITY_DAYS - 1)
+                )
+            except (TypeError, ValueError):
+                return Response({
+                    'error': 'start and end must be dates in YYYY-MM-DD format'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            days = (end_date - start_date).days + 1
+            if days < 1 or days > AVAILABILITY_MAX_DAYS:
+                return Response({
+                    'error': f'The date range must cover between 1 and {AVAILABILITY_MAX_DAYS} days'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            day_keys = availability_day_keys(start_date, days)
+            
+            # Group the requested services by provider so each provider is loaded once
+            services = Service.objects.filter(id__in=service_ids).select_related('provider')
+            services_by_provider = {}
+            for service in services:
+                services_by_provider.setdefault(service.provider_id, []).append(service)
+            
+            results = {}
+            for provider_services in services_by_provider.values():
+                provider = provider_services[0].provider
+                slots_by_service = compute_provider_slots(provider, provider_services, day_keys, now=now)
+                
+                for service in provider_services:
+                    results[str(service.id)] = {
+                        day_key: _format_slots(slots)
+                        for day_key, slots in slots_by_service[service.id].items()
+                    }
+            
+            print(f"DEBUG AVAILABILITY BATCH: {len(results)} services across {len(services_by_provider)} providers, {days} days from {day_keys[0]}")
             
-            return Response(appointment_list)
-        except Exception as e:
-            import traceback
-            print(f"Error in AppointmentListAPI: {str(e)}")
-            traceback.print_exc()
+            return Response({
+                'services': results,
+                'not_found': [service_id for service_id in service_ids if str(service_id) not in results]
+            })
+        except Exception as e:
+            import traceback
+            print(f"ERROR in AvailabilityBatchAPI: {str(e)}")
+            traceback.print_exc()
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class ProviderAvailabilitySlotsAPI(APIView):
+    permission_classes = [AllowAny]  # Allow anyone to view availability
+    
+    # Upper bound on distinct durations per request
+    MAX_DURATIONS = 20
+    
+    def get(self, request, provider_id):
+        """
+        Get slots for every active service of a provider from one computation.
+        
+        The provider's free intervals are computed once and every duration is
+        derived from them, so the cost grows with the free intervals rather
+        than with services x appointments.
+        
+        Optional query parameters: `durations` (comma-separated minutes,
+        default the durations of the provider's active services), plus the
+        usual `start` and `days`.
+        """
+        try:
+            now = timezone.now()
+            try:
+                day_keys = _requested_day_keys(request, now)
+            except ValueError as e:
+                return Response({
+                    'error': str(e)
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                provider = ServiceProvider.objects.get(id=provider_id)
+            except ServiceProvider.DoesNotExist:
+                return Response({
+                    'error': 'Provider not found'
+                }, http_status.HTTP_404_NOT_FOUND)
+            
+            services = list(Service.objects.filter(provider=provider, is_active=True).values_list('id', 'duration'))
+            
+            durations_param = request.query_params.get('durations')
+            if durations_param:
+                try:
+                    durations = sorted({int(duration) for duration in durations_param.split(',') if duration.strip()})
+                except ValueError:
+                    return Response({
+                        'error': 'durations must be a comma-separated list of minutes'
+                    }, http_status.HTTP_400_BAD_REQUEST)
+                if not durations or durations[0] <= 0:
+                    return Response({
+                        'error': 'durations must be positive numbers of minutes'
+                    }, http_status.HTTP_400_BAD_REQUEST)
+            else:
+                durations = sorted({duration for _, duration in services})
+            
+            if len(durations) > self.MAX_DURATIONS:
+                return Response({
+                    'error': f'At most {self.MAX_DURATIONS} durations can be requested at once'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            # Conflicts are provider-wide, so the free intervals are shared by every duration
+            free_intervals = compute_provider_free_intervals(provider, day_keys, now=now)
+            
+            slots_by_duration = {
+                str(duration): {
+                    day_key: _format_slots(iter_interval_slots(day_key, day_intervals, duration, BUFFER_MINUTES))
+                    for day_key, day_intervals in free_intervals.items()
+                }
+                for duration in durations
+            }
+            
+            print(f"DEBUG PROVIDER SLOTS: provider {provider_id}, {len(durations)} durations, {len(day_keys)} days from {day_keys[0]}")
+            
+            return Response({
+                'provider_id': provider.id,
+                'free_intervals': {
+                    day_key: [
+                        {'start': gap_start.isoformat(), 'end': gap_end.isoformat()}
+                        for _, gaps in day_intervals
+                        for gap_start, gap_end in gaps
+                    ]
+                    for day_key, day_intervals in free_intervals.items()
+                },
+                'slots': slots_by_duration,
+                # Services point at their duration's entry in `slots`
+                'services': {
+                    str(service_id): str(duration)
+                    for service_id, duration in services
+                    if str(duration) in slots_by_duration
+                }
+            })
+        except Exception as e:
+            import traceback
+            print(f"ERROR in ProviderAvailabilitySlotsAPI: {str(e)}")
+            traceback.print_exc()
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class DiscountQuoteAPI(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    # Upper bound on consumer locations per request
+    MAX_POINTS = 10000
+    
+    # Upper bound on points x slots when the full price matrix is asked for
+    MAX_MATRIX_CELLS = 500000
+    
+    def post(self, request):
+        """
+        Quote proximity-discounted prices of a service for many consumer locations.
+        
+        Expects {"service_id": 1, "points": [{"lat": 40.7, "lng": -74.0}, ...],
+        "start": "YYYY-MM-DD", "end": "YYYY-MM-DD", "matrix": false}. Dates are
+        optional and default to the usual 14 days from today. Only staff and
+        the service's own provider may ask.
+        
+        Each point gets its best slot and price. With "matrix": true it also
+        gets the discount and price of every slot, which grows with points x
+        slots and is capped at MAX_MATRIX_CELLS.
+        
+        Free slots and their time-adjacent appointments are worked out once,
+        then every point is priced from one vectorized distance matrix.
+        """
+        try:
+            if np is None:
+                return Response({
+                    'error': 'Discount quotes require numpy to be installed'
+                }, http_status.HTTP_501_NOT_IMPLEMENTED)
+            
+            try:
+                service = Service.objects.select_related('provider').get(id=request.data.get('service_id'))
+            except (Service.DoesNotExist, TypeError, ValueError):
+                return Response({
+                    'error': 'Service not found'
+                }, http_status.HTTP_404_NOT_FOUND)
+            
+            if not request.user.is_staff and service.provider.user_id != request.user.id:
+                return Response({
+                    'error': 'Only staff and the service\'s provider can request discount quotes'
+                }, http_status.HTTP_403_FORBIDDEN)
+            
+            points = request.data.get('points')
+            if not isinstance(points, list) or not points:
+                return Response({
+                    'error': 'points must be a non-empty list'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            if len(points) > self.MAX_POINTS:
+                return Response({
+                    'error': f'At most {self.MAX_POINTS} points can be quoted at once'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            try:
+                point_lats = np.array([float(point['lat']) for point in points])
+                point_lngs = np.array([float(point['lng']) for point in points])
+            except (KeyError, TypeError, ValueError):
+                return Response({
+                    'error': 'Each point must have numeric lat and lng'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            if (
+                (~np.isfinite(point_lats) | ~np.isfinite(point_lngs)).any()
+                or (np.abs(point_lats) > 90).any() or (np.abs(point_lngs) > 180).any()
+            ):
+                return Response({
+                    'error': 'Point coordinates are out of range'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            # Resolve the date range
+            now = timezone.now()
+            try:
+                start_date = datetime.date.fromisoformat(request.data['start']) if request.data.get('start') else now.date()
+                end_date = (
+                    datetime.date.fromisoformat(request.data['end']) if request.data.get('end')
+                    else start_date + timezone.timedelta(days=DEFAULT_AVAILABILITY_DAYS - 1)
+                )
+            except (TypeError, ValueError):
+                return Response({
+                    'error': 'start and end must be dates in YYYY-MM-DD format'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            days = (end_date - start_date).days + 1
+            if days < 1 or days > AVAILABILITY_MAX_DAYS:
+                return Response({
+                    'error': f'The date range must cover between 1 and {AVAILABILITY_MAX_DAYS} days'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            include_matrix = request.data.get('matrix') in (True, 'true', '1', 1)
+            
+            day_keys = availability_day_keys(start_date, days)
+            provider = service.provider
+            
+            # Same inputs as ServiceAvailabilityWithDiscountAPI
+            calendar = load_discount_calendar(provider, day_keys)
+            
+            # Only appointments with a location can make a slot discountable
+            located_appointments = [appointment for appointment in calendar.appointments if appointment.location]
+            columns = {appointment.id: column for column, appointment in enumerate(located_appointments)}
+            adjacent_appointments = AdjacentAppointments(located_appointments, DISCOUNT_ADJACENCY_MINUTES)
+            
+            # Free slots and their time-adjacent appointments, independent of the points
+            today_key = now.date().strftime('%Y-%m-%d')
+            iter_day_slots = free_slot_iterator()
+            slots = []
+            slot_adjacency = []
+            for date_str in day_keys:
+                for slot_id, slot_start, slot_end in iter_day_slots(
+                    date_str,
+                    calendar.availability_by_day.get(date_str, []),
+                    service.duration,
+                    calendar.blocked,
+                    BUFFER_MINUTES,
+                    now=now if date_str == today_key else None
+                ):
+                    slots.append({'id': slot_id, 'start': slot_start.isoformat(), 'end': slot_end.isoformat()})
+                    slot_adjacency.append(tuple(sorted(
+                        columns[appointment.id] for appointment in adjacent_appointments.around(slot_start, slot_end)
+                    )))
+            
+            if include_matrix and len(points) * len(slots) > self.MAX_MATRIX_CELLS:
+                return Response({
+                    'error': f'The full matrix is limited to {self.MAX_MATRIX_CELLS} points x slots; '
+                             'ask for fewer points or days, or leave matrix off'
+                }, http_status.HTTP_400_BAD_REQUEST)
+            
+            # One distance matrix for every point against every located appointment
+            discount_table = provider_discount_table(provider.id)
+            if discount_table is not None and located_appointments and slots:
+                distances = haversine_yards(
+                    point_lats,
+                    point_lngs,
+                    [appointment.location.y for appointment in located_appointments],
+                    [appointment.location.x for appointment in located_appointments]
+                )
+                discounts = quote_slot_discounts(discount_table, distances, slot_adjacency)
+            else:
+                discounts = np.zeros((len(points), len(slots)), dtype=np.int64)
+            
+            # Price each distinct discount once, rounded like the availability view
+            original_price = float(service.price)
+            
+            def price_of(discount_array):
+                distinct_discounts, discount_positions = np.unique(discount_array, return_inverse=True)
+                distinct_prices = np.array([
+                    round(original_price * (1 - int(discount) / 100), 2) if discount > 0 else original_price
+                    for discount in distinct_discounts
+                ])
+                return distinct_prices[discount_positions].reshape(discount_array.shape)
+            
+            # Best slot per point: the first slot with the largest discount
+            best_slots = discounts.argmax(axis=1) if len(slots) else None
+            best_prices = price_of(discounts[np.arange(len(points)), best_slots]) if len(slots) else None
+            prices = price_of(discounts) if include_matrix else None
+            
+            quotes = []
+            for index in range(len(points)):
+                quote = {
+                    'lat': float(point_lats[index]),
+                    'lng': float(point_lngs[index]),
+                    'best_slot_id': slots[int(best_slots[index])]['id'] if best_slots is not None else None,
+                    'best_price': float(best_prices[index]) if best_prices is not None else None
+                }
+                if include_matrix:
+                    quote['discount_percentages'] = discounts[index].tolist()
+                    quote['discounted_prices'] = prices[index].tolist()
+                quotes.append(quote)
+            
+            print(f"DEBUG DISCOUNT QUOTE: service {service.id}, {len(points)} points, {len(slots)} slots, {len(located_appointments)} located appointments")
+            
+            return Response({
+                'service_id': service.id,
+                'original_price': original_price,
+                'slots': slots,
+                'quotes': quotes
+            })
+        except Exception as e:
+            import traceback
+            print(f"ERROR in DiscountQuoteAPI: {str(e)}")
+            traceback.print_exc()
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class GeocoderStatsAPI(APIView):
+    """Geocoder call, cache and throttle counters of the process serving the request (staff only)"""
+    permission_classes = [IsAdminUser]
+    
+    def get(self, request):
+        return Response(geocoder_stats.snapshot())
+
+class SyncAPI(APIView):
+    """
+    Delta sync of the signed-in user's appointments (as consumer and as
+    provider) and of a provider's availability blocks.
+    
+    Query parameters:
+        updated_since: the sync_token of the previous sync; without it, or
+                       when it is older than the tombstone retention, every
+                       row is returned and the response has "full": true
+        provider_id: whose availability to sync (default: the user's own
+                     provider profile, if any)
+    
+    Otherwise only rows changed since the token are returned, with the ids
+    of deleted rows, so polling without changes costs an empty response.
+    Rows may be repeated across syncs and should be applied as upserts.
+    """
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        # Taken before reading, so changes made during this sync are picked up by the next one
+        sync_time = timezone.now()
+        
+        try:
+            since = None
+            if request.query_params.get('updated_since'):
+                since = _parse_list_datetime(request.query_params['updated_since'], 'updated_since')
+            provider_id = request.query_params.get('provider_id')
+            if provider_id is not None and not provider_id.isdigit():
+                raise ValueError('provider_id must be an integer')
+        except ValueError as e:
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            import traceback
+            print(f"Error in SyncAPI: {str(e)}")
+            traceback.print_exc()
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        try:
+            full = since is None or since < sync_horizon()
+            if provider_id is None:
+                provider_id = ServiceProvider.objects.filter(user=request.user).values_list('id', flat=True).first()
+            
+            appointments = Appointment.objects.filter(Q(consumer=request.user) | Q(provider__user=request.user))
+            availabilities = ProviderAvailability.objects.filter(provider_id=provider_id)
+            deleted = {'appointment': [], 'availability': []}
+            if not full:
+                # Rows committed a little after they were stamped still show up
+                changed_after = since - datetime.timedelta(seconds=SYNC_OVERLAP_SECONDS)
+                appointments = appointments.filter(updated_at__gte=changed_after)
+                availabilities = availabilities.filter(updated_at__gte=changed_after)
+                
+                tombstones = SyncTombstone.objects.filter(
+                    Q(object_type='appointment') & (Q(consumer=request.user) | Q(provider__user=request.user))
+                    | Q(object_type='availability', provider_id=provider_id),
+                    deleted_at__gte=changed_after
+                ).values_list('object_type', 'object_id')
+                for object_type, object_id in tombstones:
+                    deleted[object_type].append(object_id)
+            
+            if provider_id is None:
+                availabilities = availabilities.none()
+            
+            return Response({
+                'sync_token': sync_time.strftime('%Y-%m-%dT%H:%M:%S.%fZ'),
+                'full': full,
+                'appointments': {
+                    'updated': _serialize_appointment_list(appointments.order_by('start_time', 'id')),
+                    'deleted': deleted['appointment']
+                },
+                'availability': {
+                    'provider_id': provider_id and int(provider_id),
+                    'updated': [{
+                        'id': str(block['id']),
+                        'day': block['day_of_week'],
+                        'start': block['start_time'].isoformat(),
+                        'end': block['end_time'].isoformat()
+                    } for block in availabilities.order_by('start_time').values('id', 'day_of_week', 'start_time', 'end_time')],
+                    'deleted': deleted['availability']
+                }
+            })
+        except Exception as e:
+            import traceback
+            print(f"Error in SyncAPI: {str(e)}")
+            traceback.print_exc()
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+# Default and largest page sizes of the appointment lists
+APPOINTMENT_PAGE_SIZE = getattr(settings, 'APPOINTMENT_PAGE_SIZE', 100)
+APPOINTMENT_MAX_PAGE_SIZE = getattr(settings, 'APPOINTMENT_MAX_PAGE_SIZE', 500)
+
+
+# Every column the appointment lists return, fetched with the service,
+# provider and consumer in a single joined query
+APPOINTMENT_LIST_COLUMNS = (
+    'id', 'start_time', 'end_time', 'status', 'notes', 'created_at', 'updated_at',
+    'service_id', 'service__name', 'service__duration', 'service__price',
+    'service__provider_id', 'service__provider__business_name',
+    'consumer_id', 'consumer__username', 'consumer__email',
+)
+
+
+def _serialize_appointment_row(row):
+    """Appointment list entry from a row of .values(*APPOINTMENT_LIST_COLUMNS)"""
+    return {
+        'id': str(row['id']),  # Convert UUID to string
+        'service': {
+            'id': row['service_id'],
+            'name': row['service__name'],
+            'duration': row['service__duration'],
+            'price': float(row['service__price']),
+            'provider': {
+                'id': row['service__provider_id'],
+                'business_name': row['service__provider__business_name']
+            }
+        },
+        'consumer': {
+            'id': row['consumer_id'],
+            'username': row['consumer__username'],
+            'email': row['consumer__email']
+        },
+        'start_time': row['start_time'].isoformat(),
+        'end_time': row['end_time'].isoformat(),
+        'status': row['status'],
+        'notes': row['notes'],
+        'created_at': row['created_at'].isoformat(),
+        'updated_at': row['updated_at'].isoformat()
+    }
+
+
+def _serialize_appointment_list(appointments):
+    """Serialize an Appointment queryset for the list endpoints with one query"""
+    return [_serialize_appointment_row(row) for row in appointments.values(*APPOINTMENT_LIST_COLUMNS)]
+
+
+def _encode_appointment_cursor(row):
+    """Opaque cursor pointing just after an appointment row in (start_time, id) order"""
+    payload = json.dumps([row['start_time'].isoformat(), str(row['id'])])
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def _decode_appointment_cursor(cursor):
+    """Return the (start_time, id) a cursor points after; raises ValueError if it is malformed"""
+    try:
+        start_time, appointment_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.datetime.fromisoformat(start_time), uuid.UUID(appointment_id)
+    except Exception:
+        raise ValueError('cursor is invalid')
+
+
+def _parse_list_datetime(value, name):
+    """Parse a from/to query parameter (date or datetime) into an aware datetime"""
+    try:
+        parsed = parse_datetime(value)
+    except (TypeError, ValueError, OverflowError):
+        parsed = None
+    if parsed is None:
+        raise ValueError(f'{name} must be an ISO 8601 date or datetime')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _appointment_list_response(request, appointments):
+    """
+    One page of an appointment list, in (start_time, id) order.
+    
+    Query parameters:
+        from / to: only appointments starting at or after `from` and before `to`
+        status: comma-separated statuses to include
+        limit: page size (default APPOINTMENT_PAGE_SIZE, at most APPOINTMENT_MAX_PAGE_SIZE)
+        cursor: the next-page cursor of a previous response
+    
+    The body stays a plain list; the next page's cursor is returned in the
+    X-Next-Cursor header and as a Link rel="next" URL, and is absent on the
+    last page. Pages are keyset queries served by the (owner, start_time, id)
+    indexes, so they cost the same however long the history is.
+    
+    Raises:
+        ValueError: with a message for the client when a parameter is invalid
+    """
+    params = request.query_params
+    
+    if params.get('from'):
+        appointments = appointments.filter(start_time__gte=_parse_list_datetime(params['from'], 'from'))
+    if params.get('to'):
+        appointments = appointments.filter(start_time__lt=_parse_list_datetime(params['to'], 'to'))
+    if params.get('status'):
+        statuses = [status.strip() for status in params['status'].split(',') if status.strip()]
+        valid_statuses = {choice for choice, _ in Appointment.STATUS_CHOICES}
+        if not statuses or not set(statuses) <= valid_statuses:
+            raise ValueError(f'status must be one or more of: {", ".join(sorted(valid_statuses))}')
+        appointments = appointments.filter(status__in=statuses)
+    
+    try:
+        limit = int(params.get('limit', APPOINTMENT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError('limit must be an integer')
+    if limit < 1 or limit > APPOINTMENT_MAX_PAGE_SIZE:
+        raise ValueError(f'limit must be between 1 and {APPOINTMENT_MAX_PAGE_SIZE}')
+    
+    if params.get('cursor'):
+        after_start, after_id = _decode_appointment_cursor(params['cursor'])
+        appointments = appointments.filter(
+            Q(start_time__gt=after_start) | Q(start_time=after_start, id__gt=after_id)
+        )
+    
+    # One extra row tells whether there is a next page
+    rows = list(appointments.order_by('start_time', 'id').values(*APPOINTMENT_LIST_COLUMNS)[:limit + 1])
+    page = rows[:limit]
+    response = Response([_serialize_appointment_row(row) for row in page])
+    
+    if len(rows) > limit:
+        next_cursor = _encode_appointment_cursor(page[-1])
+        next_params = request.GET.copy()
+        next_params['cursor'] = next_cursor
+        next_url = request.build_absolute_uri(request.path) + '?' + next_params.urlencode()
+        response['X-Next-Cursor'] = next_cursor
+        response['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+
+def _is_booking_conflict(error):
+    """Whether an IntegrityError comes from the appointment_no_overlap exclusion constraint"""
+    return 'appointment_no_overlap' in str(error)
+
+
+def _booking_conflict_response(appointment):
+    """
+    409 response listing the active bookings that overlap `appointment`.
+    
+    Uses the same provider/booked_range columns as the exclusion constraint,
+    so the lookup is served by its GiST index.
+    """
+    conflicts = Appointment.objects.filter(
+        provider_id=appointment.provider_id,
+        status__in=ACTIVE_APPOINTMENT_STATUSES,
+        booked_range__overlap=appointment.booked_range
+    ).exclude(pk=appointment.pk).select_related('service')
+    
+    return Response({
+        'error': 'This time slot overlaps with an existing appointment. Please choose another time.',
+        'conflict_appointments': [
+            {
+                'id': appt.id,
+                'start_time': appt.start_time.isoformat(),
+                'end_time': appt.end_time.isoformat(),
+                'service': appt.service.name,
+                'status': appt.status
+            } for appt in conflicts
+        ]
+    }, http_status.HTTP_409_CONFLICT)
+
+
+class AppointmentListAPI(APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request):
+        """Get all appointments for the authenticated user or provider"""
+        try:
+            # Get appointments based on user type
+            if request.user.user_type == 'provider':
+                # Providers see appointments for their services
+                appointments = Appointment.objects.filter(
+                    provider__user=request.user
+                )
+            else:
+                # Consumers see their own appointments
+                appointments = Appointment.objects.filter(
+                    consumer=request.user
+                )
+            
+            return _appointment_list_response(request, appointments)
+        except ValueError as e:
+            # Invalid paging or filter parameters
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            import traceback
+            print(f"Error in AppointmentListAPI: {str(e)}")
+            traceback.print_exc()
             return Response({
                 'error': str(e)
             }, http_status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -1690,90 +2499,9 @@ class AppointmentListAPI(APIView):
             start_dt = parse_datetime(start_time) if isinstance(start_time, str) else start_time
             end_dt = parse_datetime(end_time) if isinstance(end_time, str) else end_time
             
-            # Check if the request includes buffer information
-            buffered_start_str = request.data.get('buffered_start')
-            buffered_end_str = request.data.get('buffered_end')
-            requested_buffer_minutes = request.data.get('buffer_minutes')
-            
-            # Apply buffer time for conflict detection
-            buffer_minutes = requested_buffer_minutes or BUFFER_MINUTES
-            
-            # Use provided buffered times if available, otherwise calculate them
-            if buffered_start_str and buffered_end_str:
-                buffered_start = parse_datetime(buffered_start_str)
-                buffered_end = parse_datetime(buffered_end_str)
-                print(f"DEBUG APPOINTMENT: Using provided buffer times: {buffered_start} to {buffered_end}")
-            else:
-                # Apply the buffer minutes to calculate buffered times
-                buffered_start = start_dt - timezone.timedelta(minutes=buffer_minutes)
-                buffered_end = end_dt + timezone.timedelta(minutes=buffer_minutes)
-                print(f"DEBUG APPOINTMENT: Calculated buffer times using {buffer_minutes} minutes")
-                
-            print(f"DEBUG APPOINTMENT: Checking conflicts for time range {start_dt} to {end_dt}")
-            print(f"DEBUG APPOINTMENT: With buffer: {buffered_start} to {buffered_end}")
-            
-            # Check for overlapping appointments
-            overlapping_appointments = Appointment.objects.filter(
-                service__provider=service.provider,
-                status__in=['pending', 'confirmed', 'completed'],
-            ).exclude(status='cancelled')
-            
-            print(f"DEBUG APPOINTMENT: Found {overlapping_appointments.count()} potential conflicts")
-            print(f"DEBUG APPOINTMENT: Requested booking time: {start_dt} to {end_dt}")
-            print(f"DEBUG APPOINTMENT: With buffer applied: {buffered_start} to {buffered_end}")
-            
-            conflicts = []
-            for appt in overlapping_appointments:
-                appt_buffered_start = appt.start_time - timezone.timedelta(minutes=buffer_minutes)
-                appt_buffered_end = appt.end_time + timezone.timedelta(minutes=buffer_minutes)
-                
-                print(f"DEBUG APPOINTMENT: Checking against appointment {appt.id}:")
-                print(f"  - Original time: {appt.start_time} to {appt.end_time}")
-                print(f"  - Buffered time: {appt_buffered_start} to {appt_buffered_end}")
-                
-                # Calculate if there's any overlap and explain why
-                has_overlap = (start_dt < appt_buffered_end and end_dt > appt_buffered_start)
-                
-                print(f"  - Comparison results:")
-                print(f"    - start_dt < appt_buffered_end: {start_dt} < {appt_buffered_end} = {start_dt < appt_buffered_end}")
-                print(f"    - end_dt > appt_buffered_start: {end_dt} > {appt_buffered_start} = {end_dt > appt_buffered_start}")
-                print(f"    - Overall overlap: {has_overlap}")
-                
-                # Check if there's any overlap
-                if has_overlap:
-                    conflicts.append(appt)
-                    print(f"DEBUG APPOINTMENT: Found conflict with appointment {appt.id}")
-                    
-                    # Calculate the exact overlap amount
-                    overlap_start = max(start_dt, appt_buffered_start)
-                    overlap_end = min(end_dt, appt_buffered_end)
-                    overlap_minutes = (overlap_end - overlap_start).total_seconds() / 60
-                    print(f"  - Overlap details: {overlap_start} to {overlap_end} ({overlap_minutes:.2f} minutes)")
-                else:
-                    print(f"DEBUG APPOINTMENT: No conflict with appointment {appt.id}")
-                    # Calculate the gap between appointments (if any)
-                    if start_dt >= appt_buffered_end:
-                        gap_minutes = (start_dt - appt_buffered_end).total_seconds() / 60
-                        print(f"  - Gap after existing appointment: {gap_minutes:.2f} minutes")
-                    elif end_dt <= appt_buffered_start:
-                        gap_minutes = (appt_buffered_start - end_dt).total_seconds() / 60
-                        print(f"  - Gap before existing appointment: {gap_minutes:.2f} minutes")
-            
-            if conflicts:
-                conflict_details = []
-                for appt in conflicts:
-                    conflict_details.append({
-                        'id': appt.id,
-                        'start_time': appt.start_time.isoformat(),
-                        'end_time': appt.end_time.isoformat(),
-                        'service': appt.service.name,
-                        'status': appt.status
-                    })
-                
-                return Response({
-                    'error': 'This time slot overlaps with an existing appointment. Please choose another time.',
-                    'conflict_appointments': conflict_details
-                }, http_status.HTTP_409_CONFLICT)
+            # Overlaps (buffer included) are rejected by the appointment_no_overlap
+            # constraint when the appointment is saved below
+            print(f"DEBUG APPOINTMENT: Booking time range {start_dt} to {end_dt} with a {BUFFER_MINUTES} minute buffer")
             
             # Create appointment
             appointment = Appointment(
@@ -1793,45 +2521,24 @@ class AppointmentListAPI(APIView):
                 id=uuid.uuid4()  # Explicitly set a UUID
             )
             
-            # Try to geocode the address
-            if address_line1 and city and state:
-                try:
-                    from .utils.geo_utils import get_location_from_address
-                    
-                    address_components = {
-                        'address_line1': address_line1,
-                        'city': city,
-                        'state': state,
-                        'zip_code': zip_code,
-                        'country': country
-                    }
-                    
-                    # Get location point from address
-                    try:
-                        location = get_location_from_address(address_components)
-                        
-                        if location:
-                            appointment.location = location
-                            # Also update the simple lat/lng fields for backward compatibility
-                            appointment.latitude = location.y
-                            appointment.longitude = location.x
-                            print(f"DEBUG APPOINTMENT: Geocoded location: {location.y}, {location.x}")
-                    except Exception as geo_error:
-                        # Log the error but continue without geocoding
-                        print(f"DEBUG APPOINTMENT: Error during geocoding operation: {str(geo_error)}")
-                        # Don't set location if geocoding fails
-                        pass
-                except ImportError as import_err:
-                    # Handle missing geocoding utility
-                    print(f"DEBUG APPOINTMENT: Geocoding utility not available: {str(import_err)}")
-                except Exception as e:
-                    # Catch any other errors in the geocoding process
-                    print(f"DEBUG APPOINTMENT: Error initializing geocoding: {str(e)}")
-            
-            # Save the appointment regardless of geocoding success
+            # The address is geocoded by the geocode_worker command, so booking
+            # never waits on the geocoder; the location stays pending until then
+            address_components = appointment_address_components(appointment)
+            if address_components:
+                appointment.location_status = 'pending'
+            
+            # Save the appointment and queue its geocode job together
             try:
-                appointment.save()
+                with transaction.atomic():
+                    appointment.save()
+                    if address_components:
+                        enqueue_geocode('appointment', appointment.id)
                 print(f"DEBUG APPOINTMENT: Successfully created appointment {appointment.id}")
+            except IntegrityError as save_err:
+                if not _is_booking_conflict(save_err):
+                    raise
+                print(f"DEBUG APPOINTMENT: Booking conflicts with an existing appointment")
+                return _booking_conflict_response(appointment)
             except Exception as save_err:
                 print(f"DEBUG APPOINTMENT: Error saving appointment: {str(save_err)}")
                 raise save_err  # Re-raise to be caught by the outer try-except
@@ -1850,7 +2557,8 @@ class AppointmentListAPI(APIView):
                 'address_line2': appointment.address_line2,
                 'city': appointment.city,
                 'state': appointment.state,
-                'zip_code': appointment.zip_code
+                'zip_code': appointment.zip_code,
+                'location_status': appointment.location_status
             }, http_status.HTTP_201_CREATED)
             
         except Service.DoesNotExist:
@@ -1927,47 +2635,7 @@ class AppointmentDetailAPI(APIView):
             end_time = request.data.get('end_time')
             notes = request.data.get('notes')
             
-            # Only check for overlaps if times are being changed
-            if start_time or end_time:
-                new_start_time = parse_datetime(start_time) if start_time and isinstance(start_time, str) else (start_time or appointment.start_time)
-                new_end_time = parse_datetime(end_time) if end_time and isinstance(end_time, str) else (end_time or appointment.end_time)
-                
-                # Apply buffer time for conflict detection
-                buffer_minutes = BUFFER_MINUTES
-                buffered_start = new_start_time - timezone.timedelta(minutes=buffer_minutes)
-                buffered_end = new_end_time + timezone.timedelta(minutes=buffer_minutes)
-                
-                # Check for overlapping appointments with the same provider
-                overlapping_appointments = Appointment.objects.filter(
-                    service__provider=appointment.service.provider,  # Same provider
-                    status__in=['pending', 'confirmed', 'completed'],  # Active appointments
-                ).exclude(id=appointment_id).exclude(status='cancelled')  # Exclude this appointment and cancelled ones
-                
-                # Check each appointment for overlap with the buffered time range
-                conflicts = []
-                for appt in overlapping_appointments:
-                    # Add buffer around existing appointment
-                    appt_buffered_start = appt.start_time - timezone.timedelta(minutes=buffer_minutes)
-                    appt_buffered_end = appt.end_time + timezone.timedelta(minutes=buffer_minutes)
-                    
-                    # If appointment buffered time overlaps with our buffered time, it's a conflict
-                    if appt_buffered_end > buffered_start and appt_buffered_start < buffered_end:
-                        conflicts.append(appt)
-                
-                if conflicts:
-                    return Response({
-                        'error': 'This time slot overlaps with an existing appointment. Please choose another time.',
-                        'conflict_appointments': [
-                            {
-                                'id': appt.id,
-                                'start_time': appt.start_time.isoformat(),
-                                'end_time': appt.end_time.isoformat(),
-                                'service': appt.service.name
-                            } for appt in conflicts[:3]  # Show up to 3 conflicts
-                        ]
-                    }, http_status.HTTP_409_CONFLICT)
-            
-            # Update fields if provided
+            # Update fields if provided; overlaps are rejected by the database on save
             if start_time:
                 appointment.start_time = start_time
             if end_time:
@@ -1975,7 +2643,13 @@ class AppointmentDetailAPI(APIView):
             if notes is not None:
                 appointment.notes = notes
             
-            appointment.save()
+            try:
+                with transaction.atomic():
+                    appointment.save()
+            except IntegrityError as e:
+                if not _is_booking_conflict(e):
+                    raise
+                return _booking_conflict_response(appointment)
             
             return Response({
                 'id': appointment.id,
@@ -2003,8 +2677,10 @@ class AppointmentDetailAPI(APIView):
             # Get appointment directly
             appointment = Appointment.objects.get(id=appointment_id)
             
-            # Delete appointment
-            appointment.delete()
+            # Delete appointment, leaving a tombstone so syncing clients drop it too
+            with transaction.atomic():
+                tombstone_appointments([(appointment.id, appointment.provider_id, appointment.consumer_id)])
+                appointment.delete()
             
             return Response(http_status.HTTP_204_NO_CONTENT)
         except Appointment.DoesNotExist:
@@ -2043,7 +2719,14 @@ class AppointmentStatusAPI(APIView):
             
             # Update status
             appointment.status = new_status
-            appointment.save()
+            try:
+                with transaction.atomic():
+                    appointment.save()
+            except IntegrityError as e:
+                # Re-activating a cancelled booking whose time has been taken since
+                if not _is_booking_conflict(e):
+                    raise
+                return _booking_conflict_response(appointment)
             
             return Response({
                 'id': appointment.id,
@@ -2062,49 +2745,26 @@ class ProviderAppointmentListAPI(APIView):
         try:
             # Verify the provider exists and belongs to the authenticated user
             provider = ServiceProvider.objects.get(id=provider_id)
-            if provider.user != request.user:
+            if provider.user_id != request.user.id:
                 return Response({
                     'error': 'You do not have permission to view these appointments'
                 }, http_status.HTTP_403_FORBIDDEN)
             
             # Get appointments for this provider's services
             appointments = Appointment.objects.filter(
-                service__provider=provider
-            ).order_by('start_time')
-            
-            # Serialize appointments
-            appointment_list = []
-            for appointment in appointments:
-                appointment_list.append({
-                    'id': str(appointment.id),  # Convert UUID to string
-                    'service': {
-                        'id': appointment.service.id,
-                        'name': appointment.service.name,
-                        'duration': appointment.service.duration,
-                        'price': float(appointment.service.price),
-                        'provider': {
-                            'id': appointment.service.provider.id,
-                            'business_name': appointment.service.provider.business_name
-                        }
-                    },
-                    'consumer': {
-                        'id': appointment.consumer.id,
-                        'username': appointment.consumer.username,
-                        'email': appointment.consumer.email
-                    },
-                    'start_time': appointment.start_time.isoformat(),
-                    'end_time': appointment.end_time.isoformat(),
-                    'status': appointment.status,
-                    'notes': appointment.notes,
-                    'created_at': appointment.created_at.isoformat(),
-                    'updated_at': appointment.updated_at.isoformat()
-                })
+                provider=provider
+            )
             
-            return Response(appointment_list)
+            return _appointment_list_response(request, appointments)
         except ServiceProvider.DoesNotExist:
             return Response({
                 'error': 'Provider not found'
             }, http_status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            # Invalid paging or filter parameters
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             import traceback
             print(f"Error in ProviderAppointmentListAPI: {str(e)}")
@@ -2129,41 +2789,18 @@ class ConsumerAppointmentListAPI(APIView):
             # Get appointments for this consumer
             appointments = Appointment.objects.filter(
                 consumer=consumer
-            ).order_by('start_time')
-            
-            # Serialize appointments
-            appointment_list = []
-            for appointment in appointments:
-                appointment_list.append({
-                    'id': str(appointment.id),  # Convert UUID to string
-                    'service': {
-                        'id': appointment.service.id,
-                        'name': appointment.service.name,
-                        'duration': appointment.service.duration,
-                        'price': float(appointment.service.price),
-                        'provider': {
-                            'id': appointment.service.provider.id,
-                            'business_name': appointment.service.provider.business_name
-                        }
-                    },
-                    'consumer': {
-                        'id': appointment.consumer.id,
-                        'username': appointment.consumer.username,
-                        'email': appointment.consumer.email
-                    },
-                    'start_time': appointment.start_time.isoformat(),
-                    'end_time': appointment.end_time.isoformat(),
-                    'status': appointment.status,
-                    'notes': appointment.notes,
-                    'created_at': appointment.created_at.isoformat(),
-                    'updated_at': appointment.updated_at.isoformat()
-                })
+            )
             
-            return Response(appointment_list)
+            return _appointment_list_response(request, appointments)
         except User.DoesNotExist:
             return Response({
                 'error': 'Consumer not found'
             }, http_status.HTTP_404_NOT_FOUND)
+        except ValueError as e:
+            # Invalid paging or filter parameters
+            return Response({
+                'error': str(e)
+            }, http_status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             import traceback
             print(f"Error in ConsumerAppointmentListAPI: {str(e)}")
@@ -2495,8 +3132,14 @@ def book_appointment(request, service_id):
             appointment = form.save(commit=False)
             appointment.service = service
             appointment.consumer = request.user
-            appointment.save()
-            return redirect('appointment_confirmation', appointment.id)
+            try:
+                with transaction.atomic():
+                    appointment.save()
+                return redirect('appointment_confirmation', appointment.id)
+            except IntegrityError as e:
+                if not _is_booking_conflict(e):
+                    raise
+                form.add_error(None, 'This time slot overlaps with an existing appointment. Please choose another time.')
     else:
         form = AppointmentForm()
     return render(request, 'main_app/book_appointment.html', {
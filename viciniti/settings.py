@@ -43,6 +43,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'corsheaders',
@@ -106,6 +107,75 @@ DATABASES = {
 # }
 
 
+# Cache
+# Point CACHE_BACKEND/CACHE_LOCATION at a shared cache in production, e.g.
+# django.core.cache.backends.redis.RedisCache, or use
+# django.core.cache.backends.filebased.FileBasedCache with a directory.
+# Local runs fall back to an in-process memory cache, with which availability
+# caching is turned off: its invalidations would not reach the other web
+# workers or the geocode worker.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'viciniti-default'),
+    }
+}
+
+# 'True' or 'False' forces availability caching on or off; unset, it is on
+# only with a shared cache backend. 'True' with a per-process backend fails at startup.
+AVAILABILITY_CACHE_ENABLED = (
+    os.getenv('AVAILABILITY_CACHE_ENABLED') == 'True' if os.getenv('AVAILABILITY_CACHE_ENABLED') else None
+)
+
+# Seconds a computed availability day stays cached; today's day expires
+# sooner because its slots move with the booking lead time
+AVAILABILITY_CACHE_TIMEOUT = int(os.getenv('AVAILABILITY_CACHE_TIMEOUT', 60 * 60))
+AVAILABILITY_CACHE_TODAY_TIMEOUT = int(os.getenv('AVAILABILITY_CACHE_TODAY_TIMEOUT', 60))
+
+# Longest run of days a single availability request may ask for
+AVAILABILITY_MAX_DAYS = int(os.getenv('AVAILABILITY_MAX_DAYS', 60))
+
+# Days computed per step when availability is streamed (?stream=1)
+AVAILABILITY_STREAM_CHUNK_DAYS = int(os.getenv('AVAILABILITY_STREAM_CHUNK_DAYS', 7))
+
+# Slot generator used by the availability views: 'python' (default) or
+# 'numpy' for the vectorized engine; both produce identical slots
+AVAILABILITY_SLOT_ENGINE = os.getenv('AVAILABILITY_SLOT_ENGINE', 'python')
+
+# Price proximity discounts from prebuilt discount zones (manage.py
+# build_discount_zones) on days that have them
+PROXIMITY_DISCOUNT_ZONES = os.getenv('PROXIMITY_DISCOUNT_ZONES', 'False') == 'True'
+
+# Seconds an address the geocoder could not find is remembered as not found
+GEOCODE_NEGATIVE_CACHE_SECONDS = int(os.getenv('GEOCODE_NEGATIVE_CACHE_SECONDS', 24 * 60 * 60))
+
+# Geocoder requests allowed per second by each process, and how many may go
+# out back to back; Nominatim's public usage policy is one per second
+GEOCODER_REQUESTS_PER_SECOND = float(os.getenv('GEOCODER_REQUESTS_PER_SECOND', 1))
+GEOCODER_BURST = int(os.getenv('GEOCODER_BURST', 1))
+
+# Retries of a failing geocoder request, and how many times a queued
+# geocode job runs before it is given up
+GEOCODER_HTTP_RETRIES = int(os.getenv('GEOCODER_HTTP_RETRIES', 2))
+GEOCODE_JOB_MAX_ATTEMPTS = int(os.getenv('GEOCODE_JOB_MAX_ATTEMPTS', 5))
+
+# Where addresses are looked up, in order: 'cache' (the GeocodeCache table),
+# 'offline' (a local dataset built with manage.py build_offline_geocoder) and
+# 'nominatim'. E.g. 'cache,offline' runs without network access.
+GEOCODER_BACKENDS = os.getenv('GEOCODER_BACKENDS', 'cache,nominatim')
+OFFLINE_GEOCODER_DIR = os.getenv('OFFLINE_GEOCODER_DIR', os.path.join(BASE_DIR, 'geodata'))
+
+# Appointment list page sizes: the default, and the most a client may ask for
+APPOINTMENT_PAGE_SIZE = int(os.getenv('APPOINTMENT_PAGE_SIZE', 100))
+APPOINTMENT_MAX_PAGE_SIZE = int(os.getenv('APPOINTMENT_MAX_PAGE_SIZE', 500))
+
+# Days deleted rows are remembered for /api/sync/ (prune with manage.py
+# prune_sync_tombstones); clients that last synced earlier get everything again
+SYNC_TOMBSTONE_DAYS = int(os.getenv('SYNC_TOMBSTONE_DAYS', 30))
+# How far each sync looks back before its token, for rows committed after it was issued
+SYNC_OVERLAP_SECONDS = int(os.getenv('SYNC_OVERLAP_SECONDS', 10))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 